@@ -0,0 +1,119 @@
+"""Command line entry point: ``python -m backend <command>``.
+
+    python -m backend serve --workers 4    production server (pre-fork worker pool)
+    python -m backend dev                  Flask development server with the reloader
+    python -m backend check                verify the project structure
+    python -m backend assets               build fingerprinted, precompressed static files
+    python -m backend select-model         cross-validated model search and report
+"""
+import sys
+import argparse
+
+from .serve import HOST, PORT, WORKERS, GRACEFUL_TIMEOUT
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend', description='Farm advisor backend')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='run the production server')
+    serve_parser.add_argument('--host', default=HOST)
+    serve_parser.add_argument('--port', type=int, default=PORT)
+    serve_parser.add_argument('--workers', type=int, default=WORKERS,
+                              help='worker processes (default: WEB_CONCURRENCY or the CPU count)')
+    serve_parser.add_argument('--graceful-timeout', type=float, default=GRACEFUL_TIMEOUT,
+                              help='seconds to let in-flight requests finish on restart or shutdown')
+
+    dev_parser = commands.add_parser('dev', help='run the Flask development server')
+    dev_parser.add_argument('--host', default='127.0.0.1')
+    dev_parser.add_argument('--port', type=int, default=PORT)
+
+    commands.add_parser('check', help='verify the project structure')
+
+    assets_parser = commands.add_parser('assets', help='build fingerprinted, precompressed static files')
+    assets_parser.add_argument('--output', help='build directory (default: ASSETS_DIR)')
+
+    select_parser = commands.add_parser('select-model', help='cross-validated hyperparameter search')
+    select_parser.add_argument('--data', help='training CSV (default: the farm dataset, as the server trains on it)')
+    select_parser.add_argument('--target', help='target column (default: the server\'s)')
+    select_parser.add_argument('--folds', type=int, help='cross-validation folds (default: SELECTION_FOLDS)')
+    select_parser.add_argument('--workers', type=int, help='processes (default: SELECTION_WORKERS or the CPU count)')
+    select_parser.add_argument('--apply', action='store_true',
+                               help='train with the selected estimator from now on (and retrain the model)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'assets':
+        from .assets import ASSETS_DIR, build_assets
+        manifest = build_assets(output=args.output or ASSETS_DIR)
+        print(f"Built {len(manifest['files'])} files ({len(manifest['fingerprinted'])} fingerprinted) "
+              f"in {args.output or ASSETS_DIR}")
+        return 0
+
+    if args.command == 'select-model':
+        return select_model_command(args)
+
+    from . import server
+
+    if args.command == 'check':
+        errors = server.verify_structure()
+        for error in errors:
+            print(f"  - {error}")
+        print("Structure verification failed" if errors else "Structure verification passed")
+        return 1 if errors else 0
+
+    errors = server.verify_structure()
+    for error in errors:
+        server.logger.warning(f"Structure check: {error}")
+
+    if args.command == 'dev':
+        from werkzeug.serving import run_simple
+        run_simple(args.host, args.port, server.app, use_reloader=True, use_debugger=True, threaded=True)
+        return 0
+
+    from .serve import serve
+    serve(server.app, args.host, args.port, args.workers,
+          preload=server.preload, reload=server.reload_state, graceful_timeout=args.graceful_timeout)
+    return 0
+
+
+def select_model_command(args):
+    import pandas as pd
+
+    from . import model_selection
+    from .model import TARGET_COLUMN, farm_training_frame, save_artifact, save_selected_model, train_artifact
+
+    if args.data:
+        data = pd.read_csv(args.data)
+    else:
+        # The frame the server trains on, read without starting the server
+        from .database import dataset_store
+        farming = dataset_store.get('farming')
+        if farming is None:
+            print("Model selection refused: the farm dataset could not be loaded", file=sys.stderr)
+            return 1
+        data = farm_training_frame(farming)
+    target = args.target or TARGET_COLUMN
+    try:
+        report = model_selection.select_model(data, target, space=model_selection.SEARCH_SPACE,
+                                              folds=args.folds or model_selection.SELECTION_FOLDS,
+                                              workers=args.workers or model_selection.SELECTION_WORKERS)
+    except ValueError as e:
+        print(f"Model selection refused: {str(e)}", file=sys.stderr)
+        return 1
+    path = model_selection.write_report(report)
+    print(model_selection.format_report(report))
+    print(f"Report written to {path}")
+
+    if args.apply:
+        selected = report['selected']
+        save_selected_model(selected['estimator'], selected['params'])
+        if not args.data and target == TARGET_COLUMN:
+            # Serving processes pick the new artifact up on their next poll
+            save_artifact(train_artifact(data))
+        else:
+            print("Selection saved; the served model changes on its next retrain (POST /api/model/retrain)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+import hashlib
+import logging
+import threading
+from collections import Counter
+
+try:
+    from .metrics import metrics
+    from .serialization import dumps
+except ImportError:
+    from metrics import metrics
+    from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class RunningStats:
+    """Count, mean and variance of some columns, overall or per group.
+
+    Rows are added in batches: each batch is summarized with pandas and
+    merged into the running state with the pairwise form of Welford's
+    update (Chan et al.), so adding rows never revisits the ones already
+    counted. NaNs are skipped, as pandas' mean() does.
+    """
+
+    def __init__(self, columns, by=None):
+        self.columns = columns
+        self.by = by
+        # group (None when ungrouped) -> column -> [count, mean, M2]
+        self.groups = {}
+
+    def copy(self):
+        other = RunningStats(self.columns, self.by)
+        other.groups = {group: {column: list(state) for column, state in columns.items()}
+                        for group, columns in self.groups.items()}
+        return other
+
+    def update(self, df):
+        if not len(df):
+            return self
+        if self.by is None:
+            values = df[self.columns]
+            batches = [(None, values.count(), values.mean(), values.var(ddof=0))]
+        else:
+            grouped = df.groupby(self.by, observed=True)[self.columns]
+            counts, means, variances = grouped.count(), grouped.mean(), grouped.var(ddof=0)
+            batches = [(str(group), counts.loc[group], means.loc[group], variances.loc[group])
+                       for group in counts.index]
+
+        for group, counts, means, variances in batches:
+            state = self.groups.setdefault(group, {column: [0, 0.0, 0.0] for column in self.columns})
+            for column in self.columns:
+                n_b = int(counts[column])
+                if n_b == 0:
+                    continue
+                mean_b = float(means[column])
+                m2_b = float(variances[column]) * n_b if n_b > 1 else 0.0
+                n_a, mean_a, m2_a = state[column]
+                n = n_a + n_b
+                delta = mean_b - mean_a
+                state[column] = [n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n]
+        return self
+
+    def mean(self, group, column):
+        n, mean, _ = self.groups[group][column]
+        return mean if n else None
+
+    def std(self, group, column):
+        """Sample standard deviation (ddof=1, as pandas' std())."""
+        n, _, m2 = self.groups[group][column]
+        return (m2 / (n - 1)) ** 0.5 if n > 1 else None
+
+    def count(self, group, column):
+        return self.groups[group][column][0]
+
+
+class ValueCounts:
+    """Running value_counts() of some columns."""
+
+    def __init__(self, columns):
+        self.counts = {column: Counter() for column in columns}
+
+    def copy(self):
+        other = ValueCounts([])
+        other.counts = {column: Counter(counts) for column, counts in self.counts.items()}
+        return other
+
+    def update(self, df):
+        for column, counts in self.counts.items():
+            for value, n in df[column].value_counts().items():
+                if n:
+                    counts[str(value)] += int(n)
+        return self
+
+    def result(self, column):
+        return dict(self.counts[column].most_common())
+
+
+class CropAnalysis:
+    COLUMNS = ['Crop_Yield_ton', 'Sustainability_Score']
+
+    def __init__(self):
+        self.stats = RunningStats(self.COLUMNS, by='Crop_Type')
+
+    def copy(self):
+        other = CropAnalysis()
+        other.stats = self.stats.copy()
+        return other
+
+    def update(self, df):
+        self.stats.update(df)
+        return self
+
+    def result(self):
+        result = {}
+        for crop in sorted(self.stats.groups):
+            entry = {}
+            for column in self.COLUMNS:
+                entry[column] = self.stats.mean(crop, column)
+                entry[f"{column}_std"] = self.stats.std(crop, column)
+            entry['count'] = self.stats.count(crop, self.COLUMNS[0])
+            result[crop] = entry
+        return result
+
+
+class WeatherSummary:
+    COLUMNS = ['Temperature_C', 'Rainfall_mm']
+
+    def __init__(self):
+        self.stats = RunningStats(self.COLUMNS)
+
+    def copy(self):
+        other = WeatherSummary()
+        other.stats = self.stats.copy()
+        return other
+
+    def update(self, df):
+        self.stats.update(df)
+        return self
+
+    def result(self):
+        if None not in self.stats.groups:
+            return {column: None for column in self.COLUMNS}
+        return {column: self.stats.mean(None, column) for column in self.COLUMNS}
+
+
+class MarketSummary:
+    PRODUCT_COLUMNS = {
+        'Demand_Index': 'demand',
+        'Supply_Index': 'supply',
+        'Consumer_Trend_Index': 'trend_index'
+    }
+
+    def __init__(self):
+        self.counts = ValueCounts(['Seasonal_Factor', 'Product'])
+        self.products = RunningStats(list(self.PRODUCT_COLUMNS), by='Product')
+
+    def copy(self):
+        other = MarketSummary()
+        other.counts = self.counts.copy()
+        other.products = self.products.copy()
+        return other
+
+    def update(self, df):
+        self.counts.update(df)
+        self.products.update(df)
+        return self
+
+    def result(self):
+        return {
+            'distributions': {
+                'seasonal': self.counts.result('Seasonal_Factor'),
+                'product': self.counts.result('Product')
+            },
+            'products': {
+                'data': {
+                    product: {key: self.products.mean(product, column)
+                              for column, key in self.PRODUCT_COLUMNS.items()}
+                    for product in sorted(self.products.groups)
+                }
+            }
+        }
+
+
+def crop_analysis(farming_data):
+    return CropAnalysis().update(farming_data).result()
+
+
+def weather_summary(farming_data):
+    return WeatherSummary().update(farming_data).result()
+
+
+def market_summary(market_data):
+    return MarketSummary().update(market_data).result()
+
+
+# aggregate name -> (dataset name, accumulator class)
+AGGREGATES = {
+    'crop-analysis': ('farming', CropAnalysis),
+    'weather-data': ('farming', WeatherSummary),
+    'market-summary': ('market', MarketSummary)
+}
+
+
+class AggregateEntry:
+    def __init__(self, version, payload, body, etag, accumulator=None):
+        self.version = version
+        self.payload = payload
+        self.body = body
+        self.etag = etag
+        self.accumulator = accumulator
+
+
+class AggregateCache:
+    """Summaries computed once per dataset version.
+
+    Entries are keyed by aggregate name and remember the dataset version they
+    were computed from, so a reload of the underlying CSV invalidates them.
+    The serialized JSON body and its ETag are kept alongside the payload so a
+    repeat request costs a stat() and a dict lookup. When the new version
+    only appended rows, a copy of the entry's accumulator takes in just
+    those rows instead of recomputing over the whole frame.
+    """
+
+    def __init__(self, store, aggregates=AGGREGATES):
+        self.store = store
+        self.aggregates = aggregates
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.incremental = 0
+
+    def get(self, name):
+        """Return the AggregateEntry for ``name`` or None if its dataset is unavailable."""
+        dataset, accumulator_class = self.aggregates[name]
+        df, version = self.store.get_versioned(dataset)
+        if df is None:
+            return None
+
+        entry = self._entries.get(name)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.version == version:
+                self.hits += 1
+                return entry
+            start = None
+            if entry is not None and entry.accumulator is not None:
+                start = self.store.appended_since(dataset, entry.version, version)
+            with metrics.phase('aggregation'):
+                if start is not None:
+                    # Copied so requests still holding the old entry keep a consistent one
+                    self.incremental += 1
+                    accumulator = entry.accumulator.copy().update(df.iloc[start:])
+                else:
+                    self.misses += 1
+                    accumulator = accumulator_class().update(df)
+                payload = accumulator.result()
+            body = dumps(payload, sort_keys=True)
+            tag = f"{name}:{dataset}:{version[0]}:{version[1]}"
+            etag = hashlib.sha1(tag.encode()).hexdigest()[:16]
+            entry = AggregateEntry(version, payload, body, etag, accumulator)
+            self._entries[name] = entry
+            if start is not None:
+                logger.info(f"Updated aggregate {name} with {len(df) - start} new {dataset} rows (version {version})")
+            else:
+                logger.info(f"Computed aggregate {name} for {dataset} version {version}")
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.incremental
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'incremental': self.incremental,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,304 @@
+"""Build step and server for the frontend's static files.
+
+``python -m backend assets`` copies frontend/ to ASSETS_DIR with every
+CSS/JS/image file also written under a content-hashed name (main.js ->
+main.1a2b3c4d5e6f.js), rewrites references to those names (HTML
+``href``/``src``, ES module ``import``/``export ... from`` specifiers and
+CSS ``url()``/``@import``), and writes .gz (and .br, when the brotli
+package is installed) next to each compressible file. A file's hash
+covers its rewritten references, so files are hashed after the files they
+reference; modules that import each other in a cycle cannot be, and keep
+their plain names (served with revalidation). A manifest.json maps every served path to its
+hash and variants, and nginx.conf is an example for STATIC_MODE=proxy.
+
+STATIC_MODE picks who sends the bytes:
+  app     Flask sends them (the default)
+  accel   Flask answers with X-Accel-Redirect to STATIC_ACCEL_PREFIX and
+          the proxy (nginx ``internal`` location) sends the file
+  proxy   the static routes are not registered; the proxy serves
+          ASSETS_DIR itself (see the generated nginx.conf)
+Without a build, the files are served from frontend/ as before, with
+ETags and revalidation instead of long-lived caching.
+"""
+import os
+import re
+import json
+import gzip
+import shutil
+import hashlib
+import logging
+import mimetypes
+import posixpath
+
+try:
+    from .compression import GZIP_LEVEL, BROTLI_QUALITY, brotli
+except ImportError:
+    from compression import GZIP_LEVEL, BROTLI_QUALITY, brotli
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_DIR = os.path.join(BASE_DIR, 'frontend')
+ASSETS_DIR = os.getenv('ASSETS_DIR', os.path.join(BASE_DIR, 'build', 'frontend'))
+STATIC_MODE = os.getenv('STATIC_MODE', 'app')
+STATIC_ACCEL_PREFIX = os.getenv('STATIC_ACCEL_PREFIX', '/_assets/')
+
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Fingerprinted and precompressed; HTML keeps its name so URLs stay stable
+FINGERPRINT_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico',
+                          '.woff', '.woff2', '.json'}
+COMPRESS_EXTENSIONS = {'.html', '.css', '.js', '.map', '.svg', '.json', '.txt'}
+REFERENCE = re.compile(r'''((?:href|src)\s*=\s*["'])([^"'#?]+)(["'])''')
+# Static and dynamic ES module specifiers: import/export ... from 'x', import 'x', import('x')
+JS_REFERENCE = re.compile(r'''(\b(?:import|export)\b[^'"`;]*?\bfrom\s*["']|\bimport\s*\(?\s*["'])([^"'#?]+)(["'])''')
+CSS_REFERENCE = re.compile(r'''(url\(\s*["']?|@import\s+["'])([^"'()#?\s]+)(["']?\s*\)|["'])''')
+REFERENCES = {'.html': REFERENCE, '.js': JS_REFERENCE, '.css': CSS_REFERENCE}
+# Absolute references resolve against these URL prefixes, which all serve the frontend root
+ROOT_PREFIXES = ('/static/', '/')
+
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _precompress(path, data):
+    variants = []
+    if os.path.splitext(path)[1] in COMPRESS_EXTENSIONS:
+        _write(path + '.gz', gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+        variants.append('gzip')
+        if brotli is not None:
+            _write(path + '.br', brotli.compress(data, quality=BROTLI_QUALITY))
+            variants.append('br')
+    return variants
+
+
+def _resolve(ref, page):
+    """``(prefix, logical path)`` that ``ref`` in ``page`` points at; prefix is None for relative refs."""
+    if '://' in ref or ref.startswith(('//', 'data:', 'mailto:')):
+        return None, None
+    for prefix in ROOT_PREFIXES:
+        if ref.startswith(prefix):
+            return prefix, posixpath.normpath(ref[len(prefix):])
+    return None, posixpath.normpath(posixpath.join(posixpath.dirname(page), ref))
+
+
+def _references(text, page, pattern=REFERENCE):
+    """Logical paths referenced from ``page``."""
+    return {_resolve(match.group(2), page)[1] for match in pattern.finditer(text)} - {None}
+
+
+def _rewrite_references(text, page, fingerprinted, pattern=REFERENCE):
+    """Point the references ``pattern`` finds in ``page`` at the fingerprinted files."""
+    base = posixpath.dirname(page)
+
+    def replace(match):
+        ref = match.group(2)
+        prefix, target = _resolve(ref, page)
+        if target not in fingerprinted:
+            return match.group(0)
+        if prefix is not None:
+            return match.group(1) + prefix + fingerprinted[target] + match.group(3)
+        rewritten = posixpath.relpath(fingerprinted[target], base or '.')
+        # ES module specifiers must start with ./ or ../ to be relative
+        if ref.startswith('.') and not rewritten.startswith('.'):
+            rewritten = './' + rewritten
+        return match.group(1) + rewritten + match.group(3)
+
+    return pattern.sub(replace, text)
+
+
+def _cyclic(graph):
+    """Nodes of ``graph`` ({node: referenced nodes}) that can reach themselves."""
+    cyclic = set()
+    for start in graph:
+        seen, stack = set(), list(graph[start])
+        while stack:
+            node = stack.pop()
+            if node == start:
+                cyclic.add(start)
+                break
+            if node not in seen:
+                seen.add(node)
+                stack.extend(graph.get(node, ()))
+    return cyclic
+
+
+def build_assets(source=FRONTEND_DIR, output=ASSETS_DIR):
+    """Write the fingerprinted, precompressed copy of ``source`` to ``output``; returns the manifest."""
+    files = {}
+    for root, dirs, names in os.walk(source):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in names:
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, source).replace(os.sep, '/')] = path
+
+    sources = {}
+    for logical, path in files.items():
+        with open(path, 'rb') as f:
+            sources[logical] = f.read()
+    pattern_of = {logical: REFERENCES.get(posixpath.splitext(logical)[1].lower()) for logical in files}
+    graph = {logical: _references(sources[logical].decode('utf-8', 'surrogateescape'), logical,
+                                  pattern_of[logical]) & set(files)
+             for logical in files if pattern_of[logical] is not None}
+    cyclic = {logical for logical in _cyclic(graph)
+              if posixpath.splitext(logical)[1].lower() in FINGERPRINT_EXTENSIONS}
+
+    staging = f"{output}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = {'files': {}, 'fingerprinted': {}}
+    entries = manifest['files']
+    fingerprinted = manifest['fingerprinted']
+    contents = {}
+
+    def content(logical):
+        # Referenced files are fingerprinted first, so the rewritten names exist
+        if logical not in contents:
+            data = sources[logical]
+            if logical in graph:
+                for target in sorted(graph[logical]):
+                    fingerprint(target)
+                data = _rewrite_references(data.decode('utf-8', 'surrogateescape'), logical, fingerprinted,
+                                           pattern_of[logical]).encode('utf-8', 'surrogateescape')
+            contents[logical] = data
+        return contents[logical]
+
+    def fingerprint(logical):
+        stem, ext = posixpath.splitext(logical)
+        if logical in fingerprinted or logical in cyclic or ext.lower() not in FINGERPRINT_EXTENSIONS:
+            return
+        data = content(logical)
+        digest = _hash(data)
+        hashed = f"{stem}.{digest}{ext}"
+        for name in (logical, hashed):
+            _write(os.path.join(staging, name), data)
+            entries[name] = {'hash': digest, 'encodings': _precompress(os.path.join(staging, name), data),
+                             'immutable': name == hashed}
+        fingerprinted[logical] = hashed
+
+    for logical in sorted(files):
+        fingerprint(logical)
+    for logical in sorted(files):
+        if logical in entries:
+            continue
+        data = content(logical)
+        _write(os.path.join(staging, logical), data)
+        entries[logical] = {'hash': _hash(data), 'encodings': _precompress(os.path.join(staging, logical), data),
+                            'immutable': False}
+    if cyclic:
+        logger.warning(f"Not fingerprinting modules that import each other in a cycle: {', '.join(sorted(cyclic))}")
+
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    with open(os.path.join(staging, 'nginx.conf'), 'w') as f:
+        f.write(nginx_config(output))
+
+    # Swap the whole directory so a running server never sees half a build
+    previous = f"{output}.old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(output):
+        os.rename(output, previous)
+    os.rename(staging, output)
+    shutil.rmtree(previous, ignore_errors=True)
+    logger.info(f"Built {len(entries)} static files ({len(manifest['fingerprinted'])} fingerprinted) in {output}")
+    return manifest
+
+
+def nginx_config(root):
+    """Example locations for STATIC_MODE=proxy (and the internal one STATIC_MODE=accel needs)."""
+    return f"""# Generated by python -m backend assets
+# Fingerprinted names never change content: cache them for a year
+location ~ "\\.[0-9a-f]{{12}}\\.[a-z0-9]+$" {{
+    root {root};
+    gzip_static on;
+    # brotli_static on;   # with ngx_brotli
+    add_header Cache-Control "{IMMUTABLE}";
+    try_files $uri =404;
+}}
+
+# Older pages reference /static/<file>
+location ^~ /static/ {{
+    alias {root}/;
+    gzip_static on;
+    add_header Cache-Control "{REVALIDATE}";
+}}
+
+# HTML and other unhashed files revalidate with ETags
+location / {{
+    root {root};
+    gzip_static on;
+    add_header Cache-Control "{REVALIDATE}";
+    try_files $uri $uri/index.html @backend;
+}}
+
+# Target of X-Accel-Redirect for STATIC_MODE=accel
+location {STATIC_ACCEL_PREFIX} {{
+    internal;
+    alias {root}/;
+}}
+"""
+
+
+class StaticAssets:
+    """Serves the built assets (or, before a build, the frontend sources) with caching headers."""
+
+    def __init__(self, assets_dir=ASSETS_DIR, source_dir=FRONTEND_DIR, mode=STATIC_MODE):
+        self.assets_dir = assets_dir
+        self.source_dir = source_dir
+        self.mode = mode
+        self.files = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.assets_dir, MANIFEST)) as f:
+                self.files = json.load(f)['files']
+            logger.info(f"Serving {len(self.files)} built static files from {self.assets_dir}")
+        except (OSError, ValueError, KeyError):
+            self.files = {}
+            logger.info(f"No static build in {self.assets_dir}; serving {self.source_dir} "
+                        f"(run `python -m backend assets` for fingerprinted, precompressed files)")
+
+    @property
+    def built(self):
+        return bool(self.files)
+
+    def response(self, request, path):
+        from flask import abort, send_from_directory
+
+        path = posixpath.normpath(path).lstrip('/')
+        entry = self.files.get(path)
+        if entry is None:
+            if self.built:
+                abort(404)
+            response = send_from_directory(self.source_dir, path, max_age=0)
+            response.headers['Cache-Control'] = REVALIDATE
+            return response
+
+        encoding = next((e for e in ('br', 'gzip') if e in entry['encodings'] and request.accept_encodings[e] > 0),
+                        None)
+        variant = path + {'br': '.br', 'gzip': '.gz', None: ''}[encoding]
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        etag = f"{entry['hash']}-{encoding}" if encoding else entry['hash']
+        cache_control = IMMUTABLE if entry['immutable'] else REVALIDATE
+
+        if self.mode == 'accel':
+            from flask import Response
+            response = Response(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = STATIC_ACCEL_PREFIX + variant
+            response.set_etag(etag)
+        else:
+            response = send_from_directory(self.assets_dir, variant, mimetype=mimetype, etag=etag)
+            response.headers.pop('Content-Disposition', None)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = cache_control
+        return response.make_conditional(request)
@@ -0,0 +1,73 @@
+import os
+import gzip
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies are compressed once and cached, so the slowest (smallest) settings pay off
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 9))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 11))
+# Smaller bodies are sent as they are
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 512))
+
+
+def supported_encodings():
+    """Content codings this install can produce, best first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encodings):
+    """The best coding the client accepts (werkzeug's request.accept_encodings), or None."""
+    for encoding in supported_encodings():
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content coding {encoding!r}")
+
+
+class CompressedBody:
+    """A response body with its compressed variants, each computed on first use."""
+
+    def __init__(self, body, etag, mimetype='application/json'):
+        self.body = body
+        self.etag = etag
+        self.mimetype = mimetype
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        if encoding is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return None, self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    data = compress(self.body, encoding)
+                    self._encoded[encoding] = data
+        return encoding, data
+
+    def response(self, request, cache_control='no-cache'):
+        """A conditional Flask response, compressed as the request allows."""
+        from flask import Response
+
+        encoding, data = self.encoded(negotiate(request.accept_encodings))
+        response = Response(data, mimetype=self.mimetype)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # One tag per coding, since the bytes sent differ
+        response.set_etag(f"{self.etag}-{encoding}" if encoding else self.etag)
+        response.headers['Cache-Control'] = cache_control
+        return response.make_conditional(request)
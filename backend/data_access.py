@@ -0,0 +1,73 @@
+try:
+    from .database import dataset_store
+    from .aggregates import AggregateCache
+    from .farm_data import FarmDataCache
+    from .indexes import IndexCache
+    from .recommender import RecommendationEngine
+    from .similarity import NeighborsCache
+    from .simulation import Simulator
+except ImportError:
+    from database import dataset_store
+    from aggregates import AggregateCache
+    from farm_data import FarmDataCache
+    from indexes import IndexCache
+    from recommender import RecommendationEngine
+    from similarity import NeighborsCache
+    from simulation import Simulator
+
+
+class DataAccess:
+    """The one path from the routes to the datasets.
+
+    Frames come from the DatasetStore (columnar cache or CSV, reloaded when
+    the file changes); summaries and filter indexes are derived from those
+    frames and cached per dataset version. Routes never read files
+    themselves, so any improvement to loading or caching applies to every
+    endpoint.
+    """
+
+    def __init__(self, store=dataset_store):
+        self.store = store
+        self.aggregates = AggregateCache(store)
+        self.indexes = IndexCache(store)
+        self.recommender = RecommendationEngine(store)
+        self.neighbors = NeighborsCache(store)
+        self.farm_data = FarmDataCache(store)
+        self.simulator = Simulator(store)
+
+    def frame(self, name):
+        """The current frame for dataset ``name``, or None if it cannot be loaded."""
+        return self.store.get(name)
+
+    def versioned(self, name):
+        return self.store.get_versioned(name)
+
+    def append(self, name, rows):
+        """Validate and append ``rows`` to dataset ``name``; summaries catch up from the new rows only."""
+        return self.store.append(name, rows)
+
+    def aggregate(self, name):
+        return self.aggregates.get(name)
+
+    def index(self, name):
+        """``(FrameIndex, version)`` for dataset ``name``."""
+        return self.indexes.get_versioned(name)
+
+    def preload(self):
+        for name in self.store.datasets:
+            self.store.get(name)
+        for name in self.aggregates.aggregates:
+            self.aggregates.get(name)
+        self.recommender.tables()
+        self.neighbors.get()
+        self.simulator.surfaces()
+
+    def clear(self):
+        self.store.clear()
+        self.aggregates.clear()
+        self.indexes.clear()
+        self.recommender.clear()
+        self.neighbors.clear()
+        self.farm_data.clear()
+        self.simulator.clear()
+
@@ -0,0 +1,511 @@
+import io
+import os
+import sys
+import csv
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('FARM_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+CACHE_FORMAT = 1
+
+# Explicit schemas so pandas never has to infer types from the text
+DATASETS = {
+    'farming': {
+        'file': 'farmer_advisor_dataset.csv',
+        'id': 'Farm_ID',
+        'dtypes': {
+            'Farm_ID': 'int64',
+            'Soil_pH': 'float64',
+            'Soil_Moisture': 'float64',
+            'Temperature_C': 'float64',
+            'Rainfall_mm': 'float64',
+            'Crop_Type': 'category',
+            'Fertilizer_Usage_kg': 'float64',
+            'Pesticide_Usage_kg': 'float64',
+            'Crop_Yield_ton': 'float64',
+            'Sustainability_Score': 'float64'
+        }
+    },
+    'market': {
+        'file': 'market_researcher_dataset.csv',
+        'id': 'Market_ID',
+        'dtypes': {
+            'Market_ID': 'int64',
+            'Product': 'category',
+            'Market_Price_per_ton': 'float64',
+            'Demand_Index': 'float64',
+            'Supply_Index': 'float64',
+            'Competitor_Price_per_ton': 'float64',
+            'Economic_Indicator': 'float64',
+            'Weather_Impact_Score': 'float64',
+            'Seasonal_Factor': 'category',
+            'Consumer_Trend_Index': 'float64'
+        }
+    }
+}
+
+
+# Bytes before the previously parsed end of a file that must be unchanged
+# for new bytes after it to be treated as appended rows
+TAIL_CHECK_BYTES = 4096
+# Appended versions remembered per dataset for incremental consumers
+MAX_LINEAGE = 1024
+
+
+class IngestError(ValueError):
+    """Raised when rows posted for ingestion fail validation."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors[:5]) + (f" (and {len(errors) - 5} more)" if len(errors) > 5 else ''))
+        self.errors = errors
+
+
+def _source_version(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _cache_path(path, version, cache_dir):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, name), f"{version[0]}-{version[1]}"
+
+
+def write_columnar_cache(path, df, version=None, cache_dir=CACHE_DIR):
+    """Write ``df`` as one .npy file per column next to a JSON manifest.
+
+    String and categorical columns are dictionary encoded (codes array plus
+    the category list in the manifest). The cache directory is named after
+    the source file's (mtime, size), so a changed CSV never matches it.
+    """
+    version = version or _source_version(path)
+    base, name = _cache_path(path, version, cache_dir)
+    tmp = os.path.join(base, f".{name}.{os.getpid()}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+
+    columns = []
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        entry = {'name': str(column), 'file': f"{i}.npy", 'dtype': str(series.dtype)}
+        if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+            categorical = series.astype('category')
+            entry['categories'] = [str(c) for c in categorical.cat.categories]
+            values = categorical.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+        np.save(os.path.join(tmp, entry['file']), values, allow_pickle=False)
+        columns.append(entry)
+
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump({'format': CACHE_FORMAT, 'source': os.path.basename(path),
+                   'rows': len(df), 'columns': columns}, f)
+
+    final = os.path.join(base, name)
+    try:
+        os.rename(tmp, final)
+    except OSError:
+        # Another process published the same version first
+        shutil.rmtree(tmp, ignore_errors=True)
+    # Drop caches of older versions of this file
+    for other in os.listdir(base):
+        if other != name and not other.startswith('.'):
+            shutil.rmtree(os.path.join(base, other), ignore_errors=True)
+    return final
+
+
+def read_columnar_cache(path, version=None, cache_dir=CACHE_DIR):
+    """Load the cached frame for the current version of ``path``, or None.
+
+    Column files are memory-mapped, so loading costs little more than the
+    page faults for the columns actually touched.
+    """
+    version = version or _source_version(path)
+    base, name = _cache_path(path, version, cache_dir)
+    manifest_path = os.path.join(base, name, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != CACHE_FORMAT:
+        return None
+
+    data = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(base, name, entry['file']), mmap_mode='r')
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(np.asarray(values), entry['categories'])
+            if entry['dtype'] == 'object':
+                values = np.asarray(values, dtype=object)
+        data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def read_dataset(path, dtypes=None, cache_dir=CACHE_DIR):
+    """Read a CSV through the columnar cache, building the cache on first use."""
+    version = _source_version(path)
+    try:
+        df = read_columnar_cache(path, version, cache_dir)
+        if df is not None:
+            logger.info(f"Loaded {len(df)} records for {os.path.basename(path)} from columnar cache")
+            return df
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable columnar cache for {path}: {str(e)}")
+
+    df = pd.read_csv(path, dtype=dtypes)
+    logger.info(f"Parsed {len(df)} records from {os.path.basename(path)}")
+    try:
+        write_columnar_cache(path, df, version, cache_dir)
+    except Exception as e:
+        logger.warning(f"Could not write columnar cache for {path}: {str(e)}")
+    return df
+
+
+def _tail_mark(data):
+    return hashlib.sha1(data[-TAIL_CHECK_BYTES:]).hexdigest()
+
+
+def _read_mark(path, size):
+    with open(path, 'rb') as f:
+        f.seek(max(0, size - TAIL_CHECK_BYTES))
+        return _tail_mark(f.read(size - max(0, size - TAIL_CHECK_BYTES)))
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock shared by every process appending to the same file.
+
+    flock where there is fcntl, a lock on the first byte with msvcrt on
+    Windows; raises OSError on a platform with neither rather than let
+    appends from several processes interleave.
+    """
+    if fcntl is None and msvcrt is None:
+        raise OSError("No file locking available on this platform; refusing to append")
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK retries for about 10 seconds before giving up
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def append_frames(df, rows):
+    """``df`` followed by ``rows``, keeping categorical columns categorical."""
+    rows = rows.copy()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            known = set(df[column].cat.categories)
+            new = [c for c in pd.unique(rows[column].dropna()) if c not in known]
+            if new:
+                df = df.assign(**{column: df[column].cat.add_categories(new)})
+            rows[column] = pd.Categorical(rows[column], categories=df[column].cat.categories)
+    return pd.concat([df, rows], ignore_index=True)
+
+
+def validate_rows(rows, spec, existing):
+    """Check posted ``rows`` (a list of dicts) against a dataset ``spec``.
+
+    Every column except the id is required; numbers must be finite and
+    categories non-empty strings. Ids are assigned after the current
+    maximum when no row has one, otherwise every row needs a new unique
+    id. Returns the rows as a frame in file column order, or raises
+    IngestError listing the problems.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise IngestError(["Expected a non-empty list of rows"])
+    if not all(isinstance(row, dict) for row in rows):
+        raise IngestError(["Every row must be an object"])
+
+    dtypes = spec['dtypes']
+    id_column = spec.get('id')
+    errors = []
+    unknown = set().union(*rows) - set(dtypes)
+    if unknown:
+        errors.append(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+    frame = {}
+    for column, dtype in dtypes.items():
+        values = [row.get(column) for row in rows]
+        if column == id_column and all(v is None for v in values):
+            start = int(existing[column].max()) + 1 if len(existing) else 1
+            frame[column] = np.arange(start, start + len(rows))
+            continue
+        missing = [i for i, v in enumerate(values) if v is None or v == '']
+        if missing:
+            errors.append(f"{column} is missing in rows {missing[:10]}")
+            continue
+        if dtype == 'category':
+            bad = [i for i, v in enumerate(values) if not isinstance(v, str) or not v.strip()]
+            if bad:
+                errors.append(f"{column} must be a non-empty string in rows {bad[:10]}")
+            frame[column] = [v.strip() if isinstance(v, str) else v for v in values]
+            continue
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+        bad = np.flatnonzero(~np.isfinite(numbers))
+        if dtype == 'int64':
+            bad = np.union1d(bad, np.flatnonzero(np.isfinite(numbers) & (numbers != np.round(numbers))))
+        if len(bad):
+            errors.append(f"{column} must be a {'whole ' if dtype == 'int64' else ''}number in rows {bad[:10].tolist()}")
+            continue
+        frame[column] = numbers.astype(dtype)
+
+    if id_column in frame and not errors:
+        ids = frame[id_column]
+        if len(np.unique(ids)) != len(ids):
+            errors.append(f"{id_column} values must be unique")
+        taken = ids[np.isin(ids, existing[id_column].to_numpy())]
+        if len(taken):
+            errors.append(f"{id_column} already exists: {taken[:10].tolist()}")
+    if errors:
+        raise IngestError(errors)
+    return pd.DataFrame(frame, columns=list(dtypes))
+
+
+def _csv_rows(frame):
+    """``frame`` as header-less CSV lines ending in ``\\n`` on every platform and pandas version.
+
+    ``DataFrame.to_csv`` renamed its line terminator argument in pandas 1.5,
+    so the rows go through the csv module instead; missing values are empty.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+    return buffer.getvalue()
+
+
+class DatasetStore:
+    """Process-wide cache of the parsed datasets.
+
+    Each file is parsed once and kept in memory; it is only parsed again
+    when its mtime or size changes on disk. A file that only grew (its
+    previous last bytes are unchanged) is not parsed again: just the new
+    lines are read and added to the cached frame, and the row count of
+    every such version is kept so consumers can fold in only the rows
+    appended since the version they last saw. The frames are shared
+    between requests, so callers must treat them as read-only.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, datasets=DATASETS, cache_dir=None):
+        self.data_dir = data_dir
+        self.datasets = datasets
+        self.cache_dir = cache_dir or os.path.join(data_dir, '.cache')
+        # name -> (frame, version); swapped as one tuple so readers never
+        # see a frame paired with another file's version
+        self._frames = {}
+        # name -> hash of the last bytes of the cached version
+        self._marks = {}
+        # name -> {version: rows} for the versions reached by appending
+        self._lineage = {}
+        self._lock = threading.Lock()
+        self._append_lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.data_dir, self.datasets[name]['file'])
+
+    def _stat(self, name):
+        return _source_version(self.path(name))
+
+    def _parse(self, name):
+        return read_dataset(self.path(name), self.datasets[name]['dtypes'], self.cache_dir)
+
+    def get_versioned(self, name):
+        """Return ``(frame, version)`` for ``name``, re-parsing it if the file changed.
+
+        Returns ``(None, None)`` when the file is missing or cannot be parsed.
+        """
+        with metrics.phase('data_load'):
+            return self._get_versioned(name)
+
+    def _get_versioned(self, name):
+        try:
+            version = self._stat(name)
+        except OSError:
+            logger.error(f"Dataset file not found: {self.path(name)}")
+            return None, None
+
+        cached = self._frames.get(name)
+        if cached is not None and cached[1] == version:
+            return cached
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            cached = self._frames.get(name)
+            if cached is not None and cached[1] == version:
+                return cached
+            if cached is not None and version[1] > cached[1][1]:
+                grown = self._read_appended(name, cached, version)
+                if grown is not None:
+                    return grown
+            try:
+                df = self._parse(name)
+                mark = _read_mark(self.path(name), version[1])
+                if self._stat(name) != version:
+                    # Changed while parsing; the frame may hold more than ``version``
+                    mark = None
+            except Exception as e:
+                logger.error(f"Error loading dataset {name}: {str(e)}")
+                return cached if cached is not None else (None, None)
+            self._frames[name] = (df, version)
+            self._marks[name] = mark
+            self._lineage[name] = {version: len(df)}
+            return df, version
+
+    def _read_appended(self, name, cached, version):
+        """Add the lines appended after ``cached`` to it; None when the file was rewritten instead."""
+        df, old = cached
+        start = max(0, old[1] - TAIL_CHECK_BYTES)
+        try:
+            with open(self.path(name), 'rb') as f:
+                f.seek(start)
+                head = f.read(old[1] - start)
+                tail = f.read(version[1] - old[1])
+        except OSError:
+            return None
+        if _tail_mark(head) != self._marks.get(name) or not head.endswith(b'\n'):
+            return None
+        if len(tail) < version[1] - old[1] or not tail.endswith(b'\n'):
+            # A writer is mid-line; keep the old version and pick the rows up next time
+            return cached
+
+        dtypes = {column: ('object' if dtype == 'category' else dtype)
+                  for column, dtype in self.datasets[name]['dtypes'].items()}
+        try:
+            rows = pd.read_csv(io.BytesIO(tail), header=None, names=list(df.columns), dtype=dtypes)
+        except Exception as e:
+            logger.warning(f"Could not read rows appended to {name}, reloading it: {str(e)}")
+            return None
+        df = append_frames(df, rows)
+
+        lineage = self._lineage.setdefault(name, {})
+        lineage[version] = len(df)
+        if len(lineage) > MAX_LINEAGE:
+            del lineage[next(iter(lineage))]
+        self._frames[name] = (df, version)
+        self._marks[name] = _tail_mark(head + tail)
+        logger.info(f"Read {len(rows)} rows appended to {name} ({len(df)} total)")
+        return df, version
+
+    def appended_since(self, name, since, version):
+        """Row where the rows added between versions ``since`` and ``version`` start.
+
+        None unless both versions were reached from the same parse by
+        appending only, in which case ``frame.iloc[start:]`` (of the
+        ``version`` frame) are exactly the new rows.
+        """
+        lineage = self._lineage.get(name, {})
+        if since not in lineage or version not in lineage:
+            return None
+        start = lineage[since]
+        return start if start <= lineage[version] else None
+
+    def append(self, name, rows):
+        """Validate ``rows`` (a list of dicts) and append them to dataset ``name``.
+
+        The rows are written to the end of the CSV under an exclusive file
+        lock (so appends from several processes never interleave) and
+        fsynced before the cached frame picks them up. The columnar cache
+        is then rewritten for the new version of the file, so the next
+        process to start does not parse the whole CSV again. Returns the
+        new ``(frame, version)``; raises IngestError for invalid rows.
+        """
+        path = self.path(name)
+        with self._append_lock, _file_lock(path + '.lock'):
+            # Catch up with appends made by other processes first, so new ids do not clash
+            df, _ = self.get_versioned(name)
+            if df is None:
+                raise IngestError([f"Dataset {name} is not available"])
+            frame = validate_rows(rows, self.datasets[name], df)
+            with open(path, 'a+b') as f:
+                f.seek(0, os.SEEK_END)
+                prefix = b''
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    prefix = b'' if f.read(1) == b'\n' else b'\n'
+                f.write(prefix + _csv_rows(frame).encode())
+                f.flush()
+                os.fsync(f.fileno())
+            logger.info(f"Appended {len(frame)} rows to {name}")
+            df, version = self.get_versioned(name)
+            # Still under the file lock, so ``version`` is the file the frame was read from
+            if df is not None and version == self._stat(name):
+                try:
+                    write_columnar_cache(path, df, version, self.cache_dir)
+                except Exception as e:
+                    logger.warning(f"Could not write columnar cache for {path}: {str(e)}")
+            return df, version
+
+    def get(self, name):
+        """Return the cached frame for ``name`` or None if it cannot be loaded."""
+        return self.get_versioned(name)[0]
+
+    def version(self, name):
+        """(mtime_ns, size) of the currently cached copy, or None if not loaded."""
+        cached = self._frames.get(name)
+        return cached[1] if cached is not None else None
+
+    def get_farming_data(self):
+        return self.get('farming')
+
+    def get_market_data(self):
+        return self.get('market')
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._marks.clear()
+            self._lineage.clear()
+
+
+dataset_store = DatasetStore()
+
+
+def ingest(names=None):
+    """Build the columnar cache for every dataset ahead of the first request."""
+    for name in names or DATASETS:
+        path = os.path.join(DATA_DIR, DATASETS[name]['file'])
+        df = pd.read_csv(path, dtype=DATASETS[name]['dtypes'])
+        location = write_columnar_cache(path, df)
+        logger.info(f"Wrote columnar cache for {name} ({len(df)} records) to {location}")
+
+
+if __name__ == '__main__':
+    # python -m backend.database [dataset ...]
+    logging.basicConfig(level=logging.INFO)
+    ingest(sys.argv[1:] or None)
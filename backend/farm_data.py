@@ -0,0 +1,164 @@
+import hashlib
+
+import numpy as np
+
+try:
+    from .cache import LRUCache
+    from .compression import CompressedBody
+    from .metrics import metrics
+    from .serialization import dumps, frame_records
+except ImportError:
+    from cache import LRUCache
+    from compression import CompressedBody
+    from metrics import metrics
+    from serialization import dumps, frame_records
+
+# Chart defaults: points per line and bars per histogram, and their limits
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+DEFAULT_BINS = 20
+MAX_BINS = 200
+
+# payload key -> farming dataset column
+AVERAGE_COLUMNS = {
+    'soilph': 'Soil_pH',
+    'crop_yield': 'Crop_Yield_ton',
+    'fertilizer_usage': 'Fertilizer_Usage_kg',
+    'pesticide_usage': 'Pesticide_Usage_kg',
+    'sustainability': 'Sustainability_Score'
+}
+BINNED_COLUMNS = {
+    'soil_mixture': 'Soil_Moisture',
+    'temperature': 'Temperature_C',
+    'rainfall': 'Rainfall_mm'
+}
+SERIES_COLUMNS = {
+    'fertilizer': 'Fertilizer_Usage_kg',
+    'pesticide': 'Pesticide_Usage_kg'
+}
+
+
+def lttb(y, threshold):
+    """Positions of ``threshold`` points of ``y`` chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; every bucket in between keeps the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket, which preserves peaks and dips that
+    plain striding would drop. x is the row position.
+    """
+    n = len(y)
+    if threshold >= n or n < 3:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:max(threshold, 0)]
+
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (end + next_end - 1) / 2
+        avg_y = y[end:next_end].mean()
+        x = np.arange(start, end)
+        area = np.abs((a - avg_x) * (y[start:end] - y[a]) - (a - x) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def histogram(values, bins):
+    """``{"low-high": count}`` over ``bins`` equal-width bars, the shape the dashboard charts read."""
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    return {f"{low:.1f}-{high:.1f}": int(count) for low, high, count in zip(edges[:-1], edges[1:], counts)}
+
+
+def legacy_payload(df):
+    """The original /api/farm-data shape: every row, plus the two usage columns again as series."""
+    labels = df['Farm_ID'].to_numpy()
+    payload = _summary(df, DEFAULT_BINS)
+    payload['resource_usage'] = {
+        name: {'data': df[column].to_numpy(), 'labels': labels}
+        for name, column in SERIES_COLUMNS.items()
+    }
+    payload['raw_data'] = frame_records(df)
+    return payload
+
+
+def compact_payload(df, points=DEFAULT_POINTS, bins=DEFAULT_BINS):
+    """Version 2: summaries and chart-sized series only, each column sent once.
+
+    The usage series share one ``farm_id`` axis: the union of the rows
+    LTTB keeps for each of them at ``points`` points, so a chart gets at
+    most twice ``points`` rows and every peak of either line. Continuous
+    distributions are ``bins``-bar histograms. Rows for tables come from
+    /api/farming-data (paged, or ``format=columns``).
+    """
+    payload = {'version': 2, 'rows': len(df), 'points': points, 'bins': bins}
+    payload.update(_summary(df, bins))
+    columns = {name: df[column].to_numpy() for name, column in SERIES_COLUMNS.items()}
+    keep = np.unique(np.concatenate([lttb(values, points) for values in columns.values()]))
+    payload['series'] = dict({'farm_id': df['Farm_ID'].to_numpy()[keep]},
+                             **{name: values[keep] for name, values in columns.items()})
+    return payload
+
+
+def _summary(df, bins):
+    distributions = {'croptype': {str(k): int(v) for k, v in df['Crop_Type'].value_counts().items()}}
+    for name, column in BINNED_COLUMNS.items():
+        distributions[name] = histogram(df[column].to_numpy(dtype=float), bins)
+    return {
+        'averages': {name: float(df[column].mean()) for name, column in AVERAGE_COLUMNS.items()},
+        'distributions': distributions
+    }
+
+
+def chart_arg(args, name, default, limit):
+    """Integer query argument ``name`` clamped to 1..``limit``; ValueError if it is not a number."""
+    value = args.get(name)
+    if value is None or value == '':
+        return default
+    return max(1, min(int(value), limit))
+
+
+class FarmDataCache:
+    """Serialized (and, on demand, compressed) /api/farm-data bodies per dataset version.
+
+    Keyed by version and chart parameters, so dashboards polling with the
+    same chart size get the cached bytes until the dataset changes.
+    """
+
+    def __init__(self, store, dataset='farming', maxsize=64):
+        self.store = store
+        self.dataset = dataset
+        self._bodies = LRUCache(maxsize=maxsize)
+
+    def get(self, payload_version=1, points=DEFAULT_POINTS, bins=DEFAULT_BINS):
+        """CompressedBody for the current data, or None if the dataset is unavailable."""
+        df, version = self.store.get_versioned(self.dataset)
+        if df is None:
+            return None
+        key = (version, payload_version, points, bins)
+        body = self._bodies.get(key)
+        if body is None:
+            with metrics.phase('aggregation'):
+                if payload_version == 2:
+                    payload = compact_payload(df, points, bins)
+                else:
+                    payload = legacy_payload(df)
+            with metrics.phase('serialization'):
+                encoded = dumps(payload)
+            tag = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+            body = CompressedBody(encoded, tag)
+            self._bodies.put(key, body)
+        return body
+
+    def clear(self):
+        self._bodies.clear()
+
+    def stats(self):
+        return self._bodies.stats()
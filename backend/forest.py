@@ -0,0 +1,142 @@
+import os
+import logging
+
+import numpy as np
+import sklearn
+
+logger = logging.getLogger(__name__)
+
+# Trees used for inference (the first N of the forest); 0 uses them all.
+# Fewer trees answer faster at some cost in accuracy.
+FOREST_TREES = int(os.getenv('FOREST_TREES', 0))
+# Forests whose predict_proba is the mean of their trees' leaf distributions
+EXPORTABLE = ('RandomForestClassifier', 'ExtraTreesClassifier')
+
+# Before 1.4, tree values were sample counts that predict_proba normalized per call
+_NORMALIZE_LEAVES = tuple(int(part) for part in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+
+class FlatForest:
+    """Inference-only copy of a fitted RandomForestClassifier as flat NumPy arrays.
+
+    The nodes of all trees are stored back to back: the split ``feature``
+    and ``threshold`` of every node and its ``left``/``right`` children as
+    positions in the same arrays. Leaves point to themselves, so every
+    sample can take the same number of steps. ``leaf_of`` maps a node to
+    its row of ``leaf_proba``, the class probabilities of that leaf. A
+    batch is evaluated for all trees at once, with one gather per level of
+    depth instead of one Python call per tree.
+
+    Probabilities match the estimator's predict_proba exactly: features
+    are compared as float32 like sklearn's trees do, and the trees'
+    answers are added in tree order before dividing by the tree count.
+    Inputs must be finite.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_of, leaf_proba,
+                 node_starts, leaf_starts, depths, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_of = leaf_of
+        self.leaf_proba = leaf_proba
+        # Per-tree offsets into the node and leaf arrays (n_trees + 1 entries)
+        self.node_starts = node_starts
+        self.leaf_starts = leaf_starts
+        self.depths = depths
+        self.classes = classes
+
+    @property
+    def n_trees(self):
+        return len(self.node_starts) - 1
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.leaf_of,
+                                      self.leaf_proba, self.node_starts, self.leaf_starts, self.depths))
+
+    @classmethod
+    def from_estimator(cls, model):
+        n_classes = len(model.classes_)
+        parts = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'leaf_of', 'leaf_proba')}
+        node_starts, leaf_starts, depths = [0], [0], []
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            offset, leaf_offset = node_starts[-1], leaf_starts[-1]
+
+            parts['feature'].append(np.where(leaf, 0, tree.feature))
+            parts['threshold'].append(tree.threshold)
+            parts['left'].append(np.where(leaf, nodes, tree.children_left) + offset)
+            parts['right'].append(np.where(leaf, nodes, tree.children_right) + offset)
+            leaf_of = np.full(tree.node_count, -1)
+            leaf_of[leaf] = np.arange(leaf.sum()) + leaf_offset
+            parts['leaf_of'].append(leaf_of)
+
+            proba = tree.value[leaf, 0, :n_classes]
+            if _NORMALIZE_LEAVES:
+                # The same arithmetic DecisionTreeClassifier.predict_proba did on every call
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba = proba / normalizer
+            parts['leaf_proba'].append(proba)
+
+            node_starts.append(offset + tree.node_count)
+            leaf_starts.append(leaf_offset + int(leaf.sum()))
+            depths.append(tree.max_depth)
+
+        index = np.int32 if node_starts[-1] < 2 ** 31 else np.int64
+        return cls(
+            feature=np.concatenate(parts['feature']).astype(np.int32),
+            threshold=np.concatenate(parts['threshold']).astype(np.float64),
+            left=np.concatenate(parts['left']).astype(index),
+            right=np.concatenate(parts['right']).astype(index),
+            leaf_of=np.concatenate(parts['leaf_of']).astype(index),
+            leaf_proba=np.concatenate(parts['leaf_proba']).astype(np.float64),
+            node_starts=np.array(node_starts, dtype=np.int64),
+            leaf_starts=np.array(leaf_starts, dtype=np.int64),
+            depths=np.array(depths, dtype=np.int32),
+            classes=np.asarray(model.classes_)
+        )
+
+    def trees(self, n):
+        """The first ``n`` trees (all of them when ``n`` is 0 or too large), sharing these arrays."""
+        if not n or n >= self.n_trees:
+            return self
+        nodes, leaves = self.node_starts[n], self.leaf_starts[n]
+        return FlatForest(self.feature[:nodes], self.threshold[:nodes], self.left[:nodes], self.right[:nodes],
+                          self.leaf_of[:nodes], self.leaf_proba[:leaves], self.node_starts[:n + 1],
+                          self.leaf_starts[:n + 1], self.depths[:n], self.classes)
+
+    def apply(self, X):
+        """Leaf rows reached by every sample in every tree, shape ``(n_trees, n_samples)``."""
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.repeat(self.node_starts[:-1, np.newaxis], len(X), axis=1)
+        samples = np.arange(len(X))
+        for _ in range(int(self.depths.max(initial=0))):
+            go_left = X[samples, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.leaf_of[nodes]
+
+    def predict_proba(self, X):
+        # Summing over the leading axis adds tree by tree, in the estimator's order
+        proba = self.leaf_proba[self.apply(X)].sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
+
+
+def export_forest(model):
+    """FlatForest for a single-output RandomForestClassifier or ExtraTreesClassifier, else None."""
+    if type(model).__name__ not in EXPORTABLE or getattr(model, 'n_outputs_', 1) != 1:
+        return None
+    try:
+        return FlatForest.from_estimator(model)
+    except Exception as e:
+        logger.warning(f"Could not export the forest, using the estimator for inference: {str(e)}")
+        return None
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv(
+    'HISTORY_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.db')
+)
+# Oldest records beyond this many are deleted; 0 keeps everything
+HISTORY_MAX_ROWS = int(os.getenv('HISTORY_MAX_ROWS', 1000000))
+# Idle read connections kept open per process; busier moments open (and close) extra ones
+HISTORY_READ_CONNECTIONS = int(os.getenv('HISTORY_READ_CONNECTIONS', 4))
+PRUNE_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    input TEXT NOT NULL,
+    prediction TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions (created_at);
+"""
+
+
+class HistoryStore:
+    """Append-only prediction history in SQLite (WAL mode).
+
+    ``append`` only adds the record to a bounded in-memory tail; a background
+    thread writes the tail to SQLite in batches, so the request path never
+    waits on the disk. Queries read SQLite and merge in the records still
+    waiting in the tail. Memory stays bounded by ``max_pending`` however long
+    the process runs, and every worker process sees the same history.
+
+    Each process writes through one connection and reads through a pool of
+    at most ``read_connections`` idle ones, so the number of open
+    connections does not grow with the number of request threads. The
+    writer deletes the oldest rows beyond ``max_rows``.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH, batch_size=500, flush_interval=1.0,
+                 max_pending=10000, max_rows=HISTORY_MAX_ROWS, read_connections=HISTORY_READ_CONNECTIONS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_rows = max_rows
+        self.read_connections = read_connections
+        self._pending = deque()
+        # _lock guards _pending and the read pool; _write_lock guards the write
+        # connection and keeps a query from seeing a batch both in SQLite and
+        # in the tail while it is being written
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._writer_pid = None
+        # Connections are per process: one opened before a fork is not used after it
+        self._conn = None
+        self._conn_pid = None
+        self._readers = []
+        self._readers_pid = os.getpid()
+        self._pruned_at = None
+        self.dropped = 0
+        self.pruned = 0
+
+        conn = self._open()
+        conn.executescript(SCHEMA)
+        conn.close()
+        atexit.register(self.flush)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write_connection(self):
+        # Only used with _write_lock held
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = self._open()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _read_connection(self):
+        with self._lock:
+            if self._readers_pid != os.getpid():
+                self._readers, self._readers_pid = [], os.getpid()
+            conn = self._readers.pop() if self._readers else None
+        if conn is None:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+            with self._lock:
+                if self._readers_pid == os.getpid() and len(self._readers) < self.read_connections:
+                    self._readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so each worker process starts its own writer
+        if self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+            self._writer_pid = os.getpid()
+            self._writer.start()
+
+    def append(self, record):
+        """Queue ``record`` ({'date', 'input', 'prediction'}) for writing."""
+        self._ensure_writer()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"History tail full, dropped {self.dropped} records")
+                return
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def _write_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                while self._write_batch():
+                    pass
+            except Exception as e:
+                logger.error(f"Error writing prediction history: {str(e)}")
+
+    def _write_batch(self):
+        with self._write_lock:
+            with self._lock:
+                batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+            if not batch:
+                return False
+
+            conn = self._write_connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO predictions (created_at, input, prediction) VALUES (?, ?, ?)",
+                    [(r['date'], json.dumps(r['input']), str(r['prediction'])) for r in batch]
+                )
+            with self._lock:
+                for _ in batch:
+                    self._pending.popleft()
+            self._prune(conn)
+            return True
+
+    def _prune(self, conn):
+        """Delete the oldest rows beyond ``max_rows``, at most once every PRUNE_INTERVAL seconds."""
+        now = time.monotonic()
+        if not self.max_rows or (self._pruned_at is not None and now - self._pruned_at < PRUNE_INTERVAL):
+            return
+        self._pruned_at = now
+        with conn:
+            deleted = conn.execute(
+                "DELETE FROM predictions WHERE id <= "
+                "(SELECT id FROM predictions ORDER BY id DESC LIMIT 1 OFFSET ?)", (self.max_rows,)
+            ).rowcount
+        if deleted > 0:
+            self.pruned += deleted
+            logger.info(f"Deleted {deleted} prediction history records beyond HISTORY_MAX_ROWS={self.max_rows}")
+
+    def flush(self):
+        """Write every pending record now (used on shutdown)."""
+        while self._write_batch():
+            pass
+
+    def query(self, start=None, end=None, limit=100, offset=0, newest_first=True):
+        """Return ``(records, total)`` for the records with ``start <= date <= end``.
+
+        ``start``/``end`` are ISO timestamps compared as strings, which orders
+        correctly for the isoformat() dates the recommender writes.
+        """
+        where, params = [], []
+        if start is not None:
+            where.append("created_at >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("created_at <= ?")
+            params.append(end)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        order = "DESC" if newest_first else "ASC"
+        select = (f"SELECT created_at, input, prediction FROM predictions {clause} "
+                  f"ORDER BY id {order} LIMIT ? OFFSET ?")
+
+        with self._read_connection() as conn:
+            with self._write_lock:
+                # Open the read snapshot and copy the tail together, so a batch
+                # being written is in exactly one of them; the queries below
+                # run on that snapshot without holding up the writer
+                conn.execute("BEGIN")
+                conn.execute("SELECT 1 FROM predictions LIMIT 1").fetchall()
+                with self._lock:
+                    pending = [r for r in self._pending
+                               if (start is None or r['date'] >= start) and (end is None or r['date'] <= end)]
+            stored = conn.execute(f"SELECT COUNT(*) FROM predictions {clause}", params).fetchone()[0]
+
+            # Pending records are newer than anything in SQLite
+            if newest_first:
+                records = pending[::-1][offset:offset + limit]
+                remaining = limit - len(records)
+                if remaining > 0:
+                    rows = conn.execute(select, params + [remaining, max(0, offset - len(pending))]).fetchall()
+                    records += [self._row_to_record(row) for row in rows]
+            else:
+                rows = conn.execute(select, params + [limit, offset]).fetchall()
+                records = [self._row_to_record(row) for row in rows]
+                remaining = limit - len(records)
+                if remaining > 0:
+                    skip = max(0, offset - stored)
+                    records += pending[skip:skip + remaining]
+
+        return records, stored + len(pending)
+
+    def _row_to_record(self, row):
+        created_at, input_json, prediction = row
+        return {'date': created_at, 'input': json.loads(input_json), 'prediction': prediction}
@@ -0,0 +1,207 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .streaming import QueryError
+    from .metrics import metrics
+except ImportError:
+    from streaming import QueryError
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DATE_COLUMN = 'Date'
+
+
+class RangePredicate:
+    def __init__(self, column, low=None, high=None):
+        self.column = column
+        self.low = low
+        self.high = high
+
+
+class MemberPredicate:
+    def __init__(self, column, values):
+        self.column = column
+        self.values = values
+
+
+class FrameIndex:
+    """Sorted and bitmap indexes over one version of a dataset.
+
+    Numeric columns get a stable argsort (built lazily on first use) so a
+    range is two binary searches; categorical columns get one row-position
+    array per category. A query starts from the most selective predicate and
+    checks the remaining ones only on that candidate set, so it costs
+    O(log n + k) rather than a scan of the frame.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._sorted = {}
+        self._members = {}
+        self._lock = threading.Lock()
+
+    def _values(self, column):
+        series = self.df[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.values.astype('datetime64[ns]').astype('int64')
+        return series.to_numpy()
+
+    def _sorted_index(self, column):
+        index = self._sorted.get(column)
+        if index is None:
+            with self._lock:
+                index = self._sorted.get(column)
+                if index is None:
+                    values = self._values(column)
+                    order = np.argsort(values, kind='stable')
+                    index = (values[order], order, values)
+                    self._sorted[column] = index
+        return index
+
+    def _member_index(self, column):
+        index = self._members.get(column)
+        if index is None:
+            with self._lock:
+                index = self._members.get(column)
+                if index is None:
+                    codes = self.df[column].cat.codes.to_numpy()
+                    index = {
+                        category: np.flatnonzero(codes == code)
+                        for code, category in enumerate(self.df[column].cat.categories)
+                    }
+                    self._members[column] = index
+        return index
+
+    def _range_bounds(self, predicate):
+        sorted_values = self._sorted_index(predicate.column)[0]
+        lo = 0 if predicate.low is None else np.searchsorted(sorted_values, predicate.low, 'left')
+        hi = len(sorted_values) if predicate.high is None else np.searchsorted(sorted_values, predicate.high, 'right')
+        return lo, max(lo, hi)
+
+    def _estimate(self, predicate):
+        if isinstance(predicate, RangePredicate):
+            lo, hi = self._range_bounds(predicate)
+            return hi - lo
+        index = self._member_index(predicate.column)
+        return sum(len(index.get(value, ())) for value in predicate.values)
+
+    def _positions(self, predicate):
+        if isinstance(predicate, RangePredicate):
+            lo, hi = self._range_bounds(predicate)
+            return self._sorted_index(predicate.column)[1][lo:hi]
+        index = self._member_index(predicate.column)
+        parts = [index[value] for value in predicate.values if value in index]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _matches(self, predicate, positions):
+        if isinstance(predicate, RangePredicate):
+            values = self._sorted_index(predicate.column)[2][positions]
+            mask = np.ones(len(positions), dtype=bool)
+            if predicate.low is not None:
+                mask &= values >= predicate.low
+            if predicate.high is not None:
+                mask &= values <= predicate.high
+            return mask
+        series = self.df[predicate.column]
+        wanted = [series.cat.categories.get_loc(value) for value in predicate.values
+                  if value in series.cat.categories]
+        return np.isin(series.cat.codes.to_numpy()[positions], wanted)
+
+    def query(self, predicates):
+        """Return the sorted row positions matching every predicate."""
+        if not predicates:
+            return np.arange(len(self.df))
+
+        driver = min(predicates, key=self._estimate)
+        positions = self._positions(driver)
+        for predicate in predicates:
+            if predicate is not driver and len(positions):
+                positions = positions[self._matches(predicate, positions)]
+        return np.sort(positions)
+
+    def select(self, predicates):
+        if not predicates:
+            return self.df
+        with metrics.phase('index_query'):
+            return self.df.iloc[self.query(predicates)]
+
+
+class IndexCache:
+    """One FrameIndex per dataset, rebuilt when the store reloads the file."""
+
+    def __init__(self, store):
+        self.store = store
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get_versioned(self, dataset):
+        df, version = self.store.get_versioned(dataset)
+        if df is None:
+            return None, None
+
+        cached = self._indexes.get(dataset)
+        if cached is None or cached[1] != version:
+            with self._lock:
+                cached = self._indexes.get(dataset)
+                if cached is None or cached[1] != version:
+                    cached = (FrameIndex(df), version)
+                    self._indexes[dataset] = cached
+                    logger.info(f"Built index for {dataset} version {version}")
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+def _float_arg(args, name):
+    try:
+        return float(args[name])
+    except ValueError:
+        raise QueryError(f"{name} must be a number")
+
+
+def filters_from_args(args, df, date_column=DATE_COLUMN):
+    """Translate query arguments into predicates for FrameIndex.query.
+
+    ``<Column>_min``/``<Column>_max`` bound any numeric column, a categorical
+    column name takes a comma separated list of values (matched case
+    insensitively) and ``startDate``/``endDate`` bound ``date_column``.
+    Returns ``(predicates, ignored)`` where ``ignored`` lists arguments that
+    do not apply to this dataset.
+    """
+    predicates = []
+    ignored = []
+
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if args.get(column):
+                lookup = {str(c).lower(): c for c in series.cat.categories}
+                requested = [v.strip().lower() for v in args[column].split(',') if v.strip()]
+                predicates.append(MemberPredicate(column, [lookup[v] for v in requested if v in lookup]))
+        elif pd.api.types.is_numeric_dtype(series):
+            low = _float_arg(args, f"{column}_min") if args.get(f"{column}_min") else None
+            high = _float_arg(args, f"{column}_max") if args.get(f"{column}_max") else None
+            if low is not None or high is not None:
+                predicates.append(RangePredicate(column, low, high))
+
+    start_date = args.get('startDate')
+    end_date = args.get('endDate')
+    if start_date or end_date:
+        if date_column not in df.columns or not pd.api.types.is_datetime64_any_dtype(df[date_column]):
+            ignored.extend(name for name in ('startDate', 'endDate') if args.get(name))
+        else:
+            try:
+                low = pd.Timestamp(start_date).value if start_date else None
+                high = pd.Timestamp(end_date).value if end_date else None
+            except ValueError:
+                raise QueryError("startDate and endDate must be ISO dates")
+            predicates.append(RangePredicate(date_column, low, high))
+
+    return predicates, ignored
@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import queue
+import atexit
+import socket
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE = os.getenv('LOG_FILE', 'farm_advisor.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 'text' keeps the classic line format, 'json' writes one JSON object per line
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 50 * 1024 * 1024))
+LOG_ROTATE_SECONDS = int(os.getenv('LOG_ROTATE_SECONDS', 24 * 3600))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 7))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# Longer messages from pre-fork workers are cut to fit one datagram to the master
+LOG_FORWARD_MAX_CHARS = int(os.getenv('LOG_FORWARD_MAX_CHARS', 60000))
+# e.g. "INFO=0.1,DEBUG=0.01": keep that fraction of requests' records at each level
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+# Routes the sampling applies to (comma separated); empty means every request
+LOG_SAMPLE_ROUTES = os.getenv('LOG_SAMPLE_ROUTES', '')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+_request = contextvars.ContextVar('log_request', default=(None, None))
+
+
+def parse_sample_rates(spec):
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        level, _, rate = part.partition('=')
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Rotates when the file reaches ``maxBytes`` or is ``interval`` seconds old, whichever comes first."""
+
+    def __init__(self, filename, maxBytes=0, interval=0, backupCount=0, encoding='utf-8'):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request ID and route, and samples request records.
+
+    Attached to the queue handler, so it runs on the request thread where
+    the request context is still visible. Sampling is decided per request
+    ID, so a request keeps either all or none of its records at a sampled
+    level. Warnings and errors are only sampled if a rate is configured
+    for them.
+    """
+
+    def __init__(self, sample_rates=None, sample_routes=None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.sample_routes = set(sample_routes or ())
+
+    def filter(self, record):
+        request_id, route = _request.get()
+        record.request_id = request_id or '-'
+        record.route = route
+        rate = self.sample_rates.get(record.levelno)
+        if rate is None or request_id is None:
+            return True
+        if self.sample_routes and route not in self.sample_routes:
+            return True
+        return zlib.crc32(request_id.encode()) / 0xFFFFFFFF < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Resolve the message and traceback here; the listener thread only formats
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'route': getattr(record, 'route', None),
+            'pid': record.process
+        }
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = '-'
+        return super().format(record)
+
+
+# Record attributes sent from a worker to the master; everything else is recomputed there
+FORWARDED_FIELDS = ('name', 'levelno', 'levelname', 'msg', 'created', 'msecs', 'relativeCreated', 'pathname',
+                    'filename', 'module', 'lineno', 'funcName', 'process', 'processName', 'thread', 'threadName',
+                    'exc_text', 'request_id', 'route')
+
+
+class ForwardingHandler(logging.Handler):
+    """Sends each record as one JSON datagram to the process that owns the log file."""
+
+    def __init__(self, sock):
+        super().__init__()
+        self.sock = sock
+
+    def emit(self, record):
+        try:
+            entry = {field: getattr(record, field, None) for field in FORWARDED_FIELDS}
+            entry['msg'] = record.getMessage()[:LOG_FORWARD_MAX_CHARS]
+            if entry['exc_text']:
+                entry['exc_text'] = entry['exc_text'][:LOG_FORWARD_MAX_CHARS]
+            self.sock.send(json.dumps(entry, default=str).encode())
+        except Exception:
+            self.handleError(record)
+
+
+class LogCollector:
+    """Receives worker records in the master and queues them for its own handlers.
+
+    Only the master writes (and rotates) the log file; RotatingFileHandler
+    is not safe with several processes renaming the same file. Workers get
+    the sending end through ``forward_logs``.
+    """
+
+    def __init__(self):
+        self._receive, self.sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.set_inheritable(True)
+        self._thread = threading.Thread(target=self._run, name='log-collector', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                data = self._receive.recv(4 * LOG_FORWARD_MAX_CHARS + 4096)
+            except OSError:
+                return
+            try:
+                record = logging.makeLogRecord(json.loads(data))
+            except ValueError:
+                continue
+            if _queue_handler is not None and _queue_handler.queue is not None:
+                _queue_handler.enqueue(record)
+
+    def close(self):
+        self._receive.close()
+        self.sock.close()
+
+
+_listener = None
+_queue_handler = None
+_file_handlers = []
+
+
+def _start_listener(handlers):
+    global _listener
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread (and possibly its queue lock) did not survive the fork.
+    # The log file stays with the parent: a forked child logs to stderr only,
+    # or to its parent through forward_logs.
+    if _listener is not None:
+        _start_listener([h for h in _listener.handlers if h not in _file_handlers])
+
+
+def forward_logs(sock):
+    """Send this (forked) process's records to the LogCollector listening on the other end of ``sock``."""
+    if _listener is None:
+        return
+    _listener.stop()
+    _start_listener([ForwardingHandler(sock)])
+
+
+def configure_logging(log_file=LOG_FILE, level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Route all logging through a queue drained by one background thread.
+
+    Request threads only put a record on a bounded queue; formatting, file
+    writes and rotation happen on the listener thread. Safe to call more
+    than once: later calls return the existing setup.
+
+    The log file belongs to the process that called this. Forked children
+    drop the file handler (two processes rotating one file lose and
+    overwrite lines); the pre-fork server forwards its workers' records to
+    the master with LogCollector and forward_logs instead.
+    """
+    global _queue_handler
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        return _queue_handler
+
+    formatter = JsonFormatter() if fmt == 'json' else _TextFormatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        _file_handlers.append(SizeAndTimeRotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, interval=LOG_ROTATE_SECONDS, backupCount=LOG_BACKUP_COUNT))
+        handlers.extend(_file_handlers)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = NonBlockingQueueHandler(None)
+    _queue_handler.addFilter(RequestContextFilter(
+        parse_sample_rates(LOG_SAMPLE_RATES),
+        [r.strip() for r in LOG_SAMPLE_ROUTES.split(',') if r.strip()]
+    ))
+    _start_listener(handlers)
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    atexit.register(stop_logging)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    return _queue_handler
+
+
+def stop_logging():
+    """Drain the queue and stop the listener thread."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def bind_request_ids(app):
+    """Give every request of ``app`` an ID (taken from X-Request-ID when sent) for its log records."""
+    from flask import g, request
+
+    @app.before_request
+    def _bind_request_id():
+        request_id = request.headers.get('X-Request-ID', '')[:128] or uuid.uuid4().hex
+        route = request.url_rule.rule if request.url_rule is not None else None
+        g.request_id = request_id
+        g.log_token = _request.set((request_id, route))
+
+    @app.after_request
+    def _return_request_id(response):
+        request_id = getattr(g, 'request_id', None)
+        if request_id is not None:
+            response.headers['X-Request-ID'] = request_id
+        return response
+
+    @app.teardown_request
+    def _unbind_request_id(exc):
+        token = g.pop('log_token', None)
+        if token is not None:
+            _request.reset(token)
+
+    return app
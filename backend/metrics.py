@@ -0,0 +1,408 @@
+import os
+import json
+import time
+import atexit
+import random
+import cProfile
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second exports
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+# Fraction of requests to profile (0 disables); the X-Profile header is honoured
+# only when PROFILE_ALLOW_HEADER is set, so clients cannot trigger it by default
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_ALLOW_HEADER = os.getenv('PROFILE_ALLOW_HEADER', '') not in ('', '0', 'false')
+
+# Seconds between a pre-fork worker's metric snapshots (see MetricsDirectory)
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv('METRICS_SNAPSHOT_INTERVAL', 1.0))
+
+_current_route = contextvars.ContextVar('current_route', default='none')
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = ','.join(f'{k}="{str(v)}"' for k, v in labels)
+    return '{' + parts + '}'
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Histograms and counters are keyed by metric name and a sorted label
+    tuple. Collectors are callables that return gauge samples at scrape time
+    (used for cache statistics that live in other objects).
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        # Set in pre-fork workers: the snapshots of the other processes to merge in render()
+        self.shared = None
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_collector(self, collector):
+        """``collector()`` returns ``[(name, help, {labels: value})]`` gauge samples."""
+        self._collectors.append(collector)
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block as ``name`` within the current route."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('farm_advisor_phase_seconds', time.perf_counter() - started,
+                         phase=name, route=_current_route.get())
+
+    def timed_iter(self, name, iterable):
+        """Wrap a response generator so the time spent producing it counts as phase ``name``."""
+        # Capture the route now; the body is only iterated after the request hooks ran
+        return self._timed_iter(name, iterable, _current_route.get())
+
+    def _timed_iter(self, name, iterable, route):
+        elapsed = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield chunk
+        finally:
+            self.observe('farm_advisor_phase_seconds', elapsed, phase=name, route=route)
+
+    def reset(self):
+        """Drop recorded histograms and counters (a forked worker starts from zero)."""
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def snapshot(self, gauges=True):
+        """JSON-safe copy of the histograms, counters and, if ``gauges``, the collector samples."""
+        with self._lock:
+            histograms = [[name, labels, histogram.counts[:], histogram.sum, histogram.count]
+                          for (name, labels), histogram in self._histograms.items()]
+            counters = [[name, labels, value] for (name, labels), value in self._counters.items()]
+        return {'histograms': histograms, 'counters': counters,
+                'gauges': self._collect() if gauges else []}
+
+    def _collect(self):
+        samples = []
+        for collector in self._collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, help_text, values in collected:
+                samples.extend([name, help_text, labels, value] for labels, value in values.items())
+        return samples
+
+    def render(self):
+        if self.shared is None:
+            return self._render([self.snapshot()])
+        # Histograms and counters add up across workers; gauges keep a pid label each
+        own = dict(self.snapshot(), pid=os.getpid())
+        return self._render([own] + self.shared.snapshots(), by_pid=True)
+
+    def _render(self, snapshots, by_pid=False):
+        histogram_totals, counter_totals = _merge(snapshots)
+        histograms = sorted(histogram_totals.items(), key=_sort_key)
+        counters = sorted(counter_totals.items(), key=_sort_key)
+
+        lines = []
+        seen = set()
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        # Samples of one gauge can come from several collectors but must be rendered together
+        gauges = {}
+        for snapshot in snapshots:
+            pid = (('pid', snapshot['pid']),) if by_pid else ()
+            for name, help_text, labels, value in snapshot['gauges']:
+                gauges.setdefault(name, (help_text, {}))[1][tuple(map(tuple, labels)) + pid] = value
+        for name, (help_text, values) in gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values.items():
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(snapshots):
+    """Sum the histograms and counters of ``snapshots`` into registry-style dicts keyed by (name, labels)."""
+    histograms = {}
+    counters = {}
+    for snapshot in snapshots:
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = Histogram()
+            histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+            histogram.sum += total
+            histogram.count += count
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _sort_key(item):
+    # Label values mix ints (status) and strings between series, so compare them as text
+    (name, labels), _ = item
+    return name, [(key, str(value)) for key, value in labels]
+
+
+class MetricsDirectory:
+    """Metric snapshots of every pre-fork process in one directory.
+
+    Each worker serves /api/metrics from its own registry, so on its own a
+    scrape would report whichever worker accepted the connection. With a
+    MetricsDirectory, every worker writes its snapshot to the directory every
+    ``interval`` seconds (and when it exits) and merges the others' into what
+    it renders: counters and histograms are summed, gauges (cache statistics)
+    get a ``pid`` label per worker. Other workers' numbers are therefore up to
+    ``interval`` seconds old.
+
+    The master records its own metrics (preload phases) with ``publish`` and
+    folds the snapshot of each exited worker into ``retired.json`` with
+    ``retire``, so totals do not drop when a worker is replaced.
+    """
+
+    RETIRED = 'retired.json'
+
+    def __init__(self, directory, interval=METRICS_SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        # Name of this process's snapshot, once attached; render() uses the live registry instead
+        self.own = None
+        os.makedirs(directory, exist_ok=True)
+        # Snapshots left by an earlier run belong to processes that no longer exist
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(directory, name))
+
+    def _write(self, name, snapshot):
+        path = os.path.join(self.directory, f"{name}.json")
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(dict(snapshot, name=name), f)
+        # Readers see the old file or the new one, never a partial write
+        os.replace(f"{path}.tmp", path)
+
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.directory, filename)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def publish(self, registry=None):
+        """Write this process's histograms and counters (used by the master)."""
+        registry = registry or metrics
+        self._write(f"{os.getpid()}-master", dict(registry.snapshot(gauges=False), pid=os.getpid()))
+
+    def attach(self, registry=None):
+        """Make a freshly forked worker write its snapshot here and merge the others' when rendering."""
+        registry = registry or metrics
+        # Anything recorded before the fork is the master's, which publishes it itself
+        registry.reset()
+        registry.shared = self
+        pid = os.getpid()
+        # Unique even if the pid of an earlier worker is reused
+        name = self.own = f"{pid}-{time.time_ns()}"
+
+        def write():
+            self._write(name, dict(registry.snapshot(), pid=pid))
+
+        def loop():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    write()
+                except OSError as e:
+                    logger.error(f"Failed to write metrics snapshot: {str(e)}")
+        write()
+        threading.Thread(target=loop, name='metrics-snapshot', daemon=True).start()
+        atexit.register(write)
+
+    def snapshots(self):
+        """Snapshots of every other process, plus the retired workers' totals."""
+        found = []
+        # Worker files before retired.json: retire() lists a file there before deleting it,
+        # so a snapshot read here is either listed (and skipped) or not yet counted
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json') and filename != self.RETIRED:
+                snapshot = self._read(filename)
+                if snapshot is not None and snapshot['name'] != self.own:
+                    found.append(snapshot)
+        retired = self._read(self.RETIRED)
+        if retired is None:
+            return found
+        names = set(retired['names'])
+        return [s for s in found if s['name'] not in names] + [dict(retired, gauges=[])]
+
+    def retire(self, pid):
+        """Fold the snapshots of exited worker ``pid`` into the retired totals (master only)."""
+        filenames = [f for f in os.listdir(self.directory) if f.startswith(f"{pid}-") and f.endswith('.json')]
+        snapshots = [s for s in map(self._read, filenames) if s is not None]
+        if not snapshots:
+            return
+        retired = self._read(self.RETIRED) or {'histograms': [], 'counters': [], 'names': []}
+        totals = MetricsRegistry()
+        totals._histograms, totals._counters = _merge([retired] + snapshots)
+        # Listed only while the file may still be read by a scrape in progress
+        existing = set(os.listdir(self.directory))
+        names = [n for n in retired['names'] if f"{n}.json" in existing] + [s['name'] for s in snapshots]
+        self._write(self.RETIRED[:-len('.json')], dict(totals.snapshot(gauges=False), names=names, pid=None))
+        for filename in filenames:
+            os.remove(os.path.join(self.directory, filename))
+
+
+metrics = MetricsRegistry()
+metrics.describe('farm_advisor_request_duration_seconds', 'Request latency by route, including streamed bodies')
+metrics.describe('farm_advisor_requests_total', 'Requests by route, method and status')
+metrics.describe('farm_advisor_phase_seconds',
+                 'Time spent in data loading, aggregation, inference and serialization by route')
+
+
+def cache_collector(name, stats_fn):
+    """Collector exposing the hit/miss counters of a cache's ``stats()`` dict."""
+    def collect():
+        stats = stats_fn()
+        return [
+            (f'farm_advisor_cache_{key}', f'Cache {key} by cache', {(('cache', name),): value})
+            for key, value in stats.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        ]
+    return collect
+
+
+def _should_profile(request):
+    if PROFILE_ALLOW_HEADER and request.headers.get('X-Profile'):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _dump_profile(profiler, route):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{slug}.prof")
+    profiler.dump_stats(path)
+    logger.info(f"Wrote request profile to {path}")
+    return path
+
+
+def instrument(app, registry=metrics):
+    """Record per-route latency for ``app`` and serve ``/api/metrics``.
+
+    A sampled (PROFILE_SAMPLE_RATE) or explicitly requested (X-Profile with
+    PROFILE_ALLOW_HEADER) request runs under cProfile; the .prof file in
+    PROFILE_DIR can be opened with snakeviz or turned into a flamegraph.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        g.metrics_route = route
+        g.metrics_token = _current_route.set(route)
+        g.metrics_started = time.perf_counter()
+        g.metrics_profiler = None
+        if _should_profile(request):
+            g.metrics_profiler = cProfile.Profile()
+            g.metrics_profiler.enable()
+
+    @app.after_request
+    def _record(response):
+        route = getattr(g, 'metrics_route', 'unmatched')
+        started = getattr(g, 'metrics_started', None)
+        profiler = getattr(g, 'metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            response.headers['X-Profile-Path'] = _dump_profile(profiler, route)
+        token = getattr(g, 'metrics_token', None)
+        if token is not None:
+            _current_route.reset(token)
+        if started is None:
+            return response
+
+        method, status = request.method, response.status_code
+
+        # Streamed bodies are produced after this hook, so stop the clock on close
+        def finish():
+            registry.observe('farm_advisor_request_duration_seconds', time.perf_counter() - started,
+                             route=route, method=method)
+            registry.inc('farm_advisor_requests_total', route=route, method=method, status=status)
+        response.call_on_close(finish)
+        return response
+
+    @app.route('/api/metrics')
+    def get_metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,295 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+try:
+    from .forest import FOREST_TREES, export_forest
+    from .recommender import soil_types
+except ImportError:
+    from forest import FOREST_TREES, export_forest
+    from recommender import soil_types
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.getenv('MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+# Bump when the artifact layout changes so old files are retrained instead of misread
+ARTIFACT_FORMAT = 1
+MODEL_PATH = os.path.join(MODEL_DIR, f'crop_model.v{ARTIFACT_FORMAT}.joblib')
+TARGET_COLUMN = 'recommended_crop'
+# Estimator and parameters chosen by model selection (python -m backend select-model --apply)
+SELECTED_MODEL_PATH = os.path.join(MODEL_DIR, 'selected_model.json')
+
+ESTIMATORS = {
+    'random_forest': RandomForestClassifier,
+    'extra_trees': ExtraTreesClassifier
+}
+
+DEFAULT_MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'random_state': 42,
+    'class_weight': 'balanced'
+}
+
+# The API takes categories; farm readings are mapped to them by these upper bounds
+# (the last band is open). Soil type is the recommender's Soil_Moisture band.
+FEATURE_BANDS = {
+    'water_availability': ('Soil_Moisture', [20, 35], ['low', 'medium', 'high']),
+    'temperature': ('Temperature_C', [20, 28], ['cool', 'moderate', 'warm']),
+    'rainfall': ('Rainfall_mm', [120, 220], ['low', 'medium', 'high'])
+}
+
+
+def training_data_hash(df):
+    """Stable content hash of a training frame (values, column names and order)."""
+    digest = hashlib.sha256()
+    digest.update(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def farm_training_frame(farming_data):
+    """Training rows for the crop model from the farm dataset: the inputs as categories, Crop_Type as target."""
+    frame = pd.DataFrame({'soil_type': soil_types(farming_data['Soil_Moisture'])})
+    for feature, (column, bounds, labels) in FEATURE_BANDS.items():
+        values = farming_data[column].to_numpy(dtype=float)
+        frame[feature] = np.asarray(labels, dtype=object)[np.searchsorted(bounds, values, side='right')]
+    frame[TARGET_COLUMN] = farming_data['Crop_Type'].astype(str).str.lower().to_numpy()
+    # Rows without a reading (or outside every soil band) cannot be placed in a category
+    valid = frame['soil_type'].notna().to_numpy() & farming_data[
+        [column for column, _, _ in FEATURE_BANDS.values()]].notna().all(axis=1).to_numpy()
+    return frame[valid].reset_index(drop=True)
+
+
+def load_selected_model(path=SELECTED_MODEL_PATH):
+    """``(estimator, params)`` saved by model selection, or the defaults if there is no selection."""
+    try:
+        with open(path) as f:
+            selected = json.load(f)
+        if selected['estimator'] in ESTIMATORS:
+            return selected['estimator'], dict(selected['params'])
+        logger.warning(f"Ignoring {path}: unknown estimator {selected['estimator']!r}")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable model selection {path}: {str(e)}")
+    return 'random_forest', {}
+
+
+def save_selected_model(estimator, params, path=SELECTED_MODEL_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'estimator': estimator, 'params': params}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    logger.info(f"Selected {estimator} with {params} for training")
+
+
+def prepare_features(data, target=TARGET_COLUMN):
+    """Encode and scale ``data`` for training.
+
+    Returns ``(X_scaled, y, feature_columns, label_encoders, encoder_tables, scaler)``.
+    """
+    X = data.drop(target, axis=1)
+    y = data[target]
+
+    # Encode categorical variables
+    label_encoders = {}
+    encoder_tables = {}
+    for column in X.select_dtypes(include=['object']).columns:
+        label_encoders[column] = LabelEncoder()
+        X[column] = label_encoders[column].fit_transform(X[column])
+        # Sorted class array used to encode whole batches with searchsorted
+        encoder_tables[column] = label_encoders[column].classes_.astype(str)
+
+    # Scale features
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X.to_numpy(dtype=float))
+    return X_scaled, y, list(X.columns), label_encoders, encoder_tables, scaler
+
+
+def holdout_split(y, holdout, random_state=None):
+    """``(train, test)`` row positions holding out a ``holdout`` share of ``y``.
+
+    The split is stratified when every class has two rows or more. No
+    rows are held out when the test or training part could not contain
+    every class.
+    """
+    n = len(y)
+    n_test = int(round(n * holdout))
+    n_classes = y.nunique()
+    if n_test < n_classes or n - n_test < n_classes:
+        return np.arange(n), np.arange(0)
+    stratify = y if y.value_counts().min() >= 2 else None
+    return train_test_split(np.arange(n), test_size=n_test, random_state=random_state, stratify=stratify)
+
+
+def train_artifact(data, target=TARGET_COLUMN, model_params=None, holdout=0.0, estimator=None):
+    """Fit encoders, scaler and forest on ``data`` and return them as one artifact dict.
+
+    The estimator and its parameters default to the saved model selection
+    (see load_selected_model); ``model_params`` override them. With
+    ``holdout`` the forest is fitted on the rest of the rows and its
+    accuracy on the held out ones is recorded under ``'validation'``.
+    """
+    X_scaled, y, feature_columns, label_encoders, encoder_tables, scaler = prepare_features(data, target)
+
+    selected_estimator, selected_params = load_selected_model()
+    estimator = estimator or selected_estimator
+    params = dict(DEFAULT_MODEL_PARAMS)
+    params.update(selected_params)
+    params.update(model_params or {})
+    train, test = holdout_split(y, holdout, params.get('random_state'))
+    model = ESTIMATORS[estimator](**params)
+    model.fit(X_scaled[train], y.iloc[train])
+    validation = {
+        'holdout_rows': len(test),
+        'accuracy': float(model.score(X_scaled[test], y.iloc[test])) if len(test) else None
+    }
+    # Training parallelism is no help when scoring a handful of rows per request
+    if 'n_jobs' in params:
+        model.n_jobs = None
+        params.pop('n_jobs')
+
+    data_hash = training_data_hash(data)
+    trained_at = datetime.now()
+    return {
+        'format': ARTIFACT_FORMAT,
+        'model_version': f"{data_hash[:12]}-{trained_at.strftime('%Y%m%d%H%M%S')}",
+        'trained_at': trained_at.isoformat(),
+        'data_hash': data_hash,
+        'estimator': estimator,
+        'model_params': params,
+        'feature_columns': feature_columns,
+        'classes': [str(c) for c in model.classes_],
+        'label_encoders': label_encoders,
+        'encoder_tables': encoder_tables,
+        'scaler': scaler,
+        'model': model,
+        # Flat arrays the server predicts with; the estimator is kept for tooling
+        'forest': export_forest(model),
+        'validation': validation
+    }
+
+
+class ModelState:
+    """Everything needed to score inputs with one trained model.
+
+    Never changed after creation: a new model is swapped in by replacing
+    the whole state, so a request that took a reference keeps scoring with
+    one consistent model, encoders and scaler.
+    """
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.version = artifact['model_version']
+        self.model = artifact['model']
+        self.scaler = artifact['scaler']
+        self.feature_columns = artifact['feature_columns']
+        self.label_encoders = artifact['label_encoders']
+        self.encoder_tables = artifact['encoder_tables']
+        self.classes = self.model.classes_
+        # Artifacts saved before the export existed get it here
+        forest = artifact.get('forest')
+        if forest is None:
+            forest = export_forest(self.model)
+        self.forest = forest.trees(FOREST_TREES) if forest is not None else None
+        # transform() validates its input on every call; this is the same arithmetic
+        if getattr(self.scaler, 'with_mean', False) and getattr(self.scaler, 'with_std', False):
+            self._mean, self._scale = self.scaler.mean_, self.scaler.scale_
+        else:
+            self._mean = self._scale = None
+
+    def encode(self, inputs):
+        """Feature matrix for a list of input dicts plus a per-input error (or None)."""
+        X = np.zeros((len(inputs), len(self.feature_columns)))
+        errors = [None] * len(inputs)
+
+        for j, column in enumerate(self.feature_columns):
+            raw = [item.get(column) if isinstance(item, dict) else None for item in inputs]
+            table = self.encoder_tables.get(column)
+            if table is None:
+                values = pd.to_numeric(pd.Series(raw, dtype=object), errors='coerce').to_numpy(dtype=float)
+                known = ~np.isnan(values)
+                X[:, j] = np.where(known, values, 0)
+            else:
+                values = np.array(['' if v is None else str(v) for v in raw])
+                codes = np.minimum(np.searchsorted(table, values), len(table) - 1)
+                known = table[codes] == values
+                X[:, j] = codes
+
+            for i in np.flatnonzero(~known):
+                if errors[i] is None:
+                    errors[i] = f"Invalid or missing value for {column}: {raw[i]!r}"
+        return X, errors
+
+    def predict_proba(self, X):
+        if self._mean is not None:
+            X = (np.asarray(X, dtype=float) - self._mean) / self._scale
+        else:
+            X = self.scaler.transform(X)
+        if self.forest is not None:
+            return self.forest.predict_proba(X)
+        return self.model.predict_proba(X)
+
+    def inference(self):
+        if self.forest is None:
+            return {'engine': 'estimator'}
+        return {'engine': 'flat_forest', 'trees': self.forest.n_trees,
+                'of_trees': len(self.model.estimators_), 'bytes': self.forest.nbytes}
+
+    def accuracy(self, data, target=TARGET_COLUMN):
+        """Share of ``data`` rows predicted correctly; rows it cannot encode count as wrong."""
+        if not len(data):
+            return None
+        X, errors = self.encode(data.drop(target, axis=1).to_dict('records'))
+        valid = np.flatnonzero([error is None for error in errors])
+        if not len(valid):
+            return 0.0
+        predicted = self.classes[self.predict_proba(X[valid]).argmax(axis=1)]
+        actual = data[target].to_numpy()[valid]
+        return float((predicted.astype(str) == actual.astype(str)).sum() / len(data))
+
+
+def save_artifact(artifact, path=MODEL_PATH):
+    """Write the artifact uncompressed (so it can be memory-mapped) and swap it in atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved model {artifact['model_version']} to {path}")
+
+
+def load_artifact(path=MODEL_PATH, data_hash=None, mmap_mode='r'):
+    """Load a saved artifact, or return None if it is missing, stale or unreadable.
+
+    Arrays are memory-mapped read-only so workers forked from the same file
+    share those pages. Passing ``data_hash`` rejects artifacts trained on
+    different data.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        artifact = joblib.load(path, mmap_mode=mmap_mode)
+    except Exception as e:
+        logger.error(f"Error loading model artifact {path}: {str(e)}")
+        return None
+
+    if not isinstance(artifact, dict) or artifact.get('format') != ARTIFACT_FORMAT:
+        logger.warning(f"Ignoring model artifact {path} with unknown format")
+        return None
+    if data_hash is not None and artifact.get('data_hash') != data_hash:
+        logger.info(f"Model artifact {path} was trained on different data, retraining")
+        return None
+
+    logger.info(f"Loaded model {artifact['model_version']} from {path}")
+    return artifact
@@ -0,0 +1,306 @@
+"""Cross-validated hyperparameter search for the crop model.
+
+    python -m backend select-model                      search, write the report
+    python -m backend select-model --apply              ...and train with the choice from now on
+    python -m backend select-model --data farms.csv --target Crop_Type
+
+Every (candidate, fold) fit runs on a process pool, one tree-building
+thread per process so the pool uses every core. Fold scores are cached on
+disk keyed by the training data hash, the estimator and its parameters
+and the fold layout, so a rerun (or a wider grid) only fits what is new.
+Each candidate is then refitted on all rows to measure what serving it
+costs: pickled size, flat export size and single-row and batch latency on
+the path the server predicts with (cached too, so timings are from the
+machine that first ran them). The report ranks candidates by
+accuracy and picks the fastest one within SELECTION_TOLERANCE of the best.
+"""
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import sklearn
+from sklearn.model_selection import KFold, StratifiedKFold
+
+try:
+    from .forest import export_forest
+    from .model import (DEFAULT_MODEL_PARAMS, ESTIMATORS, MODEL_DIR, TARGET_COLUMN, prepare_features,
+                        training_data_hash)
+except ImportError:
+    from forest import export_forest
+    from model import (DEFAULT_MODEL_PARAMS, ESTIMATORS, MODEL_DIR, TARGET_COLUMN, prepare_features,
+                       training_data_hash)
+
+logger = logging.getLogger(__name__)
+
+SELECTION_DIR = os.getenv('SELECTION_DIR', os.path.join(MODEL_DIR, 'selection'))
+SELECTION_FOLDS = int(os.getenv('SELECTION_FOLDS', 5))
+SELECTION_WORKERS = int(os.getenv('SELECTION_WORKERS', 0)) or os.cpu_count() or 1
+# Candidates within this much accuracy of the best compete on latency
+SELECTION_TOLERANCE = float(os.getenv('SELECTION_TOLERANCE', 0.01))
+BATCH_ROWS = 256
+
+# estimator -> parameter -> values tried; DEFAULT_MODEL_PARAMS fills the rest
+SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 10, 20],
+        'min_samples_leaf': [1, 5]
+    },
+    'extra_trees': {
+        'n_estimators': [100, 200],
+        'max_depth': [None, 20],
+        'min_samples_leaf': [1, 5]
+    }
+}
+
+
+def candidates(space=SEARCH_SPACE):
+    """``[(estimator, params)]`` for every combination in ``space``."""
+    result = []
+    for estimator, grid in space.items():
+        names = sorted(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            result.append((estimator, dict(DEFAULT_MODEL_PARAMS, **dict(zip(names, values)))))
+    return result
+
+
+def fold_key(data_hash, estimator, params, folds, fold):
+    """Cache key for one fold score: data, estimator and parameters, fold layout and library version."""
+    blob = json.dumps([data_hash, estimator, params, folds, fold, sklearn.__version__], sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class FoldCache:
+    """Fold scores as small JSON files, written atomically so parallel runs cannot corrupt them."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+
+def split_folds(y, folds, random_state=DEFAULT_MODEL_PARAMS['random_state']):
+    """``[(train, test)]`` row positions; stratified when every class has ``folds`` rows or more."""
+    folds = max(2, min(folds, len(y)))
+    if y.value_counts().min() >= folds:
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+    else:
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=random_state)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+
+# Training rows of the worker processes, sent once per process rather than once per task
+_X = _y = None
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+
+def _fit(estimator, params, rows=None):
+    model = ESTIMATORS[estimator](**dict(params, n_jobs=1))
+    started = time.perf_counter()
+    if rows is None:
+        model.fit(_X, _y)
+    else:
+        model.fit(_X[rows], _y[rows])
+    elapsed = time.perf_counter() - started
+    model.n_jobs = None
+    return model, elapsed
+
+
+def _score_fold(estimator, params, train, test):
+    model, fit_seconds = _fit(estimator, params, train)
+    return {'accuracy': float(model.score(_X[test], _y[test])), 'fit_seconds': fit_seconds}
+
+
+def _fit_full(estimator, params):
+    model, fit_seconds = _fit(estimator, params)
+    return pickle.dumps(model), fit_seconds
+
+
+def _median_ms(fn, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+
+def serving_costs(model, X, repeat=200):
+    """Size and latency of ``model`` on the server's inference path (the flat export when there is one)."""
+    forest = export_forest(model)
+    predict = forest.predict_proba if forest is not None else model.predict_proba
+    rows = X[np.arange(BATCH_ROWS) % len(X)]
+    return {
+        'engine': 'flat_forest' if forest is not None else 'estimator',
+        'model_bytes': len(pickle.dumps(model)),
+        'export_bytes': forest.nbytes if forest is not None else None,
+        'row_ms': _median_ms(predict, rows[:1], repeat),
+        'batch_ms': _median_ms(predict, rows, max(repeat // 10, 5)),
+        'nodes': int(sum(tree.tree_.node_count for tree in model.estimators_))
+    }
+
+
+def select_model(data, target=TARGET_COLUMN, space=SEARCH_SPACE, folds=SELECTION_FOLDS,
+                 workers=SELECTION_WORKERS, cache_dir=SELECTION_DIR, tolerance=SELECTION_TOLERANCE):
+    """Cross-validate every candidate in ``space`` on ``data`` and return the report dict.
+
+    Raises ValueError when ``data`` has fewer than ``folds`` rows per class,
+    too few for the fold scores to rank anything.
+    """
+    X, y, feature_columns, _, _, _ = prepare_features(data, target)
+    y = y.astype(str)
+    folds = max(2, folds)
+    if len(y) < folds * y.nunique():
+        raise ValueError(f"{len(y)} rows are too few for {folds}-fold cross-validation of {y.nunique()} classes "
+                         f"(need at least {folds * y.nunique()}); pass a larger training CSV with --data")
+    data_hash = training_data_hash(data)
+    splits = split_folds(y, folds)
+    layout = [len(splits), DEFAULT_MODEL_PARAMS['random_state'], target]
+    cache = FoldCache(os.path.join(cache_dir, 'folds'))
+    grid = candidates(space)
+
+    scores = {}
+    pending = []
+    for i, (estimator, params) in enumerate(grid):
+        for fold in range(len(splits)):
+            key = fold_key(data_hash, estimator, params, layout, fold)
+            cached = cache.get(key)
+            if cached is not None:
+                scores[i, fold] = cached
+            else:
+                pending.append((i, fold, key))
+    # Serving costs of the model fitted on every row, cached like the folds
+    costs = {}
+    refit = []
+    for i, (estimator, params) in enumerate(grid):
+        key = fold_key(data_hash, estimator, params, layout, 'full')
+        cached = cache.get(key)
+        if cached is not None:
+            costs[i] = cached
+        else:
+            refit.append((i, key))
+    logger.info(f"{len(grid)} candidates x {len(splits)} folds: {len(pending)} folds and {len(refit)} full fits "
+                f"to run on {workers} processes")
+
+    started = time.perf_counter()
+    fitted = {}
+    if pending or refit:
+        # Spawned, so the workers do not inherit server threads or locks
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(X, y.to_numpy())) as pool:
+            futures = {pool.submit(_score_fold, grid[i][0], grid[i][1], *splits[fold]): (i, fold, key)
+                       for i, fold, key in pending}
+            finals = {pool.submit(_fit_full, *grid[i]): (i, key) for i, key in refit}
+            # Cached as they finish, so an interrupted run keeps what it fitted
+            for future in as_completed(futures):
+                i, fold, key = futures[future]
+                scores[i, fold] = future.result()
+                cache.put(key, scores[i, fold])
+            for future in as_completed(finals):
+                fitted[finals[future]] = future.result()
+    # Timed here, one model at a time, so the pool does not skew the latencies
+    for (i, key), (model_bytes, fit_seconds) in fitted.items():
+        costs[i] = dict(serving_costs(pickle.loads(model_bytes), X), fit_seconds=fit_seconds)
+        cache.put(key, costs[i])
+    search_seconds = time.perf_counter() - started
+
+    results = []
+    for i, (estimator, params) in enumerate(grid):
+        accuracies = [scores[i, fold]['accuracy'] for fold in range(len(splits))]
+        result = {
+            'estimator': estimator,
+            'params': params,
+            'accuracy': float(np.mean(accuracies)),
+            'accuracy_std': float(np.std(accuracies)),
+            'fold_fit_seconds': float(np.mean([scores[i, fold]['fit_seconds'] for fold in range(len(splits))]))
+        }
+        result.update(costs[i])
+        results.append(result)
+    results.sort(key=lambda r: (-r['accuracy'], r['row_ms']))
+
+    best_accuracy = results[0]['accuracy']
+    contenders = [r for r in results if r['accuracy'] >= best_accuracy - tolerance]
+    chosen = min(contenders, key=lambda r: (r['row_ms'], r['batch_ms']))
+    return {
+        'data_hash': data_hash,
+        'target': target,
+        'rows': len(data),
+        'features': feature_columns,
+        'classes': int(y.nunique()),
+        'folds': len(splits),
+        'stratified': bool(y.value_counts().min() >= len(splits)),
+        'workers': workers,
+        'cached_folds': len(grid) * len(splits) - len(pending),
+        'fitted_folds': len(pending),
+        'fitted_full': len(refit),
+        'search_seconds': search_seconds,
+        'sklearn': sklearn.__version__,
+        'tolerance': tolerance,
+        'selected': {'estimator': chosen['estimator'], 'params': chosen['params']},
+        'results': results
+    }
+
+
+def format_report(report):
+    """Markdown table of a select_model report."""
+    lines = [
+        f"# Model selection: {report['rows']} rows, {report['classes']} classes, {report['folds']}-fold CV",
+        '',
+        f"Target `{report['target']}`, data hash `{report['data_hash'][:12]}`, scikit-learn {report['sklearn']}. "
+        f"{report['fitted_folds']} folds fitted and {report['cached_folds']} from cache, "
+        f"{report['fitted_full']} full fits, in {report['search_seconds']:.1f}s on {report['workers']} processes.",
+        '',
+        '| estimator | parameters | accuracy | ± | fit s | row ms | batch ms | model KB | export KB |',
+        '|---|---|---:|---:|---:|---:|---:|---:|---:|'
+    ]
+    for r in report['results']:
+        params = ', '.join(f"{k}={v}" for k, v in sorted(r['params'].items()) if DEFAULT_MODEL_PARAMS.get(k) != v
+                           or k in ('n_estimators', 'max_depth'))
+        export_kb = f"{r['export_bytes'] / 1024:.0f}" if r['export_bytes'] is not None else '-'
+        lines.append(f"| {r['estimator']} | {params} | {r['accuracy']:.4f} | {r['accuracy_std']:.4f} "
+                     f"| {r['fit_seconds']:.2f} | {r['row_ms']:.3f} | {r['batch_ms']:.3f} "
+                     f"| {r['model_bytes'] / 1024:.0f} | {export_kb} |")
+    selected = report['selected']
+    lines += ['', f"Selected (fastest single row within {report['tolerance']} of the best accuracy): "
+                  f"{selected['estimator']} {json.dumps(selected['params'], sort_keys=True)}", '']
+    return '\n'.join(lines)
+
+
+def write_report(report, directory=SELECTION_DIR):
+    """Write report.json and report.md to ``directory``; returns the Markdown path."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    path = os.path.join(directory, 'report.md')
+    with open(path, 'w') as f:
+        f.write(format_report(report))
+    return path
@@ -0,0 +1,259 @@
+import logging
+import threading
+
+import numpy as np
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# The farm dataset has no soil type, so each type is a Soil_Moisture band (percent),
+# low <= moisture < high; the bands are contiguous so every farm has exactly one type
+SOIL_MOISTURE_BANDS = {
+    'sandy': (0, 20),
+    'loamy': (20, 30),
+    'silt': (30, 38),
+    'clay': (38, 100)
+}
+SOIL_ALIASES = {'sand': 'sandy', 'loam': 'loamy', 'silty': 'silt'}
+
+# The market dataset rates seasonality Low/Medium/High rather than naming seasons
+SEASON_FACTORS = {
+    'spring': 'Medium',
+    'summer': 'High',
+    'fall': 'Medium',
+    'autumn': 'Medium',
+    'winter': 'Low',
+    'low': 'Low',
+    'medium': 'Medium',
+    'high': 'High'
+}
+
+ALL = 'all'
+# Share of the score that comes from expected revenue; the rest is sustainability
+REVENUE_WEIGHT = 0.6
+# A crop counts as optimal when it scores within this fraction of the best one
+OPTIMAL_SHARE = 0.9
+# Root zone depth used to turn a soil moisture deficit (percent) into litres per m²
+ROOT_ZONE_MM = 100
+MAX_RESULTS = 10
+
+
+def soil_types(moisture):
+    """Soil type of each Soil_Moisture value, or None outside every band."""
+    moisture = np.asarray(moisture, dtype=float)
+    types = np.full(len(moisture), None, dtype=object)
+    for soil, (low, high) in SOIL_MOISTURE_BANDS.items():
+        types[(moisture >= low) & (moisture < high)] = soil
+    return types
+
+
+def _farm_stats(df):
+    grouped = df.groupby('Crop_Type', observed=True)
+    stats = grouped.agg(
+        yield_ton=('Crop_Yield_ton', 'mean'),
+        sustainability=('Sustainability_Score', 'mean'),
+        soil_ph=('Soil_pH', 'mean'),
+        moisture=('Soil_Moisture', 'mean'),
+        rainfall=('Rainfall_mm', 'mean'),
+        farms=('Crop_Yield_ton', 'size')
+    )
+
+    # What the best quarter of farms for each crop do differently
+    cutoff = df['Crop_Type'].map(grouped['Crop_Yield_ton'].quantile(0.75)).astype(float)
+    top = df[df['Crop_Yield_ton'].to_numpy() >= cutoff.to_numpy()].groupby('Crop_Type', observed=True)
+    stats['target_moisture'] = top['Soil_Moisture'].mean()
+    stats['ph_low'] = top['Soil_pH'].quantile(0.25)
+    stats['ph_high'] = top['Soil_pH'].quantile(0.75)
+    stats['fertilizer'] = top['Fertilizer_Usage_kg'].mean()
+    stats['pesticide'] = top['Pesticide_Usage_kg'].mean()
+    return {str(crop): row for crop, row in stats.to_dict('index').items()}
+
+
+def _market_stats(df):
+    stats = df.groupby('Product', observed=True).agg(
+        price=('Market_Price_per_ton', 'mean'),
+        competitor_price=('Competitor_Price_per_ton', 'mean'),
+        demand=('Demand_Index', 'mean'),
+        supply=('Supply_Index', 'mean')
+    )
+    return {str(product): row for product, row in stats.to_dict('index').items()}
+
+
+class RecommendationTables:
+    """Per-crop lookup tables for one version of the farm and market datasets.
+
+    ``farm[soil][crop]`` holds yield, sustainability and growing conditions
+    for the farms in that soil band, ``market[factor][crop]`` the prices and
+    demand for that seasonal factor. Both include an ``'all'`` entry.
+    """
+
+    def __init__(self, farming_data, market_data):
+        moisture = farming_data['Soil_Moisture'].to_numpy()
+        soils = soil_types(moisture)
+        self.farm = {ALL: _farm_stats(farming_data)}
+        self.soil_moisture = {ALL: float(moisture.mean())}
+        for soil in SOIL_MOISTURE_BANDS:
+            band = farming_data[soils == soil]
+            self.farm[soil] = _farm_stats(band) if len(band) else {}
+            self.soil_moisture[soil] = float(band['Soil_Moisture'].mean()) if len(band) else None
+
+        factors = market_data['Seasonal_Factor'].astype(str)
+        self.market = {ALL: _market_stats(market_data)}
+        for factor in sorted(set(SEASON_FACTORS.values())):
+            self.market[factor] = _market_stats(market_data[(factors == factor).to_numpy()])
+
+        self.crops = sorted(self.farm[ALL])
+        self.baseline_yield = float(farming_data['Crop_Yield_ton'].mean())
+        self.baseline_rainfall = float(farming_data['Rainfall_mm'].mean())
+
+
+def resolve_soil(soil_type):
+    if not soil_type:
+        return ALL
+    soil = SOIL_ALIASES.get(soil_type.lower(), soil_type.lower())
+    if soil not in SOIL_MOISTURE_BANDS:
+        raise ValueError(f"Unknown soil type {soil_type!r}; expected one of {', '.join(SOIL_MOISTURE_BANDS)}")
+    return soil
+
+
+def resolve_season(season):
+    if not season:
+        return ALL
+    if not isinstance(season, str):
+        raise ValueError(f"season must be a string, not {season!r}")
+    factor = SEASON_FACTORS.get(season.lower())
+    if factor is None:
+        raise ValueError(f"Unknown season {season!r}; expected one of {', '.join(SEASON_FACTORS)}")
+    return factor
+
+
+def _confidence(score):
+    return int(round(100 * score))
+
+
+def _irrigation(crop, farm, soil_moisture):
+    deficit = max(0.0, farm['target_moisture'] - soil_moisture)
+    if deficit > 10:
+        days = 'Mon/Wed/Fri'
+    elif deficit > 3:
+        days = 'Mon/Thu'
+    elif deficit > 0:
+        days = 'Sat'
+    else:
+        return {'crop': crop, 'days': 'As needed', 'amount': 0.0}
+    sessions = days.count('/') + 1
+    return {'crop': crop, 'days': days, 'amount': round(deficit * ROOT_ZONE_MM / 100 / sessions, 1)}
+
+
+def _soil_treatment(farm, confidence):
+    actions = [
+        f"Maintain pH level at {farm['ph_low']:.1f}-{farm['ph_high']:.1f}",
+        f"Apply about {farm['fertilizer']:.0f} kg of fertilizer",
+        f"Keep pesticide use near {farm['pesticide']:.1f} kg"
+    ]
+    return [{'name': action, 'confidence': confidence} for action in actions]
+
+
+def generate_recommendations(tables, soil_type=None, season=None, limit=MAX_RESULTS):
+    """Rank crops by expected revenue and sustainability for a soil type and season.
+
+    Expected revenue is the soil band's mean yield times the season's mean
+    price, scaled by the demand/supply balance (clipped to 0.5-1.5). Only
+    the precomputed tables are read, so a request costs O(#crops).
+    Raises ValueError for an unknown soil type or season.
+    """
+    soil = resolve_soil(soil_type)
+    factor = resolve_season(season)
+    farm_table = tables.farm[soil]
+    market_table = tables.market[factor]
+
+    ranked = []
+    for crop in tables.crops:
+        farm = farm_table.get(crop)
+        market = market_table.get(crop) or tables.market[ALL].get(crop)
+        if farm is None or market is None:
+            continue
+        balance = float(np.clip(market['demand'] / market['supply'], 0.5, 1.5))
+        revenue = farm['yield_ton'] * market['price'] * balance
+        ranked.append([crop, revenue, farm, market])
+
+    if not ranked:
+        return {'stats': {'optimalCrops': 0, 'waterSavings': 0, 'yieldIncrease': 0},
+                'recommendations': {'crops': [], 'irrigation': [], 'soilTreatment': []},
+                'filters': {'soilType': soil, 'seasonalFactor': factor}}
+
+    best_revenue = max(row[1] for row in ranked)
+    for row in ranked:
+        row.append(REVENUE_WEIGHT * row[1] / best_revenue
+                   + (1 - REVENUE_WEIGHT) * row[2]['sustainability'] / 100)
+    ranked.sort(key=lambda row: row[4], reverse=True)
+    ranked = ranked[:limit]
+
+    _, _, best_farm, _, best_score = ranked[0]
+    soil_moisture = tables.soil_moisture[soil]
+    return {
+        'stats': {
+            'optimalCrops': sum(1 for row in ranked if row[4] >= OPTIMAL_SHARE * best_score),
+            'waterSavings': round(max(0.0, 100 * (1 - best_farm['rainfall'] / tables.baseline_rainfall)), 1),
+            'yieldIncrease': round(100 * (best_farm['yield_ton'] / tables.baseline_yield - 1), 1)
+        },
+        'recommendations': {
+            'crops': [
+                {
+                    'name': crop,
+                    'confidence': _confidence(score),
+                    'expectedRevenue': round(revenue, 2),
+                    'yield': round(farm['yield_ton'], 2),
+                    'price': round(market['price'], 2),
+                    'sustainability': round(farm['sustainability'], 1),
+                    'farms': int(farm['farms'])
+                }
+                for crop, revenue, farm, market, score in ranked
+            ],
+            'irrigation': [_irrigation(crop, farm, soil_moisture) for crop, _, farm, _, _ in ranked[:3]],
+            'soilTreatment': _soil_treatment(best_farm, _confidence(best_score))
+        },
+        'filters': {'soilType': soil, 'seasonalFactor': factor}
+    }
+
+
+class RecommendationEngine:
+    """Builds RecommendationTables once per pair of dataset versions."""
+
+    def __init__(self, store):
+        self.store = store
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def tables(self):
+        farming_data, farming_version = self.store.get_versioned('farming')
+        market_data, market_version = self.store.get_versioned('market')
+        if farming_data is None or market_data is None:
+            return None
+
+        versions = (farming_version, market_version)
+        cached = self._tables
+        if cached is None or cached[0] != versions:
+            with self._lock:
+                cached = self._tables
+                if cached is None or cached[0] != versions:
+                    with metrics.phase('aggregation'):
+                        cached = (versions, RecommendationTables(farming_data, market_data))
+                    self._tables = cached
+                    logger.info(f"Built recommendation tables for versions {versions}")
+        return cached[1]
+
+    def recommend(self, soil_type=None, season=None):
+        """Recommendations for the current data, or None if a dataset is unavailable."""
+        tables = self.tables()
+        if tables is None:
+            return None
+        return generate_recommendations(tables, soil_type, season)
+
+    def clear(self):
+        with self._lock:
+            self._tables = None
@@ -0,0 +1,241 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from .model import (MODEL_PATH, ModelState, holdout_split, load_artifact, save_artifact,
+                        train_artifact, training_data_hash, TARGET_COLUMN)
+except ImportError:
+    from model import (MODEL_PATH, ModelState, holdout_split, load_artifact, save_artifact,
+                       train_artifact, training_data_hash, TARGET_COLUMN)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for changed training data; 0 only retrains on request
+RETRAIN_INTERVAL = float(os.getenv('RETRAIN_INTERVAL', 0))
+# Seconds between checks for a model published by another process
+RETRAIN_POLL_SECONDS = float(os.getenv('RETRAIN_POLL_SECONDS', 30))
+RETRAIN_HOLDOUT = float(os.getenv('RETRAIN_HOLDOUT', 0.2))
+RETRAIN_N_JOBS = int(os.getenv('RETRAIN_N_JOBS', -1))
+# A candidate may score at most this much below the current model on the holdout
+RETRAIN_TOLERANCE = float(os.getenv('RETRAIN_TOLERANCE', 0.02))
+# Fewer holdout rows than this cannot tell a worse model from a better one
+RETRAIN_MIN_HOLDOUT = int(os.getenv('RETRAIN_MIN_HOLDOUT', 30))
+
+
+def train_candidate(data, path, holdout=RETRAIN_HOLDOUT, n_jobs=RETRAIN_N_JOBS):
+    """Train a model on ``data`` and save it next to ``path`` without replacing it.
+
+    Runs in the training process. The model currently at ``path`` is
+    scored on the same holdout rows so the caller can compare the two.
+    """
+    artifact = train_artifact(data, model_params={'n_jobs': n_jobs}, holdout=holdout)
+    validation = artifact['validation']
+
+    baseline_accuracy = None
+    current = load_artifact(path)
+    if current is not None and validation['holdout_rows']:
+        _, test = holdout_split(data[TARGET_COLUMN], holdout, artifact['model_params'].get('random_state'))
+        baseline_accuracy = ModelState(current).accuracy(data.iloc[test])
+
+    candidate = f"{path}.candidate"
+    save_artifact(artifact, candidate)
+    return {
+        'path': candidate,
+        'model_version': artifact['model_version'],
+        'holdout_rows': validation['holdout_rows'],
+        'accuracy': validation['accuracy'],
+        'baseline_version': current['model_version'] if current is not None else None,
+        'baseline_accuracy': baseline_accuracy
+    }
+
+
+class _TrainingLock:
+    """Non-blocking lock on a file, so only one process trains at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a')
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+
+    def release(self):
+        if self._file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class ModelRetrainer:
+    """Retrains the recommendation model in the background and swaps it in.
+
+    Training runs in a separate (spawned) process with ``n_jobs`` trees
+    fitted in parallel, so request threads never wait on it. A candidate
+    that scores within RETRAIN_TOLERANCE of the current model on the
+    holdout replaces the artifact file and becomes ``system.state``. None
+    is promoted when the holdout has fewer than RETRAIN_MIN_HOLDOUT rows;
+    requests already running keep the state they started with. Other
+    processes serving the same artifact file pick the new model up on
+    their next poll.
+    """
+
+    def __init__(self, system, path=MODEL_PATH, interval=RETRAIN_INTERVAL, poll=RETRAIN_POLL_SECONDS):
+        self.system = system
+        self.path = path
+        self.interval = interval
+        self.poll = poll
+        self.last_result = None
+        self._running = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_check = time.monotonic()
+        self._artifact_mtime = self._mtime()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self):
+        """Start the polling thread (again after a fork, where threads do not survive)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='model-retrainer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _after_fork(self):
+        self._running = threading.Lock()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.poll):
+            try:
+                self.reload_if_changed()
+                if self.interval and time.monotonic() - self._last_check >= self.interval:
+                    self._last_check = time.monotonic()
+                    data = self.system.load_data()
+                    if training_data_hash(data) != self.system.state.artifact['data_hash']:
+                        self.retrain(data)
+            except Exception as e:
+                logger.error(f"Model retraining check failed: {str(e)}")
+
+    def reload_if_changed(self):
+        """Swap in the artifact on disk if another process replaced it."""
+        mtime = self._mtime()
+        if mtime is None or mtime == self._artifact_mtime:
+            return False
+        self._artifact_mtime = mtime
+        artifact = load_artifact(self.path)
+        state = self.system.state
+        if artifact is None or (state is not None and artifact['model_version'] == state.version):
+            return False
+        self.system.apply_artifact(artifact)
+        logger.info(f"Switched to model {artifact['model_version']} published by another process")
+        return True
+
+    @property
+    def running(self):
+        return self._running.locked()
+
+    def trigger(self):
+        """Retrain on a background thread; False if a retrain is already running here."""
+        if not self._running.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._run, name='model-retrain', daemon=True).start()
+        return True
+
+    def _run(self):
+        try:
+            self._retrain(self.system.load_data())
+        except Exception as e:
+            logger.error(f"Model retraining failed: {str(e)}")
+            self.last_result = {'accepted': False, 'error': str(e)}
+        finally:
+            self._running.release()
+
+    def retrain(self, data):
+        """Train on ``data`` in a separate process and swap the model in if it validates."""
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            return self._retrain(data)
+        finally:
+            self._running.release()
+
+    def _retrain(self, data):
+        lock = _TrainingLock(f"{self.path}.lock")
+        if not lock.acquire():
+            logger.info("Another process is already retraining the model")
+            return None
+        try:
+            started = time.monotonic()
+            # spawn rather than fork: forking a threaded server can copy held locks
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(train_candidate, data, self.path).result()
+
+            result['seconds'] = round(time.monotonic() - started, 2)
+            baseline = result['baseline_accuracy']
+            if result['holdout_rows'] < RETRAIN_MIN_HOLDOUT:
+                result['accepted'] = False
+                result['reason'] = (f"holdout of {result['holdout_rows']} rows is below "
+                                    f"RETRAIN_MIN_HOLDOUT={RETRAIN_MIN_HOLDOUT}")
+            elif baseline is not None and result['accuracy'] < baseline - RETRAIN_TOLERANCE:
+                result['accepted'] = False
+                result['reason'] = (f"holdout accuracy {result['accuracy']:.3f} vs {baseline:.3f} "
+                                    f"for the current model")
+            else:
+                result['accepted'] = True
+            if not result['accepted']:
+                os.remove(result['path'])
+                logger.warning(f"Rejected model {result['model_version']}: {result['reason']}")
+            else:
+                os.replace(result['path'], self.path)
+                self._artifact_mtime = self._mtime()
+                artifact = load_artifact(self.path)
+                self.system.apply_artifact(artifact)
+                logger.info(f"Swapped in model {result['model_version']} after {result['seconds']}s "
+                            f"(holdout accuracy {result['accuracy']}, previous {baseline})")
+            self.last_result = result
+            return result
+        finally:
+            lock.release()
+
+    def status(self):
+        state = self.system.state
+        return {
+            'model_version': state.version if state is not None else None,
+            'inference': state.inference() if state is not None else None,
+            'running': self.running,
+            'interval': self.interval,
+            'last_result': self.last_result
+        }
@@ -0,0 +1,94 @@
+import json
+import math
+import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Frame layouts a client can ask for with ?format=
+FRAME_FORMATS = ('records', 'columns')
+
+
+def _default(obj):
+    """Encode the NumPy and pandas values the JSON encoders do not know natively."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return frame_columns(obj)
+    if isinstance(obj, (pd.Series, pd.Index, pd.Categorical)):
+        return _column(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, pd.Timestamp)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj):
+    """``obj`` with NaN and infinite floats replaced by None, as orjson writes them."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def _stdlib_dumps(obj, sort_keys=False):
+    """``obj`` as UTF-8 JSON bytes with the json module; non-finite floats become null."""
+    # allow_nan=False: a NaN that slipped through is an error rather than invalid JSON
+    return json.dumps(_finite(obj), default=lambda value: _finite(_default(value)), sort_keys=sort_keys,
+                      separators=(',', ':'), allow_nan=False).encode()
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj, sort_keys=False):
+        """``obj`` as UTF-8 JSON bytes; NumPy arrays and scalars are written without boxing."""
+        return orjson.dumps(obj, default=_default, option=_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+else:
+    # Fallback when orjson is not installed
+    dumps = _stdlib_dumps
+
+
+def _column(values):
+    """A column as something ``dumps`` writes directly: a numeric ndarray or a list."""
+    if isinstance(values, pd.Categorical) or isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        # Expanding the categories once is cheaper than boxing every value
+        categories = np.asarray(values.categories if isinstance(values, pd.Categorical)
+                                else values.cat.categories, dtype=object)
+        codes = values.codes if isinstance(values, pd.Categorical) else values.cat.codes.to_numpy()
+        return [None if code < 0 else str(categories[code]) for code in codes.tolist()]
+    array = np.asarray(values)
+    if orjson is not None and array.dtype.kind in 'biuf' and array.dtype.isnative and array.flags.c_contiguous:
+        return array
+    return array.tolist()
+
+
+def frame_columns(df):
+    """``{column: values}`` for ``df``."""
+    return {str(column): _column(df[column]) for column in df.columns}
+
+
+def frame_records(df):
+    """``[{column: value}, ...]`` for ``df``, built from column lists rather than row by row in pandas."""
+    names = [str(column) for column in df.columns]
+    columns = []
+    for column in df.columns:
+        values = _column(df[column])
+        columns.append(values.tolist() if isinstance(values, np.ndarray) else values)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def frame_payload(df, fmt='records'):
+    """``df`` as a list of records or, for ``fmt='columns'``, one array per column."""
+    if fmt == 'columns':
+        return {'columns': frame_columns(df), 'rows': len(df)}
+    return frame_records(df)
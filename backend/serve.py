@@ -0,0 +1,253 @@
+import os
+import gc
+import atexit
+import time
+import signal
+import shutil
+import socket
+import logging
+import tempfile
+import threading
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    from .logs import LogCollector, forward_logs
+    from .metrics import MetricsDirectory
+except ImportError:
+    from logs import LogCollector, forward_logs
+    from metrics import MetricsDirectory
+
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', 5000))
+WORKERS = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+GRACEFUL_TIMEOUT = float(os.getenv('GRACEFUL_TIMEOUT', 30))
+# Where workers share their metrics; a temporary directory when unset
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+
+class InFlightCounter:
+    """WSGI middleware counting requests whose response has not been closed yet."""
+
+    def __init__(self, app):
+        self.app = app
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _done(self):
+        with self._lock:
+            self.count -= 1
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.count += 1
+        try:
+            return ClosingIterator(self.app(environ, start_response), [self._done])
+        except BaseException:
+            self._done()
+            raise
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while self.count > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.count == 0
+
+
+class PreforkServer:
+    """Pre-fork WSGI server: one listening socket shared by ``workers`` processes.
+
+    ``preload()`` runs in the master before any worker is forked, so models
+    and datasets loaded there are shared copy-on-write. Each worker runs a
+    threaded WSGI server on the inherited socket.
+
+    Signals to the master:
+      SIGHUP           graceful restart: run ``reload()``, fork a new set of
+                       workers, then let the old ones finish their requests
+      SIGTERM/SIGINT   graceful shutdown, waiting up to ``graceful_timeout``
+                       for in-flight requests
+    Workers that die are replaced.
+
+    The master owns the log file: workers send their records to it over a
+    datagram socket (LogCollector), so only one process ever writes and
+    rotates the file. Metrics are shared the same way through a
+    MetricsDirectory, so /api/metrics on any worker reports the whole pool.
+    """
+
+    def __init__(self, app, host=HOST, port=PORT, workers=WORKERS,
+                 graceful_timeout=GRACEFUL_TIMEOUT, preload=None, reload=None, metrics_dir=METRICS_DIR):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.graceful_timeout = graceful_timeout
+        self.preload = preload
+        self.reload = reload or preload
+        self.generation = 0
+        self._children = {}
+        self._signals = []
+        self._stopping = False
+        self.sock = None
+        self.log_collector = None
+        self.metrics_dir = metrics_dir
+        self.shared_metrics = None
+
+    def bind(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(1024)
+        self.sock.set_inheritable(True)
+        # Every worker wakes for a new connection; the ones that lose the race must
+        # get EAGAIN from accept() rather than block there (and miss shutdown)
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+
+    def run(self):
+        self.bind()
+        self.log_collector = LogCollector()
+        self.shared_metrics = MetricsDirectory(self.metrics_dir or tempfile.mkdtemp(prefix='farm-advisor-metrics-'))
+        self._prepare(self.preload)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+
+        logger.info(f"Serving on {self.host}:{self.port} with {self.workers} workers (master pid {os.getpid()})")
+        self._spawn_generation()
+        try:
+            while self._children or not self._stopping:
+                self._handle_signals()
+                self._reap()
+                time.sleep(0.2)
+        finally:
+            self.sock.close()
+        logger.info("Server stopped")
+        self.log_collector.close()
+        if not self.metrics_dir:
+            shutil.rmtree(self.shared_metrics.directory, ignore_errors=True)
+
+    def _prepare(self, load):
+        if load is not None:
+            load()
+        self.shared_metrics.publish()
+        # Keep the collector from touching (and so copying) the preloaded objects in every worker
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+    def _spawn_generation(self):
+        self.generation += 1
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                forward_logs(self.log_collector.sock)
+                self.shared_metrics.attach()
+                self._worker()
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} failed: {str(e)}")
+                code = 1
+            finally:
+                # os._exit skips atexit, which flushes the history tail and the log queue
+                atexit._run_exitfuncs()
+                os._exit(code)
+        self._children[pid] = self.generation
+
+    def _handle_signals(self):
+        while self._signals:
+            signum = self._signals.pop(0)
+            if signum == signal.SIGHUP and not self._stopping:
+                self._restart()
+            elif signum in (signal.SIGTERM, signal.SIGINT) and not self._stopping:
+                logger.info("Shutting down workers")
+                self._stopping = True
+                self._signal_children(signal.SIGTERM)
+
+    def _restart(self):
+        logger.info("Graceful restart: reloading shared state")
+        if hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+        try:
+            self._prepare(self.reload)
+        except Exception as e:
+            # Keep serving with the current workers rather than forking broken ones
+            logger.error(f"Reload failed, keeping current workers: {str(e)}")
+            return
+        old = [pid for pid, generation in self._children.items() if generation == self.generation]
+        self._spawn_generation()
+        for pid in old:
+            self._kill(pid, signal.SIGTERM)
+
+    def _signal_children(self, signum):
+        for pid in list(self._children):
+            self._kill(pid, signum)
+
+    def _kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if pid == 0:
+                return
+            generation = self._children.pop(pid, None)
+            try:
+                self.shared_metrics.retire(pid)
+            except OSError as e:
+                logger.error(f"Failed to retire metrics of worker {pid}: {str(e)}")
+            if generation == self.generation and not self._stopping:
+                logger.warning(f"Worker {pid} exited with status {status}, starting a replacement")
+                self._spawn()
+
+    def _worker(self):
+        master = os.getppid()
+        app = InFlightCounter(self.app)
+        server = make_server(self.host, self.port, app, threaded=True, fd=self.sock.fileno())
+        stopping = threading.Event()
+
+        def stop(signum=None, frame=None):
+            if not stopping.is_set():
+                stopping.set()
+                # shutdown() waits for serve_forever, so it cannot run on this (serving) thread
+                threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        def watch_master():
+            # Do not outlive a master that was killed without a chance to stop us
+            while not stopping.wait(1.0):
+                if os.getppid() != master:
+                    stop()
+        threading.Thread(target=watch_master, name='master-watch', daemon=True).start()
+
+        server.serve_forever()
+        if not app.wait(self.graceful_timeout):
+            logger.warning(f"Worker {os.getpid()} stopped with {app.count} requests still running")
+
+
+def serve(app, host=HOST, port=PORT, workers=WORKERS, preload=None, reload=None,
+          graceful_timeout=GRACEFUL_TIMEOUT):
+    """Run ``app`` with a pre-fork worker pool (a single threaded server where fork is unavailable)."""
+    if not hasattr(os, 'fork'):
+        logger.warning("os.fork is not available; serving from a single threaded process")
+        if preload is not None:
+            preload()
+        make_server(host, port, app, threaded=True).serve_forever()
+        return
+    PreforkServer(app, host, port, workers, graceful_timeout, preload, reload).run()
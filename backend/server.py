@@ -1,699 +1,879 @@
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS
-import pandas as pd
-import numpy as np
-import logging
-import os
-import requests
-from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('farm_advisor.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
-
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
-
-# Serve frontend files
-@app.route('/')
-def serve_frontend():
-    return send_from_directory(app.static_folder, 'index.html')
-
-@app.route('/<path:path>')
-def serve_static(path):
-    return send_from_directory(app.static_folder, path)
-
-# Constants
-DATASET_PATH = os.path.join(os.path.dirname(__file__), 'data', 'farming_advisor_dataset.csv')
-WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', 'cb669b0e7977e5085210c5309da7b642')
-WEATHER_API_URL = 'http://api.openweathermap.org/data/2.5/weather'
-
-class IntegratedFarmingSystem:
-    def __init__(self):
-        self.model = None
-        self.label_encoders = {}
-        self.scaler = None
-        self.data = self.load_data()
-        self.initialize_model()
-        self.historical_data = []
-
-    def load_data(self):
-        try:
-            if os.path.exists(DATASET_PATH):
-                df = pd.read_excel(DATASET_PATH, engine='openpyxl')
-                logger.info(f"Successfully loaded {len(df)} records from dataset")
-                
-                # Validate required columns
-                required_columns = ['soil_type', 'water_availability', 'temperature', 
-                                 'rainfall', 'crop_yield', 'soil_ph']
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    logger.error(f"Missing required columns: {missing_columns}")
-                    return self._create_sample_data()
-                
-                return df
-            else:
-                logger.warning(f"Dataset not found at {DATASET_PATH}")
-                return self._create_sample_data()
-        except Exception as e:
-            logger.error(f"Error loading data: {str(e)}")
-            return self._create_sample_data()
-
-    def _create_sample_data(self):
-        logger.info("Creating sample dataset")
-        return pd.DataFrame({
-            'soil_type': ['clay', 'loam', 'sandy', 'silt', 'peat'],
-            'water_availability': ['high', 'medium', 'low', 'high', 'medium'],
-            'temperature': ['warm', 'cool', 'moderate', 'warm', 'cool'],
-            'rainfall': ['high', 'medium', 'low', 'medium', 'high'],
-            'recommended_crop': ['rice', 'wheat', 'corn', 'potato', 'soybean']
-        })
-
-    def initialize_model(self):
-        try:
-            if self.data is not None and not self.data.empty:
-                X = self.data.drop('recommended_crop', axis=1)
-                y = self.data['recommended_crop']
-
-                # Encode categorical variables
-                for column in X.select_dtypes(include=['object']).columns:
-                    self.label_encoders[column] = LabelEncoder()
-                    X[column] = self.label_encoders[column].fit_transform(X[column])
-
-                # Scale features
-                self.scaler = StandardScaler()
-                X = self.scaler.fit_transform(X)
-
-                # Train model with improved parameters
-                self.model = RandomForestClassifier(
-                    n_estimators=100,
-                    max_depth=10,
-                    random_state=42,
-                    class_weight='balanced'
-                )
-                self.model.fit(X, y)
-                logger.info("Model trained successfully")
-        except Exception as e:
-            logger.error(f"Error initializing model: {str(e)}")
-
-    def get_recommendations(self, input_data):
-        try:
-            if not self.model:
-                raise ValueError("Model not initialized")
-
-            # Prepare input data
-            input_df = pd.DataFrame([input_data])
-            
-            # Encode and scale input
-            for column, encoder in self.label_encoders.items():
-                if column in input_df.columns:
-                    input_df[column] = encoder.transform(input_df[column])
-            
-            input_scaled = self.scaler.transform(input_df)
-            
-            # Get predictions
-            prediction = self.model.predict(input_scaled)[0]
-            probabilities = self.model.predict_proba(input_scaled)[0]
-            
-            # Store historical data
-            self.historical_data.append({
-                'date': datetime.now().isoformat(),
-                'input': input_data,
-                'prediction': prediction
-            })
-            
-            return {
-                'primary_crop': prediction,
-                'confidence': float(max(probabilities)),
-                'alternative_crops': self._get_alternative_crops(prediction, probabilities),
-                'sustainability_metrics': self._get_sustainability_metrics(prediction),
-                'weather_impact': self._get_weather_impact(input_data)
-            }
-        except Exception as e:
-            logger.error(f"Error getting recommendations: {str(e)}")
-            raise
-
-    def _get_alternative_crops(self, primary_crop, probabilities):
-        alternatives = [(crop, prob) for crop, prob in zip(self.model.classes_, probabilities)]
-        alternatives = sorted(alternatives, key=lambda x: x[1], reverse=True)
-        return [crop for crop, _ in alternatives if crop != primary_crop][:3]
-
-    def _get_sustainability_metrics(self, crop):
-        metrics = {
-            'rice': {'water': 8, 'carbon': 7, 'soil': 6},
-            'wheat': {'water': 6, 'carbon': 5, 'soil': 4},
-            'corn': {'water': 7, 'carbon': 6, 'soil': 5},
-            'potato': {'water': 5, 'carbon': 4, 'soil': 7},
-            'soybean': {'water': 4, 'carbon': 8, 'soil': 8}
-        }
-        return metrics.get(crop, {'water': 5, 'carbon': 5, 'soil': 5})
-
-    def _get_weather_impact(self, input_data):
-        return {
-            'risk_level': self._calculate_risk_level(input_data),
-            'recommendations': self._get_weather_recommendations(input_data)
-        }
-
-    def _calculate_risk_level(self, input_data):
-        risk_factors = {
-            'high': 3,
-            'medium': 2,
-            'low': 1
-        }
-        
-        total_risk = (
-            risk_factors.get(input_data.get('rainfall', 'medium'), 2) +
-            risk_factors.get(input_data.get('water_availability', 'medium'), 2)
-        )
-        
-        if total_risk >= 5:
-            return 'high'
-        elif total_risk >= 3:
-            return 'medium'
-        return 'low'
-
-    def _get_weather_recommendations(self, input_data):
-        recommendations = []
-        if input_data.get('rainfall') == 'high':
-            recommendations.append("Consider improved drainage systems")
-        if input_data.get('water_availability') == 'low':
-            recommendations.append("Implement water conservation techniques")
-        return recommendations
-
-    def get_historical_data(self):
-        return self.historical_data
-
-class DataHandler:
-    def __init__(self):
-        self.farm_data = None
-        self.market_data = None
-        self.load_data()
-
-    def load_data(self):
-        try:
-            # Define file paths
-            farm_data_path = os.path.join(os.path.dirname(__file__), 'data', 'farmer_advisor_dataset.csv')
-            market_data_path = os.path.join(os.path.dirname(__file__), 'data', 'market_researcher_dataset.csv')
-
-            # Check if files exist
-            if not os.path.exists(farm_data_path):
-                logger.error(f"Farm data file not found at: {farm_data_path}")
-                self.farm_data = self._create_sample_farm_data()
-            else:
-                self.farm_data = pd.read_excel(farm_data_path, engine='openpyxl')
-                logger.info(f"Farm data loaded successfully with {len(self.farm_data)} records")
-
-            if not os.path.exists(market_data_path):
-                logger.error(f"Market data file not found at: {market_data_path}")
-                self.market_data = self._create_sample_market_data()
-            else:
-                self.market_data = pd.read_excel(market_data_path, engine='openpyxl')
-                logger.info(f"Market data loaded successfully with {len(self.market_data)} records")
-
-        except Exception as e:
-            logger.error(f"Error loading data: {str(e)}")
-            self.farm_data = self._create_sample_farm_data()
-            self.market_data = self._create_sample_market_data()
-
-    def _create_sample_farm_data(self):
-        logger.info("Creating sample farm data")
-        return pd.DataFrame({
-            'soilph': [6.5, 7.0, 6.8, 7.2, 6.3],
-            'soil_mixture': ['clay', 'loam', 'sandy', 'silt', 'clay'],
-            'temperature': ['warm', 'cool', 'moderate', 'warm', 'cool'],
-            'rainfall': ['high', 'medium', 'low', 'medium', 'high'],
-            'croptype': ['rice', 'wheat', 'corn', 'potato', 'soybean'],
-            'fertilizer_usuage': [100, 80, 90, 85, 95],
-            'pesticide_usuage': [50, 40, 45, 35, 55],
-            'crop_yield': [4.5, 3.8, 4.2, 3.9, 4.1],
-            'sustainability': [8, 7, 6, 8, 7]
-        })
-
-    def _create_sample_market_data(self):
-        logger.info("Creating sample market data")
-        return pd.DataFrame({
-            'product': ['rice', 'wheat', 'corn', 'potato', 'soybean'],
-            'demand': [85, 75, 80, 70, 78],
-            'supply': [80, 70, 75, 65, 72],
-            'economic': [7.5, 6.8, 7.2, 6.5, 7.0],
-            'weather': ['favorable', 'moderate', 'favorable', 'unfavorable', 'moderate'],
-            'seasonal': ['summer', 'winter', 'spring', 'autumn', 'summer'],
-            'consumer': ['high', 'medium', 'high', 'medium', 'high'],
-            'trend_index': [8.5, 7.8, 8.2, 7.5, 8.0]
-        })
-
-# Initialize the integrated system
-farming_system = IntegratedFarmingSystem()
-
-# Initialize data handler
-data_handler = DataHandler()
-
-# API Routes
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "model_status": "initialized" if farming_system.model else "not initialized"
-    })
-
-@app.route('/api/recommendations', methods=['POST'])
-def get_recommendations():
-    try:
-        data = request.json
-        required_fields = ['soil_type', 'water_availability', 'temperature', 'rainfall']
-        
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing required fields"}), 400
-            
-        recommendations = farming_system.get_recommendations(data)
-        return jsonify(recommendations)
-    except Exception as e:
-        logger.error(f"Error in recommendations endpoint: {str(e)}")
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/farm-data', methods=['GET'])
-def get_farm_data():
-    try:
-        df = pd.read_csv('data/farmer_advisor_dataset.csv')
-        return jsonify({
-            'averages': {
-                'soilph': float(df['soilph'].mean()),
-                'crop_yield': float(df['crop_yield'].mean()),
-                'fertilizer_usage': float(df['fertilizer_usuage'].mean()),
-                'pesticide_usage': float(df['pesticide_usuage'].mean()),
-                'sustainability': float(df['sustainability'].mean())
-            },
-            'distributions': {
-                'soil_mixture': df['soil_mixture'].value_counts().to_dict(),
-                'croptype': df['croptype'].value_counts().to_dict(),
-                'temperature': df['temperature'].value_counts().to_dict(),
-                'rainfall': df['rainfall'].value_counts().to_dict()
-            },
-            'resource_usage': {
-                'fertilizer': {
-                    'data': df['fertilizer_usuage'].tolist(),
-                    'labels': df.index.tolist()
-                },
-                'pesticide': {
-                    'data': df['pesticide_usuage'].tolist(),
-                    'labels': df.index.tolist()
-                }
-            },
-            'raw_data': df.to_dict('records')
-        })
-    except Exception as e:
-        logger.error(f"Error reading farm data: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/market-data', methods=['GET'])
-def get_market_data():
-    try:
-        df = pd.read_csv('data/market_researcher_dataset.csv')
-        return jsonify({
-            'trends': {
-                'demand': df['demand'].tolist(),
-                'supply': df['supply'].tolist(),
-                'economic': df['economic'].tolist(),
-                'trend_index': df['trend_index'].tolist()
-            },
-            'distributions': {
-                'seasonal': df['seasonal'].value_counts().to_dict(),
-                'weather': df['weather'].value_counts().to_dict(),
-                'consumer': df['consumer'].value_counts().to_dict()
-            },
-            'products': {
-                'data': df.groupby('product').agg({
-                    'demand': 'mean',
-                    'supply': 'mean',
-                    'trend_index': 'mean'
-                }).to_dict('index')
-            },
-            'raw_data': df.to_dict('records')
-        })
-    except Exception as e:
-        logger.error(f"Error reading market data: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/historical', methods=['GET'])
-def get_historical_data():
-    try:
-        historical_data = farming_system.get_historical_data()
-        return jsonify({
-            "total_predictions": len(historical_data),
-            "predictions": historical_data
-        })
-    except Exception as e:
-        logger.error(f"Error in historical endpoint: {str(e)}")
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/detailed-farm-data', methods=['GET'])
-def get_detailed_farm_data():
-    try:
-        df = farming_system.data
-        if df is None or df.empty:
-            return jsonify({"error": "No data available"}), 404
-            
-        summary = {
-            "totalRecords": len(df),
-            "soilAnalysis": {
-                "types": df['soil_type'].value_counts().to_dict(),
-                "avgPH": float(df['soil_ph'].mean()),
-                "phRange": {
-                    "min": float(df['soil_ph'].min()),
-                    "max": float(df['soil_ph'].max())
-                }
-            },
-            "cropYields": {
-                "average": float(df['crop_yield'].mean()),
-                "byCrop": df.groupby('recommended_crop')['crop_yield'].mean().to_dict()
-            },
-            "weatherPatterns": {
-                "temperature": df['temperature'].value_counts().to_dict(),
-                "rainfall": df['rainfall'].value_counts().to_dict()
-            }
-        }
-        return jsonify(summary)
-    except Exception as e:
-        logger.error(f"Error in detailed farm data endpoint: {str(e)}")
-        return jsonify({"error": str(e)}), 500
-
-import os
-
-required_structure = {
-    'frontend': {
-        'css': ['styles.css', 'market.css', 'data-visualization.css', 'history.css', 'recommendation.css'],
-        'js': ['main.js', 'market.js','dashboard.js','config.js', 'history.js', 'recommendations.js', 'api-service.js', 'data-visualization.js', 'dataService.js']
-    },
-    'backend': {
-        'data': ['farmer_advisor_dataset.csv', 'market_researcher_dataset.csv'],
-        'files': ['server.py', '__init__.py']
-    }
-}
-
-def verify_structure(base_path):
-    errors = []
-    
-    for main_dir in required_structure:
-        dir_path = os.path.join(base_path, main_dir)
-        if not os.path.exists(dir_path):
-            errors.append(f"Missing directory: {dir_path}")
-            continue
-            
-        for sub_dir, files in required_structure[main_dir].items():
-            if sub_dir == 'files':
-                for file in files:
-                    file_path = os.path.join(dir_path, file)
-                    if not os.path.exists(file_path):
-                        errors.append(f"Missing file: {file_path}")
-            else:
-                sub_path = os.path.join(dir_path, sub_dir)
-                if not os.path.exists(sub_path):
-                    errors.append(f"Missing directory: {sub_path}")
-                    continue
-                    
-                for file in files:
-                    file_path = os.path.join(sub_path, file)
-                    if not os.path.exists(file_path):
-                        errors.append(f"Missing file: {file_path}")
-    
-    return errors
-
-if __name__ == "__main__":
-    base_path = "D:\\Accenture Hackathon"
-    errors = verify_structure(base_path)
-    
-    if errors:
-        print("❌ Structure verification failed:")
-        for error in errors:
-            print(f"  - {error}")
-    else:
-        print("✅ Structure verification passed!")
-
-if __name__ == '__main__':
-    # Verify directory structure
-    base_path = "D:\\Accenture Hackathon"
-    errors = verify_structure(base_path)
-    
-    if errors:
-        logger.error("Structure verification failed:")
-        for error in errors:
-            logger.error(f"  - {error}")
-    else:
-        logger.info("Structure verification passed!")
-        
-        # Start the server
-        logger.info("Starting Flask server...")
-        logger.info(f"Dataset path: {DATASET_PATH}")        
-        logger.info(f"Weather API Key: {WEATHER_API_KEY}")
-        logger.info(f"Weather API URL: {WEATHER_API_URL}")
-        app.run(host='0.0.0.0', port=5000, debug=True)
-
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import pandas as pd
-import json
-
-app = Flask(__name__)
-CORS(app)
-
-# Load datasets
-def load_datasets():
-    try:
-        farm_data_path = os.path.join(os.path.dirname(__file__), 'data', 'farmer_advisor_dataset.csv')
-        market_data_path = os.path.join(os.path.dirname(__file__), 'data', 'market_researcher_dataset.csv')
-        
-        if not os.path.exists(farm_data_path):
-            logger.error(f"Farm data file not found: {farm_data_path}")
-            return None, None
-            
-        if not os.path.exists(market_data_path):
-            logger.error(f"Market data file not found: {market_data_path}")
-            return None, None
-            
-        farming_data = pd.read_csv(farm_data_path)
-        market_data = pd.read_csv(market_data_path)
-        
-        return farming_data, market_data
-    except Exception as e:
-        logger.error(f"Error loading datasets: {str(e)}")
-        return None, None
-
-@app.route('/api/farming-data')
-def get_farming_data():
-    farming_data, _ = load_datasets()
-    return jsonify(farming_data.to_dict(orient='records'))
-
-@app.route('/api/market-data')
-def get_market_data():
-    _, market_data = load_datasets()
-    return jsonify(market_data.to_dict(orient='records'))
-
-@app.route('/api/soil-data')
-def get_soil_data():
-    farming_data, _ = load_datasets()
-    soil_data = farming_data[['Farm_ID', 'Soil_pH', 'Soil_Moisture', 'Temperature_C', 'Rainfall_mm']]
-    return jsonify(soil_data.to_dict(orient='records'))
-
-@app.route('/api/recommendations')
-def get_recommendations():
-    soil_type = request.args.get('soilType')
-    season = request.args.get('season')
-    
-    farming_data, market_data = load_datasets()
-    
-    # Process data and generate recommendations
-    recommendations = generate_recommendations(farming_data, market_data, soil_type, season)
-    return jsonify(recommendations)
-
-def generate_recommendations(farming_data, market_data, soil_type, season):
-    # Implement your recommendation logic here
-    return {
-        'stats': {
-            'optimalCrops': 12,
-            'waterSavings': 25,
-            'yieldIncrease': 30
-        },
-        'recommendations': {
-            'crops': [
-                {'name': 'Wheat', 'confidence': 95},
-                {'name': 'Soybeans', 'confidence': 88},
-                {'name': 'Corn', 'confidence': 82}
-            ],
-            'irrigation': [
-                {'days': 'Mon/Thu', 'amount': 2.5},
-                {'days': 'Wed/Sat', 'amount': 1.8}
-            ],
-            'soilTreatment': [
-                'Add nitrogen-rich fertilizer',
-                'Maintain pH level at 6.5-7.0',
-                'Increase organic matter content'
-            ]
-        }
-    }
-
-@app.route('/api/historical-data')
-def get_historical_data():
-    farming_data, _ = load_datasets()
-    if farming_data is None:
-        return jsonify({'error': 'Failed to load historical data'}), 500
-
-    start_date = request.args.get('startDate')
-    end_date = request.args.get('endDate')
-    
-    # Filter data based on date range if provided
-    return jsonify(farming_data.to_dict(orient='records'))
-
-@app.route('/api/weather-data')
-def get_weather_data():
-    farming_data, _ = load_datasets()
-    if farming_data is None:
-        return jsonify({'error': 'Failed to load weather data'}), 500
-
-    weather_data = farming_data[['Temperature_C', 'Rainfall_mm']].mean().to_dict()
-    return jsonify(weather_data)
-
-@app.route('/api/crop-analysis')
-def get_crop_analysis():
-    farming_data, _ = load_datasets()
-    if farming_data is None:
-        return jsonify({'error': 'Failed to load crop analysis'}), 500
-
-    crop_analysis = farming_data.groupby('Crop_Type').agg({
-        'Crop_Yield_ton': 'mean',
-        'Sustainability_Score': 'mean'
-    }).to_dict(orient='index')
-    return jsonify(crop_analysis)
-
-if __name__ == '__main__':
-    app.run(debug=True)
-
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import pandas as pd
-from datetime import datetime
-import json
-
-app = Flask(__name__)
-CORS(app)
-
-def load_datasets():
-    try:
-        farming_data = pd.read_csv('data/farmer_advisor_dataset.csv')
-        market_data = pd.read_csv('data/market_researcher_dataset.csv')
-        return farming_data, market_data
-    except Exception as e:
-        print(f"Error loading datasets: {e}")
-        return None, None
-
-@app.route('/api/farming-data')
-def get_farming_data():
-    farming_data, _ = load_datasets()
-    if farming_data is not None:
-        return jsonify(farming_data.to_dict(orient='records'))
-    return jsonify({'error': 'Failed to load farming data'}), 500
-
-@app.route('/api/market-data')
-def get_market_data():
-    _, market_data = load_datasets()
-    if market_data is not None:
-        return jsonify(market_data.to_dict(orient='records'))
-    return jsonify({'error': 'Failed to load market data'}), 500
-
-@app.route('/api/soil-data')
-def get_soil_data():
-    farming_data, _ = load_datasets()
-    if farming_data is not None:
-        soil_columns = ['Farm_ID', 'Soil_pH', 'Soil_Moisture', 'Temperature_C', 'Rainfall_mm']
-        soil_data = farming_data[soil_columns]
-        return jsonify(soil_data.to_dict(orient='records'))
-    return jsonify({'error': 'Failed to load soil data'}), 500
-
-@app.route('/api/recommendations')
-def get_recommendations():
-    farming_data, market_data = load_datasets()
-    if farming_data is None or market_data is None:
-        return jsonify({'error': 'Failed to load data'}), 500
-
-    soil_type = request.args.get('soilType')
-    season = request.args.get('season')
-    
-    # Process recommendations based on the data
-    recommendations = generate_recommendations(farming_data, market_data, soil_type, season)
-    return jsonify(recommendations)
-
-@app.route('/api/historical-data')
-def get_historical_data():
-    farming_data, _ = load_datasets()
-    if farming_data is None:
-        return jsonify({'error': 'Failed to load historical data'}), 500
-
-    start_date = request.args.get('startDate')
-    end_date = request.args.get('endDate')
-    
-    # Filter data based on date range if provided
-    return jsonify(farming_data.to_dict(orient='records'))
-
-@app.route('/api/weather-data')
-def get_weather_data():
-    farming_data, _ = load_datasets()
-    if farming_data is None:
-        return jsonify({'error': 'Failed to load weather data'}), 500
-
-    weather_data = farming_data[['Temperature_C', 'Rainfall_mm']].mean().to_dict()
-    return jsonify(weather_data)
-
-@app.route('/api/crop-analysis')
-def get_crop_analysis():
-    farming_data, _ = load_datasets()
-    if farming_data is None:
-        return jsonify({'error': 'Failed to load crop analysis'}), 500
-
-    crop_analysis = farming_data.groupby('Crop_Type').agg({
-        'Crop_Yield_ton': 'mean',
-        'Sustainability_Score': 'mean'
-    }).to_dict(orient='index')
-    return jsonify(crop_analysis)
-
-def generate_recommendations(farming_data, market_data, soil_type, season):
-    # Implement your recommendation logic here
-    return {
-        'stats': {
-            'optimalCrops': len(farming_data['Crop_Type'].unique()),
-            'waterSavings': farming_data['Soil_Moisture'].mean(),
-            'yieldIncrease': farming_data['Crop_Yield_ton'].mean()
-        },
-        'recommendations': {
-            'crops': [
-                {'name': crop, 'confidence': 95 - i * 5} 
-                for i, crop in enumerate(farming_data['Crop_Type'].unique())
-            ],
-            'irrigation': [
-                {'days': 'Mon/Thu', 'amount': 2.5},
-                {'days': 'Wed/Sat', 'amount': 1.8}
-            ],
-            'soilTreatment': [
-                'Add nitrogen-rich fertilizer',
-                'Maintain pH level at 6.5-7.0',
-                'Increase organic matter content'
-            ]
-        }
-    }
-
-if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+from flask import Blueprint, Flask, Response, request
+from flask_cors import CORS
+import pandas as pd
+import numpy as np
+import logging
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+
+try:
+    from .database import DATA_DIR, IngestError, dataset_store, read_dataset
+    from .data_access import DataAccess
+    from .similarity import FEATURE_COLUMNS
+    from .simulation import DEFAULT_PERCENTILES, DEFAULT_SAMPLES, DEFAULT_WEATHER_SPREAD, farm_inputs, simulate
+    from .streaming import (QueryError, select_fields, paginate, is_paged,
+                            iter_json_array, iter_ndjson)
+    from .indexes import filters_from_args
+    from .serialization import FRAME_FORMATS, dumps, frame_payload
+    from .assets import STATIC_MODE, StaticAssets
+    from .farm_data import DEFAULT_BINS, DEFAULT_POINTS, MAX_BINS, MAX_POINTS, chart_arg
+    from .model import (ModelState, farm_training_frame, train_artifact, save_artifact, load_artifact,
+                        training_data_hash)
+    from .retraining import ModelRetrainer
+    from .cache import LRUCache
+    from .history import HistoryStore
+    from .weather_api import OpenWeatherMapBackend, WeatherClient
+    from .metrics import metrics, instrument, cache_collector
+    from .logs import configure_logging, bind_request_ids
+except ImportError:
+    # Running as a script from inside backend/
+    from database import DATA_DIR, IngestError, dataset_store, read_dataset
+    from data_access import DataAccess
+    from similarity import FEATURE_COLUMNS
+    from simulation import DEFAULT_PERCENTILES, DEFAULT_SAMPLES, DEFAULT_WEATHER_SPREAD, farm_inputs, simulate
+    from streaming import (QueryError, select_fields, paginate, is_paged,
+                           iter_json_array, iter_ndjson)
+    from indexes import filters_from_args
+    from serialization import FRAME_FORMATS, dumps, frame_payload
+    from assets import STATIC_MODE, StaticAssets
+    from farm_data import DEFAULT_BINS, DEFAULT_POINTS, MAX_BINS, MAX_POINTS, chart_arg
+    from model import (ModelState, farm_training_frame, train_artifact, save_artifact, load_artifact,
+                       training_data_hash)
+    from retraining import ModelRetrainer
+    from cache import LRUCache
+    from history import HistoryStore
+    from weather_api import OpenWeatherMapBackend, WeatherClient
+    from metrics import metrics, instrument, cache_collector
+    from logs import configure_logging, bind_request_ids
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging (queued, so request threads never wait on the log file)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+def jsonify(*args, **kwargs):
+    """flask.jsonify through the NumPy-aware encoder in serialization.py."""
+    if args and kwargs:
+        raise TypeError("jsonify() takes either positional or keyword arguments, not both")
+    obj = kwargs or (args[0] if len(args) == 1 else list(args))
+    # JSON encoding of API responses is reported as the 'serialization' phase
+    with metrics.phase('serialization'):
+        return Response(dumps(obj) + b'\n', mimetype='application/json')
+
+# Every route reads datasets through this one layer (store, summaries and indexes)
+data = DataAccess(dataset_store)
+
+def aggregate_response(name, error_message):
+    entry = data.aggregate(name)
+    if entry is None:
+        return jsonify({'error': error_message}), 500
+
+    # Clients revalidate with If-None-Match and get a 304 while the data is unchanged
+    response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+SOIL_COLUMNS = ['Farm_ID', 'Soil_pH', 'Soil_Moisture', 'Temperature_C', 'Rainfall_mm']
+
+def records_response(df, version, columns=None):
+    """Serve ``df`` row by row without materialising the whole frame as dicts.
+
+    ``fields`` projects columns, ``limit``/``offset``/``cursor`` return a page
+    in a JSON envelope and ``format=ndjson`` streams newline delimited records.
+    ``format=columns`` sends one array per column instead of one object per
+    row (``records``, the default). Without any of those the full JSON
+    array is streamed in chunks.
+    """
+    try:
+        df = select_fields(df, request.args.get('fields'), columns)
+        output_format = request.args.get('format', 'records')
+        if output_format == 'json':
+            output_format = 'records'
+        if output_format not in FRAME_FORMATS + ('ndjson',):
+            raise QueryError("format must be 'records', 'columns' or 'ndjson'")
+        page = paginate(df, request.args, version) if is_paged(request.args) else None
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if output_format == 'ndjson':
+        response = Response(metrics.timed_iter('serialization', iter_ndjson(page.frame if page else df)),
+                            mimetype='application/x-ndjson')
+        if page and page.next_cursor:
+            response.headers['X-Next-Cursor'] = page.next_cursor
+        return response
+
+    if page:
+        return jsonify({
+            'data': frame_payload(page.frame, output_format),
+            'offset': page.offset,
+            'total': page.total,
+            'next_cursor': page.next_cursor
+        })
+    if output_format == 'columns':
+        return jsonify(frame_payload(df, 'columns'))
+    return Response(metrics.timed_iter('serialization', iter_json_array(df)), mimetype='application/json')
+
+def filtered_records_response(dataset, error_message):
+    """records_response over the rows matching the request's filter arguments."""
+    index, version = data.index(dataset)
+    if index is None:
+        return jsonify({'error': error_message}), 500
+
+    try:
+        predicates, ignored = filters_from_args(request.args, index.df)
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = records_response(index.select(predicates), version)
+    if ignored and isinstance(response, Response):
+        response.headers['X-Ignored-Filters'] = ','.join(ignored)
+    return response
+
+# Constants
+DATASET_PATH = os.path.join(DATA_DIR, 'farming_advisor_dataset.csv')
+WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', 'cb669b0e7977e5085210c5309da7b642')
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'http://api.openweathermap.org/data/2.5/weather')
+# Distinct weather cells one recommendations request may fetch live
+WEATHER_BATCH_MAX_CELLS = int(os.getenv('WEATHER_BATCH_MAX_CELLS', 16))
+
+class IntegratedFarmingSystem:
+    def __init__(self, weather_client=None):
+        self.weather_client = weather_client
+        # Replaced as a whole when a new model is loaded; see ModelState
+        self.state = None
+        self.prediction_cache = LRUCache(
+            maxsize=int(os.getenv('PREDICTION_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('PREDICTION_CACHE_TTL', 3600)) or None
+        )
+        self.data = self.load_data()
+        if not self.load_model():
+            self.initialize_model()
+        self.history = HistoryStore()
+
+    def load_data(self):
+        """Training frame for the crop model.
+
+        An explicit categorical dataset at DATASET_PATH wins; otherwise the
+        farm dataset is mapped to the API's categories (farm_training_frame),
+        read through DataAccess so retraining sees appended rows.
+        """
+        try:
+            if os.path.exists(DATASET_PATH):
+                df = read_dataset(DATASET_PATH)
+                logger.info(f"Successfully loaded {len(df)} records from dataset")
+                
+                # Validate required columns
+                required_columns = ['soil_type', 'water_availability', 'temperature', 
+                                 'rainfall', 'crop_yield', 'soil_ph']
+                missing_columns = [col for col in required_columns if col not in df.columns]
+                
+                if missing_columns:
+                    logger.error(f"Missing required columns: {missing_columns}")
+                    return self._create_sample_data()
+                
+                return df
+
+            farming = data.frame('farming')
+            if farming is not None and len(farming):
+                df = farm_training_frame(farming)
+                logger.info(f"Training on {len(df)} records from the farm dataset")
+                return df
+            logger.warning("Farm dataset not available, training on the sample dataset")
+            return self._create_sample_data()
+        except Exception as e:
+            logger.error(f"Error loading data: {str(e)}")
+            return self._create_sample_data()
+
+    def _create_sample_data(self):
+        logger.info("Creating sample dataset")
+        return pd.DataFrame({
+            'soil_type': ['clay', 'loam', 'sandy', 'silt', 'peat'],
+            'water_availability': ['high', 'medium', 'low', 'high', 'medium'],
+            'temperature': ['warm', 'cool', 'moderate', 'warm', 'cool'],
+            'rainfall': ['high', 'medium', 'low', 'medium', 'high'],
+            'recommended_crop': ['rice', 'wheat', 'corn', 'potato', 'soybean']
+        })
+
+    @property
+    def model(self):
+        return self.state.model if self.state is not None else None
+
+    @property
+    def model_version(self):
+        return self.state.version if self.state is not None else None
+
+    def load_model(self):
+        """Use the saved artifact if it was trained on the current data."""
+        if self.data is None or self.data.empty:
+            return False
+        artifact = load_artifact(data_hash=training_data_hash(self.data))
+        if artifact is None:
+            return False
+        self.apply_artifact(artifact)
+        return True
+
+    def initialize_model(self):
+        try:
+            if self.data is not None and not self.data.empty:
+                artifact = train_artifact(self.data)
+                self.apply_artifact(artifact)
+                logger.info("Model trained successfully")
+                save_artifact(artifact)
+        except Exception as e:
+            logger.error(f"Error initializing model: {str(e)}")
+
+    def apply_artifact(self, artifact):
+        # One assignment, so a request sees either the old model or the new one
+        self.state = ModelState(artifact)
+        # Cached payloads belong to the previous model
+        self.prediction_cache.clear()
+
+    def get_recommendations(self, input_data):
+        try:
+            result = self.get_recommendations_batch([input_data])[0]
+            if 'error' in result:
+                raise ValueError(result['error'])
+            return result
+        except Exception as e:
+            logger.error(f"Error getting recommendations: {str(e)}")
+            raise
+
+    def get_recommendations_batch(self, inputs):
+        """Score a list of input dicts with a single predict_proba call.
+
+        Results are returned in input order; an input that cannot be encoded
+        gets ``{'error': ...}`` in its slot instead of failing the batch.
+        Inputs already in the prediction cache skip the forest entirely.
+        """
+        state = self.state
+        if state is None:
+            raise ValueError("Model not initialized")
+
+        keys = [self._cache_key(state, item) for item in inputs]
+        results = [None if key is None else self.prediction_cache.get(key) for key in keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        if pending:
+            scored = self._score_batch(state, [inputs[i] for i in pending])
+            for i, result in zip(pending, scored):
+                results[i] = result
+                if keys[i] is not None and 'error' not in result:
+                    self.prediction_cache.put(keys[i], result)
+
+        # Weather depends on location and time, so it is attached after the cache
+        coords = [None] * len(inputs)
+        for i, (item, result) in enumerate(zip(inputs, results)):
+            if 'error' not in result:
+                try:
+                    coords[i] = self._coordinates(item)
+                except ValueError as e:
+                    results[i] = {'error': str(e)}
+        located = [i for i, c in enumerate(coords) if c is not None]
+        live = {}
+        if located and self.weather_client is not None:
+            # Cells past the cap use cached weather only, or fall back to the input categories
+            weather = self.weather_client.get_many([coords[i] for i in located], max_cells=WEATHER_BATCH_MAX_CELLS)
+            live = dict(zip(located, weather))
+        for i, result in enumerate(results):
+            if 'error' not in result:
+                results[i] = dict(result, weather_impact=self._get_weather_impact(inputs[i], live.get(i)))
+
+        # Store historical data
+        now = datetime.now().isoformat()
+        for item, result in zip(inputs, results):
+            if 'error' not in result:
+                self.history.append({
+                    'date': now,
+                    'input': item,
+                    'prediction': result['primary_crop']
+                })
+        return results
+
+    def _cache_key(self, state, input_data):
+        # Features are low-cardinality categoricals, so (model, inputs) repeats a lot
+        if not isinstance(input_data, dict):
+            return None
+        return (state.version,) + tuple(
+            '' if input_data.get(column) is None else str(input_data.get(column))
+            for column in state.feature_columns
+        )
+
+    def _score_batch(self, state, inputs):
+        with metrics.phase('encoding'):
+            X, errors = state.encode(inputs)
+        results = [{'error': error} for error in errors]
+        valid = np.flatnonzero([error is None for error in errors])
+        if len(valid) == 0:
+            return results
+
+        # One pass over the forest; the top class and alternatives come from the same array
+        with metrics.phase('inference'):
+            probabilities = state.predict_proba(X[valid])
+        ranked = np.argsort(-probabilities, axis=1, kind='stable')
+        classes = state.classes
+
+        for row, i in enumerate(valid):
+            order = ranked[row]
+            prediction = str(classes[order[0]])
+            results[i] = {
+                'primary_crop': prediction,
+                'confidence': float(probabilities[row, order[0]]),
+                'alternative_crops': [str(classes[j]) for j in order[1:4]],
+                'sustainability_metrics': self._get_sustainability_metrics(prediction)
+            }
+        return results
+
+    def _get_sustainability_metrics(self, crop):
+        metrics = {
+            'rice': {'water': 8, 'carbon': 7, 'soil': 6},
+            'wheat': {'water': 6, 'carbon': 5, 'soil': 4},
+            'corn': {'water': 7, 'carbon': 6, 'soil': 5},
+            'potato': {'water': 5, 'carbon': 4, 'soil': 7},
+            'soybean': {'water': 4, 'carbon': 8, 'soil': 8}
+        }
+        return metrics.get(crop, {'water': 5, 'carbon': 5, 'soil': 5})
+
+    def _coordinates(self, input_data):
+        """(lat, lon) of an input, None if it has no location; ValueError if they are invalid."""
+        if input_data.get('lat') is None and input_data.get('lon') is None:
+            return None
+        try:
+            lat, lon = float(input_data['lat']), float(input_data['lon'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("lat and lon must both be numbers")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            # Also rejects nan, which fails every comparison
+            raise ValueError("lat or lon out of range")
+        return lat, lon
+
+    def _get_weather_impact(self, input_data, weather=None):
+        if weather is None:
+            return {
+                'risk_level': self._calculate_risk_level(input_data),
+                'recommendations': self._get_weather_recommendations(input_data),
+                'source': 'input'
+            }
+        return {
+            'risk_level': self._calculate_live_risk_level(input_data, weather),
+            'recommendations': self._get_live_weather_recommendations(input_data, weather),
+            'source': 'live',
+            'conditions': weather
+        }
+
+    def _calculate_risk_level(self, input_data):
+        risk_factors = {
+            'high': 3,
+            'medium': 2,
+            'low': 1
+        }
+        
+        total_risk = (
+            risk_factors.get(input_data.get('rainfall', 'medium'), 2) +
+            risk_factors.get(input_data.get('water_availability', 'medium'), 2)
+        )
+        
+        if total_risk >= 5:
+            return 'high'
+        elif total_risk >= 3:
+            return 'medium'
+        return 'low'
+
+    def _get_weather_recommendations(self, input_data):
+        recommendations = []
+        if input_data.get('rainfall') == 'high':
+            recommendations.append("Consider improved drainage systems")
+        if input_data.get('water_availability') == 'low':
+            recommendations.append("Implement water conservation techniques")
+        return recommendations
+
+    def _calculate_live_risk_level(self, input_data, weather):
+        risk_factors = {
+            'high': 3,
+            'medium': 2,
+            'low': 1
+        }
+        rainfall = weather.get('rainfall') or 0
+        temperature = weather.get('temperature')
+        wind_speed = weather.get('wind_speed') or 0
+
+        rain_risk = 3 if rainfall >= 10 else 2 if rainfall >= 2.5 else 1
+        total_risk = rain_risk + risk_factors.get(input_data.get('water_availability', 'medium'), 2)
+        if temperature is not None and (temperature >= 35 or temperature <= 2):
+            total_risk += 1
+        if wind_speed >= 15:
+            total_risk += 1
+
+        if total_risk >= 5:
+            return 'high'
+        elif total_risk >= 3:
+            return 'medium'
+        return 'low'
+
+    def _get_live_weather_recommendations(self, input_data, weather):
+        recommendations = []
+        temperature = weather.get('temperature')
+        if (weather.get('rainfall') or 0) >= 10:
+            recommendations.append("Consider improved drainage systems")
+        if input_data.get('water_availability') == 'low':
+            recommendations.append("Implement water conservation techniques")
+        if temperature is not None and temperature >= 35:
+            recommendations.append("Irrigate early morning or evening to limit heat stress")
+        if temperature is not None and temperature <= 2:
+            recommendations.append("Protect seedlings against frost")
+        if (weather.get('wind_speed') or 0) >= 15:
+            recommendations.append("Secure young plants and consider windbreaks")
+        return recommendations
+
+    def get_historical_data(self, start=None, end=None, limit=100, offset=0, newest_first=True):
+        return self.history.query(start, end, limit, offset, newest_first)
+
+# Weather lookups are cached per 0.1 degree cell and shared by concurrent requests
+weather_client = WeatherClient(
+    OpenWeatherMapBackend(WEATHER_API_KEY, WEATHER_API_URL),
+    ttl=float(os.getenv('WEATHER_CACHE_TTL', 600)),
+    stale_ttl=float(os.getenv('WEATHER_STALE_TTL', 3600))
+)
+
+# Initialize the integrated system
+farming_system = IntegratedFarmingSystem(weather_client)
+retrainer = ModelRetrainer(farming_system)
+
+metrics.register_collector(cache_collector('prediction', farming_system.prediction_cache.stats))
+metrics.register_collector(cache_collector('weather', weather_client.stats))
+metrics.register_collector(cache_collector('aggregate', data.aggregates.stats))
+metrics.register_collector(cache_collector('farm_data', data.farm_data.stats))
+
+# API Routes
+api = Blueprint('api', __name__)
+
+# Frontend files; see assets.py for the build step and STATIC_MODE
+static_assets = StaticAssets()
+frontend = Blueprint('frontend', __name__)
+
+@frontend.route('/')
+def serve_frontend():
+    return static_assets.response(request, 'index.html')
+
+@frontend.route('/<path:path>')
+@frontend.route('/static/<path:path>')
+def serve_static(path):
+    return static_assets.response(request, path)
+
+@api.route('/api/health', methods=['GET'])
+def health_check():
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "model_status": "initialized" if farming_system.model else "not initialized",
+        "model_version": farming_system.model_version,
+        "prediction_cache": farming_system.prediction_cache.stats()
+    })
+
+@api.route('/api/recommendations', methods=['POST'])
+def get_recommendations():
+    try:
+        data = request.get_json(silent=True)
+        required_fields = ['soil_type', 'water_availability', 'temperature', 'rainfall']
+        
+        if not isinstance(data, dict) or not all(field in data for field in required_fields):
+            return jsonify({"error": "Missing required fields"}), 400
+            
+        recommendations = farming_system.get_recommendations_batch([data])[0]
+        if 'error' in recommendations:
+            # An input the model cannot encode; the error names the field, as in the batch endpoint
+            return jsonify(recommendations), 400
+        return jsonify(recommendations)
+    except Exception as e:
+        logger.error(f"Error in recommendations endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/weather', methods=['GET'])
+def get_weather():
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon are required numbers"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "lat or lon out of range"}), 400
+
+    weather = weather_client.get(lat, lon)
+    if weather is None:
+        return jsonify({"error": "Weather data unavailable"}), 503
+    return jsonify(weather)
+
+@api.route('/api/model', methods=['GET'])
+def get_model_status():
+    return jsonify(retrainer.status())
+
+@api.route('/api/model/retrain', methods=['POST'])
+def retrain_model():
+    """Start retraining in the background; poll /api/model for the outcome."""
+    if not retrainer.trigger():
+        return jsonify(dict(retrainer.status(), error='A retrain is already running')), 409
+    return jsonify(retrainer.status()), 202
+
+MAX_BATCH_SIZE = 10000
+
+@api.route('/api/recommendations/batch', methods=['POST'])
+def get_recommendations_batch():
+    try:
+        data = request.json
+        inputs = data.get('inputs') if isinstance(data, dict) else data
+        if not isinstance(inputs, list):
+            return jsonify({"error": "Expected a list of inputs"}), 400
+        if len(inputs) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch size exceeds {MAX_BATCH_SIZE}"}), 400
+
+        results = farming_system.get_recommendations_batch(inputs)
+        return jsonify({
+            "count": len(results),
+            "results": results
+        })
+    except Exception as e:
+        logger.error(f"Error in batch recommendations endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/farm-data', methods=['GET'])
+def get_farm_data():
+    """Farm summary for the dashboards.
+
+    ``v=2`` is the compact payload (no raw rows, downsampled series sized by
+    ``points``, histograms with ``bins`` bars); the default ``v=1`` keeps
+    the original shape. Bodies are cached per dataset version and sent
+    gzip or brotli compressed when the client accepts it.
+    """
+    try:
+        payload_version = int(request.args.get('v', 1))
+        points = chart_arg(request.args, 'points', DEFAULT_POINTS, MAX_POINTS)
+        bins = chart_arg(request.args, 'bins', DEFAULT_BINS, MAX_BINS)
+    except ValueError:
+        return jsonify({'error': 'v, points and bins must be integers'}), 400
+    if payload_version not in (1, 2):
+        return jsonify({'error': 'v must be 1 or 2'}), 400
+    if payload_version == 1:
+        # The original payload has no chart parameters
+        points, bins = DEFAULT_POINTS, DEFAULT_BINS
+
+    try:
+        body = data.farm_data.get(payload_version, points, bins)
+    except Exception as e:
+        logger.error(f"Error reading farm data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    if body is None:
+        return jsonify({'error': 'Failed to load farming data'}), 500
+    return body.response(request)
+
+def parse_history_timestamp(value):
+    """``value`` in the form history records are stored in (local isoformat()); ValueError if not ISO 8601."""
+    if value is None:
+        return None
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp.isoformat()
+
+@api.route('/api/historical', methods=['GET'])
+def get_historical_data():
+    try:
+        try:
+            limit = min(int(request.args.get('limit', 100)), 1000)
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({"error": "limit and offset must be integers"}), 400
+        if limit < 0 or offset < 0:
+            return jsonify({"error": "limit and offset must not be negative"}), 400
+        try:
+            start = parse_history_timestamp(request.args.get('start'))
+            end = parse_history_timestamp(request.args.get('end'))
+        except ValueError:
+            return jsonify({"error": "start and end must be ISO 8601 dates or timestamps"}), 400
+
+        predictions, total = farming_system.get_historical_data(
+            start=start,
+            end=end,
+            limit=limit,
+            offset=offset,
+            newest_first=request.args.get('order', 'desc') != 'asc'
+        )
+        return jsonify({
+            "total_predictions": total,
+            "offset": offset,
+            "limit": limit,
+            "predictions": predictions
+        })
+    except Exception as e:
+        logger.error(f"Error in historical endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/detailed-farm-data', methods=['GET'])
+def get_detailed_farm_data():
+    try:
+        df = farming_system.data
+        if df is None or df.empty:
+            return jsonify({"error": "No data available"}), 404
+            
+        summary = {
+            "totalRecords": len(df),
+            "soilAnalysis": {
+                "types": df['soil_type'].value_counts().to_dict(),
+                "avgPH": float(df['soil_ph'].mean()),
+                "phRange": {
+                    "min": float(df['soil_ph'].min()),
+                    "max": float(df['soil_ph'].max())
+                }
+            },
+            "cropYields": {
+                "average": float(df['crop_yield'].mean()),
+                "byCrop": df.groupby('recommended_crop')['crop_yield'].mean().to_dict()
+            },
+            "weatherPatterns": {
+                "temperature": df['temperature'].value_counts().to_dict(),
+                "rainfall": df['rainfall'].value_counts().to_dict()
+            }
+        }
+        return jsonify(summary)
+    except Exception as e:
+        logger.error(f"Error in detailed farm data endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/farming-data')
+def get_farming_data():
+    farming_data, version = data.versioned('farming')
+    if farming_data is not None:
+        return records_response(farming_data, version)
+    return jsonify({'error': 'Failed to load farming data'}), 500
+
+@api.route('/api/market-data')
+def get_market_data():
+    market_data, version = data.versioned('market')
+    if market_data is not None:
+        return records_response(market_data, version)
+    return jsonify({'error': 'Failed to load market data'}), 500
+
+MAX_INGEST_ROWS = 10000
+
+def ingest_response(name):
+    """Append the posted rows (a list, or ``{"rows": [...]}``) to dataset ``name``."""
+    payload = request.get_json(silent=True)
+    rows = payload.get('rows') if isinstance(payload, dict) else payload
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'error': 'Expected a non-empty list of rows'}), 400
+    if len(rows) > MAX_INGEST_ROWS:
+        return jsonify({'error': f"At most {MAX_INGEST_ROWS} rows per request"}), 400
+    try:
+        df, _ = data.append(name, rows)
+    except IngestError as e:
+        return jsonify({'error': 'Invalid rows', 'details': e.errors}), 400
+    except Exception as e:
+        logger.error(f"Error appending {name} data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'appended': len(rows), 'total': len(df)}), 201
+
+@api.route('/api/farming-data', methods=['POST'])
+def add_farming_data():
+    return ingest_response('farming')
+
+@api.route('/api/market-data', methods=['POST'])
+def add_market_data():
+    return ingest_response('market')
+
+@api.route('/api/market-summary')
+def get_market_summary():
+    return aggregate_response('market-summary', 'Failed to load market data')
+
+@api.route('/api/soil-data')
+def get_soil_data():
+    farming_data, version = data.versioned('farming')
+    if farming_data is not None:
+        return records_response(farming_data, version, SOIL_COLUMNS)
+    return jsonify({'error': 'Failed to load soil data'}), 500
+
+@api.route('/api/recommendations', methods=['GET'])
+def get_dashboard_recommendations():
+    try:
+        recommendations = data.recommender.recommend(request.args.get('soilType'), request.args.get('season'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if recommendations is None:
+        return jsonify({'error': 'Failed to load data'}), 500
+    return jsonify(recommendations)
+
+MAX_NEIGHBORS = 100
+
+@api.route('/api/similar-farms')
+def get_similar_farms():
+    """k nearest farms by soil and weather, given ``farmId`` or every feature in FEATURE_COLUMNS."""
+    index = data.neighbors.get()
+    if index is None:
+        return jsonify({'error': 'Failed to load farming data'}), 500
+
+    try:
+        k = int(request.args.get('k', 5))
+        farm_id = request.args.get('farmId')
+        if farm_id is not None:
+            farm_id = int(farm_id)
+            features = index.features_of(farm_id)
+            if features is None:
+                return jsonify({'error': f"Unknown farmId {farm_id}"}), 404
+        else:
+            missing = [column for column in FEATURE_COLUMNS if column not in request.args]
+            if missing:
+                return jsonify({'error': f"Pass farmId or all of: {', '.join(FEATURE_COLUMNS)}"}), 400
+            features = [float(request.args[column]) for column in FEATURE_COLUMNS]
+            if not np.isfinite(features).all():
+                return jsonify({'error': 'The features must be finite numbers'}), 400
+    except ValueError:
+        return jsonify({'error': 'k, farmId and the features must be numbers'}), 400
+    if not 1 <= k <= MAX_NEIGHBORS:
+        return jsonify({'error': f"k must be between 1 and {MAX_NEIGHBORS}"}), 400
+
+    return jsonify({
+        'query': dict(zip(FEATURE_COLUMNS, map(float, features))),
+        'k': k,
+        'method': index.method,
+        'neighbors': index.neighbors(features, k, exclude=farm_id)
+    })
+
+@api.route('/api/simulate', methods=['POST'])
+def simulate_scenarios():
+    """What-if outcomes for one farm: percentiles of yield, revenue and sustainability per scenario.
+
+    The body names the farm by ``farmId`` or gives ``farm`` (``crop`` and
+    every column in SURFACE_COLUMNS), plus ``scenarios``: objects with an
+    optional ``name``, ``crop`` to switch to, ``scale`` (column -> factor)
+    and ``set`` (column -> value). Optional: ``samples``, ``season``,
+    ``percentiles``, ``weatherSpread`` and ``seed``.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    surfaces = data.simulator.surfaces()
+    if surfaces is None:
+        return jsonify({'error': 'Failed to load data'}), 500
+
+    try:
+        if body.get('farmId') is not None:
+            farm = data.simulator.farm(int(body['farmId']))
+            if farm is None:
+                return jsonify({'error': f"Unknown farmId {body['farmId']}"}), 404
+        else:
+            farm = farm_inputs(body.get('farm'))
+        scenarios = body.get('scenarios', [])
+        if not isinstance(scenarios, list):
+            return jsonify({'error': 'scenarios must be a list'}), 400
+        result = simulate(surfaces, farm, scenarios,
+                          samples=int(body.get('samples', DEFAULT_SAMPLES)),
+                          season=body.get('season'),
+                          percentiles=body.get('percentiles', DEFAULT_PERCENTILES),
+                          weather_spread=float(body.get('weatherSpread', DEFAULT_WEATHER_SPREAD)),
+                          seed=body.get('seed'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@api.route('/api/historical-data')
+def get_historical_records():
+    return filtered_records_response('farming', 'Failed to load historical data')
+
+@api.route('/api/weather-data')
+def get_weather_data():
+    return aggregate_response('weather-data', 'Failed to load weather data')
+
+@api.route('/api/crop-analysis')
+def get_crop_analysis():
+    return aggregate_response('crop-analysis', 'Failed to load crop analysis')
+
+# Project root (the directory holding backend/ and frontend/)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_DIR = os.path.join(BASE_DIR, 'frontend')
+
+required_structure = {
+    'frontend': {
+        'css': ['styles.css', 'market.css', 'data-visualization.css', 'history.css', 'recommendation.css'],
+        'js': ['main.js', 'market.js','dashboard.js','config.js', 'history.js', 'recommendations.js', 'api-service.js', 'data-visualization.js', 'dataService.js']
+    },
+    'backend': {
+        'data': ['farmer_advisor_dataset.csv', 'market_researcher_dataset.csv'],
+        'files': ['server.py', '__init__.py']
+    }
+}
+
+def verify_structure(base_path=BASE_DIR):
+    errors = []
+    
+    for main_dir in required_structure:
+        dir_path = os.path.join(base_path, main_dir)
+        if not os.path.exists(dir_path):
+            errors.append(f"Missing directory: {dir_path}")
+            continue
+            
+        for sub_dir, files in required_structure[main_dir].items():
+            if sub_dir == 'files':
+                for file in files:
+                    file_path = os.path.join(dir_path, file)
+                    if not os.path.exists(file_path):
+                        errors.append(f"Missing file: {file_path}")
+            else:
+                sub_path = os.path.join(dir_path, sub_dir)
+                if not os.path.exists(sub_path):
+                    errors.append(f"Missing directory: {sub_path}")
+                    continue
+                    
+                for file in files:
+                    file_path = os.path.join(sub_path, file)
+                    if not os.path.exists(file_path):
+                        errors.append(f"Missing file: {file_path}")
+    
+    return errors
+
+def create_app():
+    """Build the Flask application with every route registered once."""
+    # No Flask static route: StaticAssets serves every frontend file, and in proxy mode nothing here does
+    app = Flask(__name__, static_folder=None)
+    CORS(app)
+    instrument(app)
+    bind_request_ids(app)
+    app.register_blueprint(api)
+    if STATIC_MODE != 'proxy':
+        app.register_blueprint(frontend)
+    retrainer.start()
+    return app
+
+def preload():
+    """Load the model, datasets and summaries before workers are forked."""
+    data.preload()
+    logger.info(f"Preloaded model {farming_system.model_version} and datasets {', '.join(data.store.datasets)}")
+
+def reload_state():
+    """Re-read datasets, static build and the model artifact from disk (graceful restart)."""
+    data.clear()
+    static_assets.load()
+    farming_system.data = farming_system.load_data()
+    if not farming_system.load_model():
+        farming_system.initialize_model()
+    preload()
+
+app = create_app()
+
+if __name__ == '__main__':
+    # Development server; use `python -m backend serve` in production
+    errors = verify_structure(BASE_DIR)
+    
+    if errors:
+        logger.error("Structure verification failed:")
+        for error in errors:
+            logger.error(f"  - {error}")
+    else:
+        logger.info("Structure verification passed!")
+        
+        # Start the server
+        logger.info("Starting Flask server...")
+        logger.info(f"Dataset path: {DATASET_PATH}")        
+        logger.info(f"Weather API Key: {WEATHER_API_KEY}")
+        logger.info(f"Weather API URL: {WEATHER_API_URL}")
+        app.run(host='0.0.0.0', port=5000, debug=True)
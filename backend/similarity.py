@@ -0,0 +1,183 @@
+import copy
+import logging
+import threading
+
+import numpy as np
+
+try:
+    from sklearn.neighbors import KDTree
+except ImportError:
+    KDTree = None
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = ['Soil_pH', 'Soil_Moisture', 'Temperature_C', 'Rainfall_mm']
+# Rows scanned per step by the brute-force search, bounding its temporary memory
+BLOCK_ROWS = 65536
+# Below this many rows a NumPy scan answers faster than a KD-tree query call
+TREE_MIN_ROWS = 20000
+# Appended rows are searched by brute force until they exceed this share of the tree
+REBUILD_FRACTION = 0.1
+
+
+def _nearest_brute(points, query, k):
+    """``(distances, positions)`` of the ``k`` rows of ``points`` closest to ``query``, blockwise."""
+    best_d = np.empty(0)
+    best_i = np.empty(0, dtype=np.int64)
+    for start in range(0, len(points), BLOCK_ROWS):
+        block = points[start:start + BLOCK_ROWS]
+        d = np.sqrt(((block - query) ** 2).sum(axis=1))
+        if len(d) > k:
+            keep = np.argpartition(d, k)[:k]
+            d = d[keep]
+            i = keep + start
+        else:
+            i = np.arange(start, start + len(d))
+        best_d = np.concatenate([best_d, d])
+        best_i = np.concatenate([best_i, i])
+        if len(best_d) > k:
+            keep = np.argpartition(best_d, k)[:k]
+            best_d, best_i = best_d[keep], best_i[keep]
+    order = np.argsort(best_d, kind='stable')
+    return best_d[order], best_i[order]
+
+
+class FarmNeighbors:
+    """k-nearest-neighbour search over standardized soil and weather features.
+
+    Features are scaled with the mean and standard deviation of the rows
+    the index was built from. Large frames get a scikit-learn KDTree;
+    small ones (or installs without scikit-learn) use a blocked NumPy scan. Rows appended later (the store reloaded a
+    longer file with the same leading rows) are kept in a small delta that
+    is searched by brute force and merged with the tree's answer; the tree
+    is rebuilt once the delta grows past REBUILD_FRACTION of it.
+    """
+
+    def __init__(self, df):
+        features = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+        self.mean = features.mean(axis=0)
+        self.std = features.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        self.indexed_rows = len(features)
+        self._features = features
+        points = self._scale(features)
+        self.tree = KDTree(points) if KDTree is not None and len(points) >= TREE_MIN_ROWS else None
+        self.points = points
+        self.delta = np.empty((0, len(FEATURE_COLUMNS)))
+        self._set_frame(df)
+
+    @property
+    def method(self):
+        return 'kd_tree' if self.tree is not None else 'brute'
+
+    def _scale(self, features):
+        return (features - self.mean) / self.std
+
+    def _set_frame(self, df):
+        self.df = df
+        # Plain arrays so building a response does not go through pandas indexing
+        self.farm_ids = df['Farm_ID'].to_numpy()
+        self.crops = np.asarray(df['Crop_Type'].astype(str))
+        self.yields = df['Crop_Yield_ton'].to_numpy()
+        self.sustainability = df['Sustainability_Score'].to_numpy()
+
+    def extended(self, df):
+        """A copy sharing this tree if ``df`` only appends rows to the indexed ones, else None.
+
+        A copy rather than an update, so queries running on this index
+        never see the new delta paired with the old frame.
+        """
+        if len(df) < len(self.df):
+            return None
+        features = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+        if not np.array_equal(features[:self.indexed_rows], self._features):
+            return None
+        appended = features[self.indexed_rows:]
+        if len(appended) > REBUILD_FRACTION * self.indexed_rows:
+            return None
+        index = copy.copy(self)
+        index.delta = self._scale(appended)
+        index._set_frame(df)
+        return index
+
+    def features_of(self, farm_id):
+        positions = np.flatnonzero(self.farm_ids == farm_id)
+        if len(positions) == 0:
+            return None
+        return self.df[FEATURE_COLUMNS].iloc[positions[0]].to_numpy(dtype=float)
+
+    def query(self, features, k=5, exclude=None):
+        """The ``k`` nearest rows to ``features`` as ``(distances, positions)``."""
+        with metrics.phase('index_query'):
+            query = self._scale(np.asarray(features, dtype=float))
+            want = k + (1 if exclude is not None else 0)
+            if self.tree is not None:
+                distances, positions = self.tree.query(query.reshape(1, -1), k=min(want, self.indexed_rows))
+                distances, positions = distances[0], positions[0]
+            else:
+                distances, positions = _nearest_brute(self.points, query, want)
+
+            if len(self.delta):
+                delta_d, delta_i = _nearest_brute(self.delta, query, want)
+                distances = np.concatenate([distances, delta_d])
+                positions = np.concatenate([positions, delta_i + self.indexed_rows])
+                order = np.argsort(distances, kind='stable')
+                distances, positions = distances[order], positions[order]
+
+            if exclude is not None:
+                keep = self.farm_ids[positions] != exclude
+                distances, positions = distances[keep], positions[keep]
+            return distances[:k], positions[:k]
+
+    def neighbors(self, features, k=5, exclude=None):
+        distances, positions = self.query(features, k, exclude)
+        return [
+            {
+                'Farm_ID': int(self.farm_ids[p]),
+                'Crop_Type': self.crops[p],
+                'Crop_Yield_ton': float(self.yields[p]),
+                'Sustainability_Score': float(self.sustainability[p]),
+                'distance': float(d)
+            }
+            for d, p in zip(distances, positions)
+        ]
+
+
+class NeighborsCache:
+    """One FarmNeighbors per dataset version; appends extend it instead of rebuilding."""
+
+    def __init__(self, store, dataset='farming'):
+        self.store = store
+        self.dataset = dataset
+        self._cached = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        df, version = self.store.get_versioned(self.dataset)
+        if df is None:
+            return None
+
+        cached = self._cached
+        if cached is not None and cached[1] == version:
+            return cached[0]
+        with self._lock:
+            cached = self._cached
+            if cached is not None and cached[1] == version:
+                return cached[0]
+            index = cached[0].extended(df) if cached is not None else None
+            if index is not None:
+                logger.info(f"Extended similar-farm index to {len(df)} rows for version {version}")
+            else:
+                index = FarmNeighbors(df)
+                logger.info(f"Built {index.method} similar-farm index over {len(df)} rows for version {version}")
+            self._cached = (index, version)
+            return index
+
+    def clear(self):
+        with self._lock:
+            self._cached = None
@@ -0,0 +1,313 @@
+import math
+import logging
+import threading
+
+import numpy as np
+
+try:
+    from .metrics import metrics
+    from .recommender import ALL, resolve_season
+except ImportError:
+    from metrics import metrics
+    from recommender import ALL, resolve_season
+
+logger = logging.getLogger(__name__)
+
+# Inputs of the per-crop response surfaces, in coefficient order
+SURFACE_COLUMNS = ['Soil_pH', 'Soil_Moisture', 'Temperature_C', 'Rainfall_mm',
+                   'Fertilizer_Usage_kg', 'Pesticide_Usage_kg']
+WEATHER_COLUMNS = ['Temperature_C', 'Rainfall_mm']
+# Ridge penalty on the standardized quadratic terms; keeps sparse crops from overfitting
+RIDGE = 1.0
+DEFAULT_SAMPLES = 5000
+MAX_SAMPLES = 100000
+MAX_SCENARIOS = 20
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# Weather draws: the farm's value plus noise of this share of the dataset's spread
+DEFAULT_WEATHER_SPREAD = 0.25
+
+
+def _design(x, mean, std):
+    """Intercept, linear and squared terms of standardized ``x`` (shape ``(..., columns)``)."""
+    z = (x - mean) / std
+    return np.concatenate([np.ones(z.shape[:-1] + (1,)), z, z * z], axis=-1)
+
+
+def _fit(design, target):
+    """Ridge least squares (the intercept is not penalized); returns coefficients and residuals."""
+    penalty = RIDGE * np.eye(design.shape[1])
+    penalty[0, 0] = 0.0
+    coef = np.linalg.solve(design.T @ design + penalty, design.T @ target)
+    return coef, target - design @ coef
+
+
+def _r2(target, residuals):
+    total = ((target - target.mean()) ** 2).sum()
+    return float(1 - (residuals ** 2).sum() / total) if total > 0 else 0.0
+
+
+class ResponseSurfaces:
+    """Per-crop quadratic models of yield and sustainability, plus the market rows to price them.
+
+    Yield and sustainability are fitted against SURFACE_COLUMNS for each
+    crop (each column enters linearly and squared, without interactions);
+    the residuals are kept so simulations draw errors of the shape the data
+    actually has. Market rows (price, demand, supply) are kept
+    per product and seasonal factor, sorted by price, and resampled whole,
+    so their correlations carry over. Inputs are clipped to the range each
+    crop was fitted on.
+    """
+
+    def __init__(self, farming_data, market_data):
+        features = farming_data[SURFACE_COLUMNS].to_numpy(dtype=float)
+        self.mean = features.mean(axis=0)
+        self.std = features.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        self.weather_std = farming_data[WEATHER_COLUMNS].to_numpy(dtype=float).std(axis=0)
+        self.sustainability_range = (float(farming_data['Sustainability_Score'].min()),
+                                     float(farming_data['Sustainability_Score'].max()))
+
+        crops = farming_data['Crop_Type'].astype(str).to_numpy()
+        products = market_data['Product'].astype(str).to_numpy()
+        factors = market_data['Seasonal_Factor'].astype(str).to_numpy()
+        market = market_data[['Market_Price_per_ton', 'Demand_Index', 'Supply_Index']].to_numpy(dtype=float)
+        # Sorted by price, so a shared quantile draw picks comparable rows for every crop
+        order = np.argsort(market[:, 0], kind='stable')
+        market, products, factors = market[order], products[order], factors[order]
+
+        self.crops = sorted(set(crops) & set(products))
+        self.coef = {}
+        self.residuals = {}
+        self.bounds = {}
+        self.market = {}
+        self.fit = {}
+        for crop in self.crops:
+            rows = crops == crop
+            x = features[rows]
+            design = _design(x, self.mean, self.std)
+            targets = np.column_stack([farming_data['Crop_Yield_ton'].to_numpy(dtype=float)[rows],
+                                       farming_data['Sustainability_Score'].to_numpy(dtype=float)[rows]])
+            coef, residuals = _fit(design, targets)
+            self.coef[crop] = coef
+            # Ordered by yield error, so a shared quantile draw is comparable across crops
+            self.residuals[crop] = residuals[np.argsort(residuals[:, 0], kind='stable')]
+            self.bounds[crop] = (x.min(axis=0), x.max(axis=0))
+            self.fit[crop] = {'farms': int(rows.sum()),
+                              'yield_r2': round(_r2(targets[:, 0], residuals[:, 0]), 4),
+                              'sustainability_r2': round(_r2(targets[:, 1], residuals[:, 1]), 4)}
+            self.market[crop] = {ALL: market[products == crop]}
+            for factor in np.unique(factors):
+                subset = market[(products == crop) & (factors == factor)]
+                if len(subset):
+                    self.market[crop][str(factor)] = subset
+
+
+def _changes(scenario, key):
+    """``{column: number}`` under ``scenario[key]``; ValueError unless it is an object of finite numbers."""
+    changes = scenario.get(key) or {}
+    if not isinstance(changes, dict):
+        raise ValueError(f"{key!r} must be an object mapping input columns to numbers")
+    numbers = {}
+    for column, value in changes.items():
+        try:
+            numbers[column] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key!r} value for {column!r} must be a number, not {value!r}")
+        if not math.isfinite(numbers[column]):
+            raise ValueError(f"{key!r} value for {column!r} must be finite")
+    return numbers
+
+
+def farm_inputs(given):
+    """``{'crop': ..., 'inputs': {column: number}}`` for a farm given in a request body.
+
+    ValueError unless ``given`` has a ``crop`` and a finite number for every
+    column in SURFACE_COLUMNS.
+    """
+    if not isinstance(given, dict) or 'crop' not in given or any(c not in given for c in SURFACE_COLUMNS):
+        raise ValueError(f"Pass farmId or farm with crop and all of: {', '.join(SURFACE_COLUMNS)}")
+    inputs = _changes({'farm': {column: given[column] for column in SURFACE_COLUMNS}}, 'farm')
+    return {'crop': given['crop'], 'inputs': inputs}
+
+
+def _percentiles(percentiles):
+    """``percentiles`` as floats; ValueError unless it is a list of numbers between 0 and 100."""
+    if not isinstance(percentiles, (list, tuple)) or not percentiles:
+        raise ValueError("percentiles must be a non-empty list of numbers")
+    if not all(isinstance(q, (int, float)) and not isinstance(q, bool) for q in percentiles):
+        raise ValueError("percentiles must be a non-empty list of numbers")
+    # NaN fails the comparison too
+    if not all(0 <= q <= 100 for q in percentiles):
+        raise ValueError("percentiles must be between 0 and 100")
+    return [float(q) for q in percentiles]
+
+
+def _scenario_inputs(base, scenario, crops):
+    """``(crop, inputs)`` for one scenario: the base farm with its crop switched and inputs scaled or set."""
+    if not isinstance(scenario, dict):
+        raise ValueError("Each scenario must be an object")
+    crop = scenario.get('crop', base['crop'])
+    if not isinstance(crop, str) or crop not in crops:
+        raise ValueError(f"Unknown crop {crop!r}; expected one of {', '.join(crops)}")
+    inputs = dict(base['inputs'])
+    for column, factor in _changes(scenario, 'scale').items():
+        if column not in inputs:
+            raise ValueError(f"Cannot scale {column!r}; expected one of {', '.join(SURFACE_COLUMNS)}")
+        inputs[column] *= factor
+    for column, value in _changes(scenario, 'set').items():
+        if column not in inputs:
+            raise ValueError(f"Cannot set {column!r}; expected one of {', '.join(SURFACE_COLUMNS)}")
+        inputs[column] = value
+    return crop, inputs
+
+
+def _summary(values, percentiles):
+    """``{'mean': ..., 'p5': ..., ...}`` for each row of ``values`` (scenarios x samples)."""
+    quantiles = np.percentile(values, percentiles, axis=1)
+    means = values.mean(axis=1)
+    return [dict({'mean': round(float(means[i]), 4)},
+                 **{f"p{q:g}": round(float(quantiles[j, i]), 4) for j, q in enumerate(percentiles)})
+            for i in range(values.shape[0])]
+
+
+def simulate(surfaces, farm, scenarios, samples=DEFAULT_SAMPLES, season=None, percentiles=DEFAULT_PERCENTILES,
+             weather_spread=DEFAULT_WEATHER_SPREAD, seed=None):
+    """Monte Carlo outcomes of ``scenarios`` for ``farm``, all evaluated as one batch of arrays.
+
+    ``farm`` is ``{'crop': ..., 'inputs': {column: value}}``. A baseline
+    scenario (the farm as it is) comes first. Every scenario uses the same
+    draws (weather, model residuals, market rows by quantile), so
+    differences between them come from the changes alone; ``vs_baseline``
+    summarizes those per-sample differences. Revenue is yield times price
+    scaled by the demand/supply balance, clipped to 0.5-1.5, as in the
+    dashboard recommendations. Raises ValueError for bad input.
+    """
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios per request")
+    percentiles = _percentiles(percentiles)
+    if not (math.isfinite(weather_spread) and weather_spread >= 0):
+        raise ValueError("weatherSpread must be a finite number, 0 or more")
+    factor = resolve_season(season)
+
+    named = [{'name': 'baseline'}] + [dict(s, name=s.get('name') or f"scenario {i + 1}") if isinstance(s, dict) else s
+                                     for i, s in enumerate(scenarios)]
+    resolved = [_scenario_inputs(farm, scenario, surfaces.crops) for scenario in named]
+    crops = [crop for crop, _ in resolved]
+
+    # (scenarios, columns) inputs, clipped to where each crop's surface was fitted
+    x = np.array([[inputs[column] for column in SURFACE_COLUMNS] for _, inputs in resolved])
+    low = np.array([surfaces.bounds[crop][0] for crop in crops])
+    high = np.array([surfaces.bounds[crop][1] for crop in crops])
+    clipped = np.clip(x, low, high)
+
+    rng = np.random.default_rng(seed)
+    # Shared draws, one per sample
+    weather_noise = rng.standard_normal((samples, len(WEATHER_COLUMNS))) * surfaces.weather_std * weather_spread
+    residual_u = rng.random(samples)
+    market_u = rng.random(samples)
+
+    with metrics.phase('simulation'):
+        # The surfaces have no interaction terms, so the columns that do not
+        # vary between samples reduce to one constant per scenario
+        coef = np.stack([surfaces.coef[crop] for crop in crops])
+        linear, squared = coef[:, 1:1 + len(SURFACE_COLUMNS)], coef[:, 1 + len(SURFACE_COLUMNS):]
+        weather = [SURFACE_COLUMNS.index(column) for column in WEATHER_COLUMNS]
+        fixed = [j for j in range(len(SURFACE_COLUMNS)) if j not in weather]
+        z = ((clipped - surfaces.mean) / surfaces.std)[:, :, None]
+        constant = coef[:, 0] + (linear * z + squared * z * z)[:, fixed].sum(axis=1)
+
+        drawn = np.clip(clipped[:, None, weather] + weather_noise, low[:, None, weather], high[:, None, weather])
+        z = (drawn - surfaces.mean[weather]) / surfaces.std[weather]
+        predicted = (constant[:, None, :] + np.einsum('snw,swt->snt', z, linear[:, weather])
+                     + np.einsum('snw,swt->snt', z * z, squared[:, weather]))
+
+        residuals = np.stack([surfaces.residuals[crop][(residual_u * len(surfaces.residuals[crop])).astype(np.int64)]
+                              for crop in crops])
+        outcome = predicted + residuals
+        crop_yield = np.maximum(outcome[:, :, 0], 0.0)
+        sustainability = np.clip(outcome[:, :, 1], *surfaces.sustainability_range)
+
+        markets = []
+        for crop in crops:
+            rows = surfaces.market[crop].get(factor)
+            if rows is None:
+                rows = surfaces.market[crop][ALL]
+            markets.append(rows[(market_u * len(rows)).astype(np.int64)])
+        markets = np.stack(markets)
+        balance = np.clip(markets[:, :, 1] / markets[:, :, 2], 0.5, 1.5)
+        revenue = crop_yield * markets[:, :, 0] * balance
+
+        summaries = {name: _summary(values, percentiles)
+                     for name, values in (('yield', crop_yield), ('revenue', revenue),
+                                          ('sustainability', sustainability))}
+        deltas = {name: _summary(values - values[:1], percentiles)
+                  for name, values in (('revenue', revenue), ('sustainability', sustainability))}
+        better = (revenue > revenue[:1]).mean(axis=1)
+
+    results = []
+    for i, (scenario, (crop, inputs)) in enumerate(zip(named, resolved)):
+        result = {
+            'name': scenario['name'],
+            'crop': crop,
+            'inputs': {column: round(inputs[column], 4) for column in SURFACE_COLUMNS},
+            'clipped': [column for j, column in enumerate(SURFACE_COLUMNS) if clipped[i, j] != x[i, j]],
+            'yield': summaries['yield'][i],
+            'revenue': summaries['revenue'][i],
+            'sustainability': summaries['sustainability'][i]
+        }
+        if i:
+            result['vs_baseline'] = {'revenue': deltas['revenue'][i],
+                                     'sustainability': deltas['sustainability'][i],
+                                     'probability_higher_revenue': round(float(better[i]), 4)}
+        results.append(result)
+    return {
+        'samples': samples,
+        'seasonalFactor': factor,
+        'percentiles': percentiles,
+        'scenarios': results,
+        'model': {crop: surfaces.fit[crop] for crop in sorted(set(crops))}
+    }
+
+
+class Simulator:
+    """Fits ResponseSurfaces once per pair of dataset versions and runs simulations on them."""
+
+    def __init__(self, store):
+        self.store = store
+        self._surfaces = None
+        self._lock = threading.Lock()
+
+    def surfaces(self):
+        farming_data, farming_version = self.store.get_versioned('farming')
+        market_data, market_version = self.store.get_versioned('market')
+        if farming_data is None or market_data is None:
+            return None
+
+        versions = (farming_version, market_version)
+        cached = self._surfaces
+        if cached is None or cached[0] != versions:
+            with self._lock:
+                cached = self._surfaces
+                if cached is None or cached[0] != versions:
+                    with metrics.phase('aggregation'):
+                        cached = (versions, ResponseSurfaces(farming_data, market_data))
+                    self._surfaces = cached
+                    logger.info(f"Fitted response surfaces for versions {versions}")
+        return cached[1]
+
+    def farm(self, farm_id):
+        """``{'crop', 'inputs'}`` for the farm with ``Farm_ID`` ``farm_id``, or None."""
+        df = self.store.get('farming')
+        if df is None:
+            return None
+        rows = df[df['Farm_ID'].to_numpy() == farm_id]
+        if not len(rows):
+            return None
+        row = rows.iloc[0]
+        return {'crop': str(row['Crop_Type']), 'inputs': {column: float(row[column]) for column in SURFACE_COLUMNS}}
+
+    def clear(self):
+        with self._lock:
+            self._surfaces = None
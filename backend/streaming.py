@@ -0,0 +1,136 @@
+import base64
+import hashlib
+
+try:
+    from .serialization import dumps, frame_records
+except ImportError:
+    from serialization import dumps, frame_records
+
+DEFAULT_CHUNK_ROWS = 1000
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 10000
+# Query arguments that page through a result rather than change it
+PAGING_ARGS = ('cursor', 'offset', 'limit', 'format')
+
+
+class QueryError(ValueError):
+    """Raised for malformed pagination or projection parameters."""
+
+
+def select_fields(df, fields, allowed=None):
+    """Project ``df`` onto the comma separated ``fields`` (restricted to ``allowed``)."""
+    allowed = list(allowed) if allowed is not None else list(df.columns)
+    if not fields:
+        return df[allowed] if len(allowed) != len(df.columns) else df
+
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+    return df[requested]
+
+
+def encode_cursor(offset, version, query=''):
+    raw = f"{offset}:{version_tag(version)}:{query}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, version, query=''):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        offset, tag, cursor_query = raw.split(':', 2)
+        offset = int(offset)
+    except Exception:
+        raise QueryError("Invalid cursor")
+    if tag != version_tag(version):
+        raise QueryError("Cursor is stale, the dataset has changed")
+    if cursor_query != query:
+        raise QueryError("Cursor belongs to a query with different fields or filters")
+    return offset
+
+
+def query_tag(args):
+    """Short hash of the arguments that select rows and columns (``fields`` and filters)."""
+    items = args.items(multi=True) if hasattr(args, 'getlist') else args.items()
+    query = sorted((name, str(value)) for name, value in items if name not in PAGING_ARGS)
+    if not query:
+        return ''
+    return hashlib.sha256(repr(query).encode()).hexdigest()[:16]
+
+
+def version_tag(version):
+    return '-'.join(str(v) for v in version) if version else '0'
+
+
+def _int_arg(args, name, default):
+    value = args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise QueryError(f"{name} must be an integer")
+    if value < 0:
+        raise QueryError(f"{name} must not be negative")
+    return value
+
+
+class Page:
+    def __init__(self, frame, offset, total, next_cursor):
+        self.frame = frame
+        self.offset = offset
+        self.total = total
+        self.next_cursor = next_cursor
+
+
+def paginate(df, args, version):
+    """Slice ``df`` according to ``cursor``/``offset`` and ``limit`` query args.
+
+    A cursor is only accepted for the dataset version and the ``fields``
+    and filter arguments it was issued for.
+    """
+    query = query_tag(args)
+    cursor = args.get('cursor')
+    if cursor:
+        offset = decode_cursor(cursor, version, query)
+    else:
+        offset = _int_arg(args, 'offset', 0)
+    limit = _int_arg(args, 'limit', DEFAULT_PAGE_SIZE)
+    if limit < 1:
+        raise QueryError("limit must be at least 1")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    total = len(df)
+    frame = df.iloc[offset:offset + limit]
+    end = offset + len(frame)
+    next_cursor = encode_cursor(end, version, query) if end < total else None
+    return Page(frame, offset, total, next_cursor)
+
+
+def is_paged(args):
+    return any(args.get(name) for name in ('cursor', 'offset', 'limit'))
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield frame_records(df.iloc[start:start + chunk_rows])
+
+
+def iter_json_array(df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield ``df`` as a JSON array, converting at most ``chunk_rows`` rows at a time."""
+    yield b'['
+    first = True
+    for records in _chunks(df, chunk_rows):
+        # Each chunk is encoded as one array and its brackets dropped
+        body = dumps(records)[1:-1]
+        if not first:
+            body = b',' + body
+        first = False
+        yield body
+    yield b']'
+
+
+def iter_ndjson(df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield ``df`` as newline delimited JSON, one record per line."""
+    for records in _chunks(df, chunk_rows):
+        yield b''.join(dumps(record) + b'\n' for record in records)
@@ -0,0 +1,173 @@
+import os
+import math
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .cache import LRUCache
+except ImportError:
+    from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class OpenWeatherMapBackend:
+    """Current-weather lookups against OpenWeatherMap (or any server speaking its API).
+
+    Point ``url`` at a local stub server to run without network access.
+    """
+
+    def __init__(self, api_key, url, timeout=(2.0, 3.0), pool_size=20):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        # One pooled session so repeat calls reuse keep-alive connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, lat, lon):
+        response = self.session.get(self.url, params={
+            'lat': lat,
+            'lon': lon,
+            'appid': self.api_key,
+            'units': 'metric'
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        return self.normalize(response.json())
+
+    @staticmethod
+    def normalize(payload):
+        main = payload.get('main', {})
+        conditions = payload.get('weather') or [{}]
+        return {
+            'temperature': main.get('temp'),
+            'humidity': main.get('humidity'),
+            'weather': conditions[0].get('description') or conditions[0].get('main'),
+            'rainfall': payload.get('rain', {}).get('1h', 0.0),
+            'wind_speed': payload.get('wind', {}).get('speed')
+        }
+
+
+class WeatherClient:
+    """Cached, coalescing front end for a weather backend.
+
+    Coordinates are snapped to a ``grid`` degree cell and cached per cell.
+    Within ``ttl`` seconds the cached reading is served as is; up to
+    ``stale_ttl`` it is still served (marked stale) while one background
+    refresh runs. Concurrent misses for the same cell share a single
+    upstream request, and a failed refresh falls back to the stale reading.
+    """
+
+    def __init__(self, backend, grid=0.1, ttl=600, stale_ttl=3600, maxsize=4096, workers=4):
+        self.backend = backend
+        self.grid = grid
+        self.ttl = ttl
+        self.cache = LRUCache(maxsize=maxsize, ttl=stale_ttl)
+        self.workers = workers
+        self._reset_threads()
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.coalesced = 0
+        if hasattr(os, 'register_at_fork'):
+            # Pool threads and in-flight refreshes do not survive a fork into a worker process
+            os.register_at_fork(after_in_child=self._reset_threads)
+
+    def _reset_threads(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='weather')
+
+    def cell(self, lat, lon):
+        return (math.floor(lat / self.grid), math.floor(lon / self.grid))
+
+    def _cell_centre(self, cell):
+        return (round((cell[0] + 0.5) * self.grid, 4), round((cell[1] + 0.5) * self.grid, 4))
+
+    def get(self, lat, lon):
+        """Weather for (lat, lon), or None if nothing is cached and the backend fails."""
+        cell = self.cell(lat, lon)
+        entry = self.cache.get(cell)
+        if entry is not None:
+            data, fetched_at = entry
+            age = time.time() - fetched_at
+            if age <= self.ttl:
+                return dict(data, stale=False)
+            # Serve the stale reading now and refresh it off the request path
+            self._refresh(cell, wait=False)
+            return dict(data, stale=True)
+
+        entry = self._refresh(cell, wait=True)
+        return dict(entry[0], stale=False) if entry is not None else None
+
+    def cached(self, lat, lon):
+        """Cached weather for (lat, lon) without going upstream, or None."""
+        entry = self.cache.get(self.cell(lat, lon))
+        if entry is None:
+            return None
+        data, fetched_at = entry
+        return dict(data, stale=time.time() - fetched_at > self.ttl)
+
+    def get_many(self, coords, max_cells=None):
+        """Weather for each (lat, lon) pair; distinct cells are fetched in parallel.
+
+        With ``max_cells``, only the first that many distinct cells may go
+        upstream; pairs in later cells get a cached reading or None, so one
+        request cannot fan out into thousands of upstream calls.
+        """
+        cells = list(dict.fromkeys(self.cell(lat, lon) for lat, lon in coords))
+        if max_cells is not None:
+            cells = cells[:max_cells]
+        if len(cells) > 1:
+            list(self._executor.map(lambda c: self.get(*self._cell_centre(c)), cells))
+        allowed = set(cells)
+        return [self.get(lat, lon) if self.cell(lat, lon) in allowed else self.cached(lat, lon)
+                for lat, lon in coords]
+
+    def _refresh(self, cell, wait):
+        with self._lock:
+            future = self._inflight.get(cell)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[cell] = future
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        if owner:
+            if wait:
+                self._fetch(cell, future)
+            else:
+                self._executor.submit(self._fetch, cell, future)
+        return future.result() if wait else None
+
+    def _fetch(self, cell, future):
+        entry = None
+        try:
+            data = self.backend.fetch(*self._cell_centre(cell))
+            lat, lon = self._cell_centre(cell)
+            data = dict(data, lat=lat, lon=lon, fetched_at=time.time())
+            entry = (data, data['fetched_at'])
+            self.cache.put(cell, entry)
+        except Exception as e:
+            with self._lock:
+                self.upstream_errors += 1
+            logger.error(f"Error fetching weather for cell {cell}: {str(e)}")
+        finally:
+            with self._lock:
+                self._inflight.pop(cell, None)
+            future.set_result(entry)
+
+    def stats(self):
+        # Counters change under the same lock as the in-flight table
+        with self._lock:
+            counters = {'upstream_calls': self.upstream_calls, 'upstream_errors': self.upstream_errors,
+                        'coalesced': self.coalesced}
+        return dict(self.cache.stats(), **counters)
@@ -0,0 +1,74 @@
+"""Compare the flat forest export with the scikit-learn estimator it came from.
+
+    python benchmarks/model_export.py --rows 5000 --trees 100,50,25
+
+Checks that the export's probabilities are identical to predict_proba
+(the run exits non-zero if they are not), then reports single-row and
+batch latency, memory, and how often each truncated forest agrees with
+the full one.
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from backend.forest import FlatForest  # noqa: E402
+from backend.model import DEFAULT_MODEL_PARAMS  # noqa: E402
+
+
+def per_call_ms(fn, X, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the flat forest export.')
+    parser.add_argument('--rows', type=int, default=5000, help='training rows')
+    parser.add_argument('--features', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=256)
+    parser.add_argument('--trees', default='100,50,25', help='comma separated tree counts to compare')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(args.rows, args.features))
+    y = np.array(['corn', 'rice', 'soybean', 'wheat'])[(X[:, 0] > 0) * 2 + (X[:, 1] + rng.normal(size=args.rows) > 0)]
+    model = RandomForestClassifier(**DEFAULT_MODEL_PARAMS).fit(X, y)
+    forest = FlatForest.from_estimator(model)
+
+    probe = rng.normal(size=(5000, args.features))
+    expected = model.predict_proba(probe)
+    if not np.array_equal(forest.predict_proba(probe), expected):
+        print("FAIL: flat forest probabilities differ from predict_proba")
+        return 1
+    single_ok = all(np.array_equal(forest.predict_proba(probe[i:i + 1]), expected[i:i + 1]) for i in range(100))
+    if not single_ok:
+        print("FAIL: single-row probabilities differ from predict_proba")
+        return 1
+    print("Probabilities identical to predict_proba")
+
+    estimator_bytes = len(pickle.dumps(model))
+    print(f"\n{'engine':<20} {'trees':>5} {'row ms':>8} {'batch ms':>9} {'bytes':>10} {'agree':>6}")
+    row, batch = probe[:1], probe[:args.batch]
+    print(f"{'sklearn':<20} {len(model.estimators_):>5} {per_call_ms(model.predict_proba, row, args.repeat):>8.3f} "
+          f"{per_call_ms(model.predict_proba, batch, args.repeat // 10 or 1):>9.3f} {estimator_bytes:>10} {1:>6.3f}")
+    full = expected.argmax(axis=1)
+    for n in (int(t) for t in args.trees.split(',')):
+        subset = forest.trees(n)
+        agree = float((subset.predict_proba(probe).argmax(axis=1) == full).mean())
+        print(f"{'flat':<20} {subset.n_trees:>5} {per_call_ms(subset.predict_proba, row, args.repeat):>8.3f} "
+              f"{per_call_ms(subset.predict_proba, batch, args.repeat // 10 or 1):>9.3f} "
+              f"{subset.nbytes:>10} {agree:>6.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""Latency, throughput and memory benchmarks for the API routes.
+
+In-process mode drives the Flask app through its test client against
+synthetic datasets of the requested sizes:
+
+    python benchmarks/run_benchmarks.py --rows 10000,100000,1000000
+
+Server mode drives an already running server with concurrent clients
+(start it with FARM_DATA_DIR pointing at a synthetic data directory to
+test large datasets):
+
+    python benchmarks/run_benchmarks.py --url http://localhost:5000 --concurrency 16 --server-pid 1234
+
+Each scenario reports p50/p95/p99 latency, throughput and peak RSS. Results
+are compared against --baseline (default benchmarks/baseline.json) and the
+run exits non-zero when a scenario regresses by more than --tolerance (and,
+for latencies, by more than --min-delta-ms, so sub-millisecond jitter does
+not count), or when a scenario has no baseline to compare with. A batch
+response with per-input errors counts as an error.
+
+The committed baseline.json was recorded with the default in-process run on
+a single-core Linux machine. Timings only compare on the machine that
+recorded them, so before relying on the exit status elsewhere, record a
+local baseline:
+
+    python benchmarks/run_benchmarks.py --update-baseline
+
+--update-baseline stores the current results (merged into the existing file)
+as the new baseline.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import generate_all  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SAMPLE_INPUT = {
+    'soil_type': 'clay',
+    'water_availability': 'high',
+    'temperature': 'warm',
+    'rainfall': 'high'
+}
+# Values the model is trained on (and the frontend offers), so the batch is scored rather than rejected
+BATCH_INPUTS = [
+    dict(SAMPLE_INPUT, soil_type=soil, rainfall=rain)
+    for soil in ('clay', 'sandy', 'silt')
+    for rain in ('high', 'medium', 'low')
+] * 12
+
+
+class Scenario:
+    def __init__(self, name, method, path, body=None, heavy=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        # Heavy scenarios return the whole dataset and run fewer iterations
+        self.heavy = heavy
+
+
+SCENARIOS = [
+    Scenario('recommendations', 'POST', '/api/recommendations', SAMPLE_INPUT),
+    Scenario('recommendations-batch', 'POST', '/api/recommendations/batch', {'inputs': BATCH_INPUTS}),
+    Scenario('farming-data-page', 'GET', '/api/farming-data?limit=500'),
+    Scenario('farming-data', 'GET', '/api/farming-data', heavy=True),
+    Scenario('market-data', 'GET', '/api/market-data', heavy=True),
+    Scenario('market-summary', 'GET', '/api/market-summary'),
+    Scenario('crop-analysis', 'GET', '/api/crop-analysis'),
+    Scenario('farm-data', 'GET', '/api/farm-data', heavy=True),
+    Scenario('farm-data-compact', 'GET', '/api/farm-data?v=2'),
+    Scenario('historical', 'GET', '/api/historical?limit=100'),
+    Scenario('similar-farms', 'GET', '/api/similar-farms?farmId=17&k=10'),
+    Scenario('simulate', 'POST', '/api/simulate',
+             {'farmId': 17, 'seed': 0, 'scenarios': [{'crop': 'Rice'},
+                                                     {'scale': {'Fertilizer_Usage_kg': 0.8}}]}),
+]
+
+
+def peak_rss_mb(pid=None):
+    if pid is None:
+        # ru_maxrss is in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def failed(status, payload):
+    """True for an error status, or a batch answer with an error for any of its inputs."""
+    if status >= 400:
+        return True
+    results = payload.get('results') if isinstance(payload, dict) else None
+    return isinstance(results, list) and any(isinstance(r, dict) and 'error' in r for r in results)
+
+
+def summarize(latencies, elapsed, errors, rss):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'requests': int(len(latencies)),
+        'errors': errors,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None,
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+        'throughput_rps': len(latencies) / elapsed if elapsed > 0 else None,
+        'peak_rss_mb': rss
+    }
+
+
+def _iterations(scenario, iterations):
+    return max(3, iterations // 20) if scenario.heavy else iterations
+
+
+def run_inprocess(rows, iterations, data_root):
+    data_dir = os.path.join(data_root, f'rows-{rows}')
+    if not os.path.exists(data_dir):
+        print(f"Generating {rows} synthetic rows in {data_dir}")
+        generate_all(rows, data_dir)
+
+    if 'HISTORY_DB_PATH' not in os.environ:
+        # Start from an empty history; earlier runs' predictions would slow the historical scenario down
+        history = os.path.join(data_root, 'history.db')
+        for path in (history, history + '-wal', history + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+        os.environ['HISTORY_DB_PATH'] = history
+    from backend import server
+    server.data.store.data_dir = data_dir
+    server.data.store.cache_dir = os.path.join(data_dir, '.cache')
+    server.data.clear()
+    client = server.app.test_client()
+
+    results = {}
+    for scenario in SCENARIOS:
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(_iterations(scenario, iterations)):
+            t0 = time.perf_counter()
+            if scenario.method == 'POST':
+                response = client.post(scenario.path, json=scenario.body)
+            else:
+                response = client.get(scenario.path)
+            response.get_data()
+            latencies.append(time.perf_counter() - t0)
+            if failed(response.status_code, response.get_json(silent=True)):
+                errors += 1
+        elapsed = time.perf_counter() - started
+        results[f'inprocess/{rows}/{scenario.name}'] = summarize(latencies, elapsed, errors, peak_rss_mb())
+    return results
+
+
+def run_server(url, iterations, concurrency, server_pid, label):
+    import requests
+
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def call(scenario):
+        t0 = time.perf_counter()
+        try:
+            if scenario.method == 'POST':
+                response = session().post(url + scenario.path, json=scenario.body)
+            else:
+                response = session().get(url + scenario.path)
+        except requests.RequestException:
+            return time.perf_counter() - t0, False
+        latency = time.perf_counter() - t0
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return latency, not failed(response.status_code, payload)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for scenario in SCENARIOS:
+            count = _iterations(scenario, iterations)
+            started = time.perf_counter()
+            outcomes = list(executor.map(call, [scenario] * count))
+            elapsed = time.perf_counter() - started
+            latencies = [latency for latency, _ in outcomes]
+            errors = sum(1 for _, ok in outcomes if not ok)
+            results[f'server/{label}/{scenario.name}'] = summarize(
+                latencies, elapsed, errors, peak_rss_mb(server_pid))
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms=0.0):
+    """Return a description of every metric that is worse than the baseline by > tolerance.
+
+    Latencies (and throughput, as time per request) must also be worse by
+    more than ``min_delta_ms``. Scenarios missing from either side are skipped.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric in ('p95_ms', 'p99_ms', 'peak_rss_mb'):
+            floor = min_delta_ms if metric.endswith('_ms') else 0.0
+            if current.get(metric) and previous.get(metric) and \
+                    current[metric] > max(previous[metric] * (1 + tolerance), previous[metric] + floor):
+                regressions.append(f"{key} {metric}: {previous[metric]:.2f} -> {current[metric]:.2f}")
+        if current.get('throughput_rps') and previous.get('throughput_rps') and \
+                current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance) and \
+                1000 / current['throughput_rps'] - 1000 / previous['throughput_rps'] > min_delta_ms:
+            regressions.append(f"{key} throughput_rps: {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f}")
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append(f"{key} errors: {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':<48} {'reqs':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'RSS MB':>8}")
+    for key, r in results.items():
+        fmt = lambda v, spec: format(v, spec) if v is not None else '-'  # noqa: E731
+        print(f"{key:<48} {r['requests']:>6} {r['errors']:>4} {fmt(r['p50_ms'], '9.2f')} "
+              f"{fmt(r['p95_ms'], '9.2f')} {fmt(r['p99_ms'], '9.2f')} "
+              f"{fmt(r['throughput_rps'], '9.1f')} {fmt(r['peak_rss_mb'], '8.1f')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the farm advisor API routes.')
+    parser.add_argument('--rows', default='10000', help='comma separated dataset sizes for in-process runs')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--data-root', default=os.path.join(tempfile.gettempdir(), 'farm-advisor-bench'))
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--server-pid', type=int, help='read peak RSS of this process in server mode')
+    parser.add_argument('--label', default='default', help='name for the server-mode dataset')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='ignore latency regressions smaller than this many milliseconds')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        results = run_server(args.url.rstrip('/'), args.iterations, args.concurrency, args.server_pid, args.label)
+    else:
+        results = {}
+        for rows in (int(r) for r in args.rows.split(',')):
+            results.update(run_inprocess(rows, args.iterations, args.data_root))
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.update_baseline:
+        print(f"\nNo baseline at {args.baseline}; record one with --update-baseline", file=sys.stderr)
+        return 2
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    missing = [key for key in results if key not in baseline]
+    if missing:
+        print(f"\nNo baseline for {len(missing)} scenarios (add them with --update-baseline):", file=sys.stderr)
+        for key in missing:
+            print(f"  - {key}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Serialization speed of the shipped 10k-row datasets, old path against new.
+
+    python benchmarks/serialization.py --repeat 20
+
+"to_dict + json" is what the routes did before (boxed records through the
+stdlib encoder); "records" and "columns" are the two layouts of
+backend/serialization.py (orjson when installed, NumPy arrays written
+without boxing).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from backend.database import dataset_store  # noqa: E402
+from backend.serialization import dumps, frame_payload, orjson  # noqa: E402
+
+
+def best_ms(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, len(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark response serialization.')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"encoder: {'orjson' if orjson is not None else 'stdlib json'}")
+    print(f"\n{'dataset':<10} {'method':<16} {'ms':>8} {'bytes':>10} {'speedup':>8}")
+    for name in dataset_store.datasets:
+        df = dataset_store.get(name)
+        methods = [
+            ('to_dict + json', lambda: json.dumps(df.to_dict(orient='records')).encode()),
+            ('records', lambda: dumps(frame_payload(df, 'records'))),
+            ('columns', lambda: dumps(frame_payload(df, 'columns'))),
+        ]
+        baseline = None
+        for method, fn in methods:
+            ms, size = best_ms(fn, args.repeat)
+            baseline = baseline or ms
+            print(f"{name:<10} {method:<16} {ms:>8.2f} {size:>10} {baseline / ms:>7.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
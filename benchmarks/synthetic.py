@@ -0,0 +1,59 @@
+"""Synthetic farm and market datasets scaled up from the shipped CSV schemas.
+
+Each column is resampled from the empirical distribution of the real file
+(numeric columns with a small jitter), so aggregates and filters behave like
+the real data at any row count. Files are written in chunks to keep memory
+flat when generating millions of rows.
+
+    python benchmarks/synthetic.py --rows 1000000 --out /tmp/farm-1m
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backend.database import DATA_DIR, DATASETS  # noqa: E402
+
+ID_COLUMNS = {'Farm_ID', 'Market_ID'}
+CHUNK_ROWS = 100000
+
+
+def generate(name, rows, out_dir, seed=42, source_dir=DATA_DIR):
+    spec = DATASETS[name]
+    source = pd.read_csv(os.path.join(source_dir, spec['file']), dtype=spec['dtypes'])
+    rng = np.random.default_rng(seed)
+    path = os.path.join(out_dir, spec['file'])
+
+    for start in range(0, rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, rows - start)
+        chunk = {}
+        for column in source.columns:
+            values = source[column].to_numpy()
+            if column in ID_COLUMNS:
+                chunk[column] = np.arange(start + 1, start + n + 1)
+            elif isinstance(source[column].dtype, pd.CategoricalDtype):
+                chunk[column] = rng.choice(np.asarray(values, dtype=object), n)
+            else:
+                sampled = rng.choice(values, n)
+                chunk[column] = sampled + rng.normal(0, values.std() * 0.01, n)
+        pd.DataFrame(chunk, columns=source.columns).to_csv(
+            path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def generate_all(rows, out_dir, seed=42):
+    os.makedirs(out_dir, exist_ok=True)
+    return [generate(name, rows, out_dir, seed) for name in DATASETS]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    for path in generate_all(args.rows, args.out, args.seed):
+        print(f"Wrote {args.rows} rows to {path}")
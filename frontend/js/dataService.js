@@ -1,7 +1,8 @@
 export class DataService {
-    static async getFarmData() {
+    // Compact payload (v2): summaries plus usage series downsampled to about `points` per line
+    static async getFarmData(points = 500) {
         try {
-            const response = await fetch('http://localhost:5000/api/farm-data');
+            const response = await fetch(`http://localhost:5000/api/farm-data?v=2&points=${points}`);
             return await response.json();
         } catch (error) {
             console.error('Error fetching farm data:', error);
@@ -1773,17 +1773,17 @@ class DashboardController {
             {
                 type: 'line',
                 data: {
-                    labels: farmData.resource_usage.fertilizer.labels,
+                    labels: farmData.series.farm_id,
                     datasets: [
                         {
                             label: 'Fertilizer Usage',
-                            data: farmData.resource_usage.fertilizer.data,
+                            data: farmData.series.fertilizer,
                             borderColor: '#4BC0C0',
                             fill: false
                         },
                         {
                             label: 'Pesticide Usage',
-                            data: farmData.resource_usage.pesticide.data,
+                            data: farmData.series.pesticide,
                             borderColor: '#FF6384',
                             fill: false
                         }
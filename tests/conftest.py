@@ -0,0 +1,32 @@
+"""Point everything the backend writes (datasets, model, history, logs) at a temporary directory.
+
+Runs before any test module imports the backend, whose paths are read
+from the environment at import time.
+"""
+import os
+import atexit
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DATA_DIR = os.path.join(ROOT, 'backend', 'data')
+
+TMP_DIR = tempfile.mkdtemp(prefix='farm-advisor-tests-')
+DATA_DIR = os.path.join(TMP_DIR, 'data')
+shutil.copytree(SOURCE_DATA_DIR, DATA_DIR, ignore=shutil.ignore_patterns('.cache', '*.lock'))
+
+os.environ.update({
+    'FARM_DATA_DIR': DATA_DIR,
+    'MODEL_DIR': os.path.join(TMP_DIR, 'models'),
+    'HISTORY_DB_PATH': os.path.join(TMP_DIR, 'history.db'),
+    'LOG_FILE': os.path.join(TMP_DIR, 'farm_advisor.log'),
+    'PROFILE_DIR': os.path.join(TMP_DIR, 'profiles'),
+    'ASSETS_DIR': os.path.join(TMP_DIR, 'build', 'frontend'),
+    # Nothing listens here, so a test can never reach the real weather service
+    'WEATHER_API_URL': 'http://127.0.0.1:9/weather',
+    'SELECTION_WORKERS': '1',
+})
+
+# atexit runs handlers last-in first-out, so this runs after the backend's own
+# shutdown handlers (the history flush) are done with the directory
+atexit.register(shutil.rmtree, TMP_DIR, ignore_errors=True)
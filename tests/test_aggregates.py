@@ -0,0 +1,100 @@
+import os
+import json
+import shutil
+
+import pytest
+
+from backend.aggregates import AggregateCache, crop_analysis, market_summary, weather_summary
+from backend.database import DATASETS, DatasetStore
+from tests.conftest import SOURCE_DATA_DIR
+
+
+@pytest.fixture
+def store(tmp_path):
+    for spec in DATASETS.values():
+        shutil.copy(os.path.join(SOURCE_DATA_DIR, spec['file']), tmp_path)
+    return DatasetStore(str(tmp_path))
+
+
+def test_summaries_match_pandas(store):
+    farming = store.get('farming')
+    analysis = crop_analysis(farming)
+    grouped = farming.groupby('Crop_Type', observed=True)
+    assert sorted(analysis) == sorted(grouped.groups)
+    for crop, entry in analysis.items():
+        rows = grouped.get_group(crop)
+        assert entry['count'] == len(rows)
+        assert entry['Crop_Yield_ton'] == pytest.approx(rows['Crop_Yield_ton'].mean())
+        assert entry['Sustainability_Score_std'] == pytest.approx(rows['Sustainability_Score'].std())
+
+    assert weather_summary(farming) == pytest.approx({'Temperature_C': farming['Temperature_C'].mean(),
+                                                      'Rainfall_mm': farming['Rainfall_mm'].mean()})
+    market = store.get('market')
+    summary = market_summary(market)
+    assert summary['distributions']['product'] == market['Product'].value_counts().to_dict()
+    rice = market[market['Product'] == 'Rice']
+    assert summary['products']['data']['Rice']['demand'] == pytest.approx(rice['Demand_Index'].mean())
+
+
+def test_entries_are_cached_per_dataset_version(store):
+    cache = AggregateCache(store)
+    first = cache.get('crop-analysis')
+    assert cache.get('crop-analysis') is first
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert json.loads(first.body) == first.payload
+
+    # A rewritten file is a new version: recomputed, with a new ETag
+    with open(store.path('farming')) as f:
+        lines = f.readlines()
+    with open(store.path('farming'), 'w') as f:
+        f.writelines(lines[:101])
+    second = cache.get('crop-analysis')
+    assert second is not first
+    assert second.etag != first.etag
+    assert sum(entry['count'] for entry in second.payload.values()) == 100
+    # Other aggregates of the dataset are unaffected until requested
+    assert cache.stats()['misses'] == 2
+
+
+def test_unavailable_dataset(store):
+    os.remove(store.path('market'))
+    assert AggregateCache(store).get('market-summary') is None
+
+
+def _assert_close(actual, expected):
+    if isinstance(expected, dict):
+        assert sorted(actual) == sorted(expected)
+        for key in expected:
+            _assert_close(actual[key], expected[key])
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected)
+    else:
+        assert actual == expected
+
+
+@pytest.mark.parametrize('name, dataset, rows', [
+    ('crop-analysis', 'farming', [
+        {'Soil_pH': 6.5, 'Soil_Moisture': 25, 'Temperature_C': 24, 'Rainfall_mm': 180, 'Crop_Type': crop,
+         'Fertilizer_Usage_kg': 120, 'Pesticide_Usage_kg': 8, 'Crop_Yield_ton': crop_yield,
+         'Sustainability_Score': 70}
+        for crop, crop_yield in [('Rice', 9.5), ('Quinoa', 2), ('Quinoa', 3)]]),
+    ('market-summary', 'market', [
+        {'Product': product, 'Market_Price_per_ton': 300, 'Demand_Index': 120, 'Supply_Index': 90,
+         'Competitor_Price_per_ton': 310, 'Economic_Indicator': 1.1, 'Weather_Impact_Score': 50,
+         'Seasonal_Factor': 'High', 'Consumer_Trend_Index': 80}
+        for product in ('Rice', 'Quinoa')]),
+])
+def test_appended_rows_update_summaries_incrementally(store, name, dataset, rows):
+    cache = AggregateCache(store)
+    first = cache.get(name)
+    store.append(dataset, rows)
+    second = cache.get(name)
+    third = cache.get(name)
+
+    assert cache.stats()['incremental'] == 1 and cache.stats()['misses'] == 1
+    assert third is second
+    assert second.etag != first.etag
+    # Identical to computing over the whole new frame, and the old entry is left as it was
+    _assert_close(second.payload, AggregateCache(store).get(name).payload)
+    assert b'Quinoa' not in first.body
+    assert b'Quinoa' in second.body
@@ -0,0 +1,297 @@
+import os
+import gzip
+import shutil
+
+import pytest
+
+from backend import server
+from backend.data_access import DataAccess
+from backend.database import DATASETS, DatasetStore
+from backend.weather_api import WeatherClient
+from tests.conftest import SOURCE_DATA_DIR
+from tests.test_weather_api import FakeBackend
+
+SIMULATION_FARM = {'crop': 'Rice', 'Soil_pH': 6.5, 'Soil_Moisture': 30, 'Temperature_C': 25, 'Rainfall_mm': 150,
+                   'Fertilizer_Usage_kg': 120, 'Pesticide_Usage_kg': 10}
+FARM = {'soil_type': 'clay', 'water_availability': 'medium', 'temperature': 'moderate', 'rainfall': 'medium'}
+
+
+@pytest.fixture(scope='module')
+def client():
+    app = server.create_app()
+    server.retrainer.stop()
+    return app.test_client()
+
+
+@pytest.fixture
+def weather(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(server.farming_system, 'weather_client', WeatherClient(backend))
+    return backend
+
+
+def test_batch_caps_live_weather_cells(client, weather, monkeypatch):
+    monkeypatch.setattr(server, 'WEATHER_BATCH_MAX_CELLS', 3)
+    inputs = [dict(FARM, lat=i, lon=i) for i in range(10)]
+    response = client.post('/api/recommendations/batch', json={'inputs': inputs})
+
+    assert response.status_code == 200
+    sources = [result['weather_impact']['source'] for result in response.get_json()['results']]
+    assert sources == ['live'] * 3 + ['input'] * 7
+    assert weather.calls == 3
+
+
+def test_batch_reports_invalid_coordinates_per_input(client, weather):
+    inputs = [dict(FARM, lat=10, lon=20), dict(FARM, lat='nan', lon=20), dict(FARM, lat=91, lon=0),
+              dict(FARM, lat=0, lon='-inf'), dict(FARM, lat=10), dict(FARM, lat='north', lon=0), FARM]
+    response = client.post('/api/recommendations/batch', json={'inputs': inputs})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0]['weather_impact']['source'] == 'live'
+    assert [r['error'] for r in results[1:6]] == ['lat or lon out of range'] * 3 + ['lat and lon must both be numbers'] * 2
+    assert results[6]['weather_impact']['source'] == 'input'
+    assert weather.calls == 1
+
+
+def test_simulate(client):
+    response = client.post('/api/simulate', json={'farm': SIMULATION_FARM, 'samples': 200, 'season': 'Summer',
+                                                  'percentiles': [10, 90], 'seed': 1,
+                                                  'scenarios': [{'scale': {'Fertilizer_Usage_kg': 0.8}}]})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('change', [
+    {'season': 3},
+    {'season': ['summer']},
+    {'season': 'monsoon'},
+    {'percentiles': '50'},
+    {'percentiles': [50, 101]},
+    {'farm': dict(SIMULATION_FARM, Soil_Moisture='nan')},
+    {'farm': dict(SIMULATION_FARM, Rainfall_mm='inf')},
+    {'farm': {'crop': 'Rice'}},
+    {'weatherSpread': 'nan'},
+])
+def test_simulate_rejects_bad_input(client, change):
+    body = dict({'farm': SIMULATION_FARM, 'samples': 100}, **change)
+    response = client.post('/api/simulate', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_similar_farms(client):
+    query = {'Soil_pH': 6.5, 'Soil_Moisture': 30, 'Temperature_C': 25, 'Rainfall_mm': 150, 'k': 3}
+    response = client.get('/api/similar-farms', query_string=query)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['neighbors']) == 3
+    assert body['query']['Soil_Moisture'] == 30.0
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-inf', 'wet'])
+def test_similar_farms_rejects_non_finite_features(client, value):
+    query = {'Soil_pH': 6.5, 'Soil_Moisture': value, 'Temperature_C': 25, 'Rainfall_mm': 150}
+    response = client.get('/api/similar-farms', query_string=query)
+    assert response.status_code == 400
+
+
+def test_history_date_range(client, weather):
+    client.post('/api/recommendations', json=FARM)
+    response = client.get('/api/historical', query_string={'start': '2000-01-01', 'end': '2999-12-31T23:59:59+00:00'})
+    assert response.status_code == 200
+    assert response.get_json()['total_predictions'] >= 1
+    assert client.get('/api/historical', query_string={'end': '2000-01-01'}).get_json()['total_predictions'] == 0
+
+
+@pytest.mark.parametrize('query', [{'start': 'yesterday'}, {'end': '2024-13-01'}, {'start': "' OR 1=1 --"}])
+def test_history_rejects_invalid_dates(client, query):
+    response = client.get('/api/historical', query_string=query)
+    assert response.status_code == 400
+    assert 'ISO 8601' in response.get_json()['error']
+
+
+def test_recommendation(client, weather):
+    response = client.post('/api/recommendations', json=FARM)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['primary_crop'] in server.farming_system.state.classes
+    assert body['weather_impact']['source'] == 'input'
+
+
+@pytest.mark.parametrize('field, value', [('soil_type', 'zzz'), ('rainfall', None), ('temperature', 3)])
+def test_recommendation_rejects_unknown_categories(client, field, value):
+    response = client.post('/api/recommendations', json=dict(FARM, **{field: value}))
+    assert response.status_code == 400
+    error = response.get_json()['error']
+    assert field in error and repr(value) in error
+
+    batch = client.post('/api/recommendations/batch', json=[dict(FARM, **{field: value})])
+    assert batch.get_json()['results'][0]['error'] == error
+
+
+@pytest.mark.parametrize('body', [{'soil_type': 'clay'}, ['clay'], 'clay'])
+def test_recommendation_requires_every_field(client, body):
+    assert client.post('/api/recommendations', json=body).status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/api/crop-analysis', '/api/weather-data', '/api/market-summary'])
+def test_aggregates_revalidate_with_etags(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+    assert response.get_json()
+
+    cached = client.get(path, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+    assert client.get(path, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_historical_data_filters(client):
+    query = {'Soil_pH_min': '6', 'Soil_pH_max': '6.5', 'Crop_Type': 'rice,wheat', 'limit': '1000',
+             'startDate': '2024-01-01'}
+    response = client.get('/api/historical-data', query_string=query)
+    assert response.status_code == 200
+    assert response.headers['X-Ignored-Filters'] == 'startDate'
+    body = response.get_json()
+    farming = server.data.frame('farming')
+    expected = farming[farming['Soil_pH'].between(6, 6.5) & farming['Crop_Type'].isin(['Rice', 'Wheat'])]
+    assert body['total'] == len(expected)
+    assert [row['Farm_ID'] for row in body['data']] == expected['Farm_ID'].head(1000).tolist()
+
+    assert client.get('/api/historical-data', query_string={'Soil_pH_min': 'low'}).status_code == 400
+
+
+def test_recommendation_payloads_are_cached_per_model(client):
+    system = server.farming_system
+    system.prediction_cache.clear()
+    inputs = [dict(FARM, soil_type=soil) for soil in ('clay', 'sandy', 'clay')]
+    hits = system.prediction_cache.stats()['hits']
+
+    first = client.post('/api/recommendations/batch', json=inputs).get_json()['results']
+    # The repeated input in the same batch is scored again; the next batch is served from the cache
+    assert system.prediction_cache.stats()['hits'] == hits
+    second = client.post('/api/recommendations/batch', json=inputs).get_json()['results']
+    assert system.prediction_cache.stats()['hits'] == hits + 3
+    assert second == first
+
+    system.apply_artifact(system.state.artifact)
+    assert len(system.prediction_cache) == 0
+
+
+def test_routes_are_registered_once(client):
+    rules = [(rule.rule, method) for rule in client.application.url_map.iter_rules()
+             for method in rule.methods - {'HEAD', 'OPTIONS'}]
+    assert len(rules) == len(set(rules))
+    assert {('/api/recommendations', 'GET'), ('/api/recommendations', 'POST'), ('/api/health', 'GET'),
+            ('/', 'GET')} <= set(rules)
+
+
+def test_health(client):
+    body = client.get('/api/health').get_json()
+    assert body['status'] == 'healthy'
+    assert body['model_status'] == 'initialized'
+    assert body['model_version'] == server.farming_system.model_version
+
+
+def test_recommendation_routes_by_method(client, weather):
+    dashboard = client.get('/api/recommendations', query_string={'soilType': 'Loamy'})
+    scored = client.post('/api/recommendations', json=FARM)
+    assert dashboard.status_code == scored.status_code == 200
+    assert dashboard.get_json() == server.data.recommender.recommend('Loamy', None)
+    assert 'primary_crop' in scored.get_json()
+    assert 'primary_crop' not in dashboard.get_json()
+
+
+def test_frontend_is_served_unless_proxied(client, monkeypatch):
+    assert client.get('/').status_code == 200
+
+    monkeypatch.setattr(server, 'STATIC_MODE', 'proxy')
+    proxied = server.create_app()
+    server.retrainer.stop()
+    proxied = proxied.test_client()
+    assert proxied.get('/').status_code == 404
+    assert proxied.get('/api/health').status_code == 200
+
+
+@pytest.fixture
+def own_data(tmp_path, monkeypatch):
+    """A data layer over a copy of the datasets, so appended rows stay out of the shared one."""
+    for spec in DATASETS.values():
+        shutil.copy(os.path.join(SOURCE_DATA_DIR, spec['file']), tmp_path)
+    access = DataAccess(DatasetStore(str(tmp_path)))
+    monkeypatch.setattr(server, 'data', access)
+    return access
+
+
+def test_ingest_appends_rows(client, own_data):
+    before = len(own_data.frame('farming'))
+    summary = client.get('/api/crop-analysis')
+    row = {'Soil_pH': 6.5, 'Soil_Moisture': 25, 'Temperature_C': 24, 'Rainfall_mm': 180, 'Crop_Type': 'Quinoa',
+           'Fertilizer_Usage_kg': 120, 'Pesticide_Usage_kg': 8, 'Crop_Yield_ton': 5, 'Sustainability_Score': 70}
+
+    response = client.post('/api/farming-data', json={'rows': [row, row]})
+    assert response.status_code == 201
+    assert response.get_json() == {'appended': 2, 'total': before + 2}
+    assert client.post('/api/farming-data', json=[row]).get_json()['total'] == before + 3
+
+    updated = client.get('/api/crop-analysis', headers={'If-None-Match': summary.headers['ETag']})
+    assert updated.status_code == 200
+    assert updated.get_json()['Quinoa']['count'] == 3
+    assert own_data.aggregates.stats()['incremental'] == 1
+
+
+@pytest.mark.parametrize('body, error', [
+    ([], 'Expected a non-empty list of rows'),
+    ({'rows': 'x'}, 'Expected a non-empty list of rows'),
+    ([{'Soil_pH': 'acid'}], 'Invalid rows'),
+])
+def test_ingest_rejects_invalid_rows(client, own_data, body, error):
+    before = os.path.getsize(own_data.store.path('farming'))
+    response = client.post('/api/farming-data', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    assert os.path.getsize(own_data.store.path('farming')) == before
+
+
+def test_ingest_limits_rows_per_request(client, own_data, monkeypatch):
+    monkeypatch.setattr(server, 'MAX_INGEST_ROWS', 2)
+    response = client.post('/api/market-data', json=[{}] * 3)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'At most 2 rows per request'
+
+
+def test_farm_data_versions(client):
+    legacy = client.get('/api/farm-data').get_json()
+    compact = client.get('/api/farm-data', query_string={'v': 2, 'points': 50, 'bins': 5}).get_json()
+    assert len(legacy['raw_data']) == compact['rows'] == len(server.data.frame('farming'))
+    assert (compact['version'], compact['points'], compact['bins']) == (2, 50, 5)
+    assert len(compact['distributions']['rainfall']) == 5
+    assert len(compact['series']['farm_id']) <= 100
+    assert compact['averages'] == legacy['averages']
+
+
+@pytest.mark.parametrize('query, error', [
+    ({'v': 3}, 'v must be 1 or 2'),
+    ({'v': 'two'}, 'v, points and bins must be integers'),
+    ({'v': 2, 'points': 'many'}, 'v, points and bins must be integers'),
+])
+def test_farm_data_rejects_bad_arguments(client, query, error):
+    response = client.get('/api/farm-data', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_farm_data_is_compressed_and_revalidated(client):
+    plain = client.get('/api/farm-data', query_string={'v': 2})
+    compressed = client.get('/api/farm-data', query_string={'v': 2}, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+
+    cached = client.get('/api/farm-data', query_string={'v': 2},
+                        headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+    assert cached.status_code == 304
@@ -0,0 +1,109 @@
+import gzip
+import json
+import os
+
+import pytest
+from flask import Flask, request
+
+from backend.assets import IMMUTABLE, REVALIDATE, StaticAssets, build_assets
+
+
+@pytest.fixture
+def source(tmp_path):
+    files = {
+        'index.html': '<link href="css/site.css"><script type="module" src="./js/main.js"></script>'
+                      '<img src="/static/img/logo.svg"><a href="https://example.com/x.js">',
+        'css/site.css': "@import 'theme.css';\nbody { background: url(\"../img/logo.svg\") }\n"
+                        ".x { background: url(/img/missing.png) }",
+        'css/theme.css': 'h1 { color: green }',
+        'img/logo.svg': '<svg/>',
+        'js/main.js': "import { a } from './lib/a.js';\nimport {\n  b\n} from \"./b.js\";\n"
+                      "import 'chart.js/auto';\nconst c = await import('./lib/a.js');\n"
+                      "alert('Failed to import data: ' + e);",
+        'js/b.js': "export { a } from './lib/a.js';\nexport const b = 1;",
+        'js/lib/a.js': "export const a = 1;",
+        'js/ping.js': "import { pong } from './pong.js';\nexport const ping = 1;",
+        'js/pong.js': "import { ping } from './ping.js';\nexport const pong = 1;",
+    }
+    root = tmp_path / 'frontend'
+    for name, text in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(text)
+    return root
+
+
+def _read(output, name):
+    with open(os.path.join(output, name)) as f:
+        return f.read()
+
+
+def test_references_point_at_fingerprinted_files(source, tmp_path):
+    output = str(tmp_path / 'build')
+    manifest = build_assets(str(source), output)
+    hashed = manifest['fingerprinted']
+
+    main = _read(output, hashed['js/main.js'])
+    a, b = os.path.basename(hashed['js/lib/a.js']), os.path.basename(hashed['js/b.js'])
+    assert f"from './lib/{a}'" in main
+    assert f'from "./{b}"' in main
+    assert f"import('./lib/{a}')" in main
+    assert "import 'chart.js/auto'" in main
+    assert f"from './lib/{a}'" in _read(output, hashed['js/b.js'])
+
+    css = _read(output, hashed['css/site.css'])
+    assert f"@import '{os.path.basename(hashed['css/theme.css'])}'" in css
+    assert f'url("../{hashed["img/logo.svg"]}")' in css
+    assert 'url(/img/missing.png)' in css
+
+    index = _read(output, 'index.html')
+    assert f'href="{hashed["css/site.css"]}"' in index
+    assert f'src="./{hashed["js/main.js"]}"' in index
+    assert f'src="/static/{hashed["img/logo.svg"]}"' in index
+    assert 'https://example.com/x.js' in index
+
+
+def test_hash_covers_rewritten_references(source, tmp_path):
+    first = build_assets(str(source), str(tmp_path / 'first'))['fingerprinted']
+    (source / 'js' / 'lib' / 'a.js').write_text('export const a = 2;')
+    second = build_assets(str(source), str(tmp_path / 'second'))['fingerprinted']
+    # main.js and b.js did not change, but they now import a different file
+    assert first['js/lib/a.js'] != second['js/lib/a.js']
+    assert first['js/main.js'] != second['js/main.js']
+    assert first['js/b.js'] != second['js/b.js']
+    assert first['css/site.css'] == second['css/site.css']
+
+
+def test_import_cycles_keep_plain_names(source, tmp_path):
+    output = str(tmp_path / 'build')
+    manifest = build_assets(str(source), output)
+    assert 'js/ping.js' not in manifest['fingerprinted']
+    assert 'js/pong.js' not in manifest['fingerprinted']
+    assert manifest['files']['js/ping.js']['immutable'] is False
+    assert "from './pong.js'" in _read(output, 'js/ping.js')
+
+
+def test_built_files_are_served_with_caching_headers(source, tmp_path):
+    output = str(tmp_path / 'build')
+    manifest = build_assets(str(source), output)
+    assets = StaticAssets(output, str(source), mode='app')
+    app = Flask(__name__)
+    hashed = manifest['fingerprinted']['js/main.js']
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = assets.response(request, hashed)
+        assert response.headers['Cache-Control'] == IMMUTABLE
+        assert response.headers['Content-Encoding'] == 'gzip'
+        response.direct_passthrough = False
+        assert gzip.decompress(response.get_data()).decode() == _read(output, hashed)
+        etag = response.get_etag()[0]
+
+    with app.test_request_context(headers={'If-None-Match': f'"{etag}"', 'Accept-Encoding': 'gzip'}):
+        assert assets.response(request, hashed).status_code == 304
+
+    with app.test_request_context():
+        response = assets.response(request, 'index.html')
+        assert response.headers['Cache-Control'] == REVALIDATE
+        assert 'Content-Encoding' not in response.headers
+
+    with open(os.path.join(output, 'manifest.json')) as f:
+        assert json.load(f)['fingerprinted'] == manifest['fingerprinted']
@@ -0,0 +1,55 @@
+import json
+
+from benchmarks.run_benchmarks import DEFAULT_BASELINE, compare, failed
+
+
+def _result(p95=10.0, p99=20.0, rps=100.0, rss=200.0, errors=0):
+    return {'requests': 100, 'errors': errors, 'p50_ms': p95 / 2, 'p95_ms': p95, 'p99_ms': p99,
+            'throughput_rps': rps, 'peak_rss_mb': rss}
+
+
+def test_compare_within_tolerance():
+    baseline = {'a': _result()}
+    assert compare({'a': _result(p95=12.0, p99=24.0, rps=80.0, rss=240.0)}, baseline, 0.25) == []
+
+
+def test_compare_reports_each_regression():
+    baseline = {'a': _result(), 'b': _result()}
+    results = {'a': _result(p95=13.0, rps=70.0), 'b': _result(p99=30.0, rss=300.0, errors=2)}
+    assert compare(results, baseline, 0.25) == [
+        'a p95_ms: 10.00 -> 13.00',
+        'a throughput_rps: 100.0 -> 70.0',
+        'b p99_ms: 20.00 -> 30.00',
+        'b peak_rss_mb: 200.00 -> 300.00',
+        'b errors: 0 -> 2',
+    ]
+
+
+def test_compare_ignores_small_absolute_changes():
+    baseline = {'fast': _result(p95=0.5, p99=1.0, rps=2000.0)}
+    results = {'fast': _result(p95=0.9, p99=2.5, rps=1000.0)}
+    assert len(compare(results, baseline, 0.25)) == 3
+    assert compare(results, baseline, 0.25, min_delta_ms=2.0) == []
+    assert compare({'fast': _result(p95=3.0, p99=1.0, rps=2000.0)}, baseline, 0.25, min_delta_ms=2.0) == [
+        'fast p95_ms: 0.50 -> 3.00']
+
+
+def test_compare_skips_scenarios_without_baseline_and_missing_metrics():
+    baseline = {'a': _result(rss=None)}
+    results = {'a': _result(rss=900.0), 'new': _result(p95=1000.0)}
+    assert compare(results, baseline, 0.25) == []
+
+
+def test_failed():
+    assert failed(500, None)
+    assert failed(200, {'results': [{'primary_crop': 'rice'}, {'error': 'bad soil_type'}]})
+    assert not failed(200, {'results': [{'primary_crop': 'rice'}]})
+    assert not failed(304, None)
+
+
+def test_committed_baseline_covers_the_default_run():
+    with open(DEFAULT_BASELINE) as f:
+        baseline = json.load(f)
+    scenarios = {key.rsplit('/', 1)[1] for key in baseline if key.startswith('inprocess/10000/')}
+    assert {'recommendations', 'recommendations-batch', 'historical', 'simulate'} <= scenarios
+    assert all(entry['errors'] == 0 for entry in baseline.values())
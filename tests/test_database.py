@@ -0,0 +1,249 @@
+import os
+import shutil
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import database
+from backend.database import DATASETS, DatasetStore, read_columnar_cache, read_dataset, write_columnar_cache
+from tests.conftest import SOURCE_DATA_DIR
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for spec in DATASETS.values():
+        shutil.copy(os.path.join(SOURCE_DATA_DIR, spec['file']), tmp_path)
+    return tmp_path
+
+
+def _is_memory_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def test_columnar_cache_round_trip(data_dir):
+    path = str(data_dir / 'market_researcher_dataset.csv')
+    cache_dir = str(data_dir / '.cache')
+    parsed = read_dataset(path, DATASETS['market']['dtypes'], cache_dir)
+    cached = read_columnar_cache(path, cache_dir=cache_dir)
+
+    assert cached.equals(parsed)
+    assert isinstance(cached['Product'].dtype, pd.CategoricalDtype)
+    # Numeric columns are views of the memory-mapped .npy files
+    assert _is_memory_mapped(cached['Market_Price_per_ton'].to_numpy())
+
+
+def test_changed_file_does_not_match_the_cache(data_dir):
+    path = str(data_dir / 'market_researcher_dataset.csv')
+    cache_dir = str(data_dir / '.cache')
+    df = pd.read_csv(path, dtype=DATASETS['market']['dtypes'])
+    write_columnar_cache(path, df.head(3), cache_dir=cache_dir)
+    assert len(read_columnar_cache(path, cache_dir=cache_dir)) == 3
+
+    with open(path, 'a') as f:
+        f.write('\n')
+    assert read_columnar_cache(path, cache_dir=cache_dir) is None
+    assert len(read_dataset(path, DATASETS['market']['dtypes'], cache_dir)) == len(df)
+
+
+def test_append_rewrites_the_columnar_cache(data_dir):
+    store = DatasetStore(str(data_dir))
+    before = len(store.get('farming'))
+    df, version = store.append('farming', [{'Soil_pH': 6.5, 'Soil_Moisture': 25, 'Temperature_C': 24,
+                                            'Rainfall_mm': 180, 'Crop_Type': 'Rice', 'Fertilizer_Usage_kg': 120,
+                                            'Pesticide_Usage_kg': 8, 'Crop_Yield_ton': 5,
+                                            'Sustainability_Score': 70}])
+    assert len(df) == before + 1
+    assert version == database._source_version(store.path('farming'))
+
+    # A new process starts from the cache of the appended file, not the CSV
+    cached = read_columnar_cache(store.path('farming'), cache_dir=store.cache_dir)
+    assert cached is not None
+    assert cached.equals(df)
+    assert sorted(os.listdir(os.path.join(store.cache_dir, 'farmer_advisor_dataset'))) == [f"{version[0]}-{version[1]}"]
+
+
+def test_file_lock_uses_msvcrt_without_fcntl(tmp_path, monkeypatch):
+    calls = []
+    fake = types.SimpleNamespace(LK_LOCK=1, LK_UNLCK=0,
+                                 locking=lambda fd, mode, size: calls.append((mode, size)))
+    monkeypatch.setattr(database, 'fcntl', None)
+    monkeypatch.setattr(database, 'msvcrt', fake)
+    with database._file_lock(str(tmp_path / 'x.lock')):
+        assert calls == [(1, 1)]
+    assert calls == [(1, 1), (0, 1)]
+
+
+def test_file_lock_refuses_without_any_locking(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'fcntl', None)
+    monkeypatch.setattr(database, 'msvcrt', None)
+    with pytest.raises(OSError):
+        with database._file_lock(str(tmp_path / 'x.lock')):
+            pass
+
+
+def _rewrite(path, text):
+    # A different size, so the new version is seen even within the mtime resolution
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_store_parses_each_file_once(data_dir, monkeypatch):
+    store = DatasetStore(str(data_dir))
+    parses = []
+    parse = store._parse
+    monkeypatch.setattr(store, '_parse', lambda name: parses.append(name) or parse(name))
+
+    first = store.get('market')
+    assert store.get('market') is first
+    assert parses == ['market']
+    assert first['Product'].dtype == 'category'
+    assert first['Market_Price_per_ton'].dtype == 'float64'
+    assert store.version('market') == database._source_version(store.path('market'))
+
+    with open(store.path('market')) as f:
+        header, row = f.readline(), f.readline()
+    _rewrite(store.path('market'), header + row)
+    assert len(store.get('market')) == 1
+    assert parses == ['market', 'market']
+
+
+def test_store_missing_file(data_dir):
+    store = DatasetStore(str(data_dir))
+    os.remove(store.path('farming'))
+    assert store.get('farming') is None
+    assert store.get_versioned('farming') == (None, None)
+    assert store.version('farming') is None
+
+
+def test_store_keeps_the_last_good_frame_when_a_parse_fails(data_dir):
+    store = DatasetStore(str(data_dir))
+    frame, version = store.get_versioned('market')
+    _rewrite(store.path('market'), 'Market_ID,Product\nnot-a-number,Rice\n')
+    current, current_version = store.get_versioned('market')
+    assert current is frame and current_version == version
+
+
+FARM_ROW = {'Soil_pH': 6.5, 'Soil_Moisture': 25, 'Temperature_C': 24, 'Rainfall_mm': 180, 'Crop_Type': 'Rice',
+            'Fertilizer_Usage_kg': 120, 'Pesticide_Usage_kg': 8, 'Crop_Yield_ton': 5, 'Sustainability_Score': 70}
+
+
+def _farm_lines(first_id, count, crop='Rice'):
+    return ''.join(f"{first_id + i},6.5,25,24,180,{crop},120,8,5,70\n" for i in range(count))
+
+
+def _append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+
+def _no_parse(store, monkeypatch):
+    def parse(name):
+        raise AssertionError(f"{name} was parsed again")
+    monkeypatch.setattr(store, '_parse', parse)
+
+
+def test_store_reads_only_rows_appended_by_another_writer(data_dir, monkeypatch):
+    store = DatasetStore(str(data_dir))
+    before, old = store.get_versioned('farming')
+    _no_parse(store, monkeypatch)
+
+    _append(store.path('farming'), _farm_lines(20001, 2) + _farm_lines(20003, 1, crop='Quinoa'))
+    after, new = store.get_versioned('farming')
+    assert new == database._source_version(store.path('farming'))
+    assert len(after) == len(before) + 3
+    # The new crop only adds a category; the rows already read are unchanged
+    assert after.iloc[:len(before)].astype({'Crop_Type': str}).equals(before.astype({'Crop_Type': str}))
+    assert after['Farm_ID'].tail(3).tolist() == [20001, 20002, 20003]
+    assert after['Crop_Type'].dtype == 'category'
+    assert after['Crop_Type'].iloc[-1] == 'Quinoa'
+
+    assert store.appended_since('farming', old, new) == len(before)
+    assert store.appended_since('farming', new, new) == len(after)
+    assert store.appended_since('farming', new, old) is None
+
+
+def test_store_waits_for_a_partly_written_row(data_dir, monkeypatch):
+    store = DatasetStore(str(data_dir))
+    before, old = store.get_versioned('farming')
+    _no_parse(store, monkeypatch)
+
+    line = _farm_lines(20001, 1)
+    _append(store.path('farming'), line[:10])
+    assert store.get_versioned('farming') == (before, old)
+
+    _append(store.path('farming'), line[10:])
+    after, new = store.get_versioned('farming')
+    assert len(after) == len(before) + 1
+    assert store.appended_since('farming', old, new) == len(before)
+
+
+def test_store_reparses_a_rewritten_file(data_dir):
+    store = DatasetStore(str(data_dir))
+    before, old = store.get_versioned('farming')
+    with open(store.path('farming')) as f:
+        lines = f.readlines()
+    # Larger than before, but the last previously read row changed
+    lines[-1] = lines[-1].replace(',Wheat,', ',Maize,')
+    _rewrite(store.path('farming'), ''.join(lines) + _farm_lines(20001, 1))
+
+    after, new = store.get_versioned('farming')
+    assert len(after) == len(before) + 1
+    assert after['Crop_Type'].iloc[-2] == 'Maize'
+    assert store.appended_since('farming', old, new) is None
+
+
+def test_append_assigns_ids_and_completes_a_missing_newline(data_dir):
+    store = DatasetStore(str(data_dir))
+    before = store.get('farming')
+    with open(store.path('farming'), 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        assert f.read(1) == b'\n'
+        f.seek(-1, os.SEEK_END)
+        f.truncate()
+
+    df, _ = store.append('farming', [FARM_ROW, dict(FARM_ROW, Crop_Type=' Quinoa ')])
+    next_id = int(before['Farm_ID'].max()) + 1
+    assert df['Farm_ID'].tail(2).tolist() == [next_id, next_id + 1]
+    assert df['Crop_Type'].tail(2).tolist() == ['Rice', 'Quinoa']
+    # A new store parses the file from scratch and sees the same rows
+    assert len(DatasetStore(str(data_dir), cache_dir=str(data_dir / 'other')).get('farming')) == len(before) + 2
+
+    with pytest.raises(database.IngestError):
+        store.append('farming', [dict(FARM_ROW, Farm_ID=next_id)])
+
+
+@pytest.mark.parametrize('rows, message', [
+    ([], 'non-empty list'),
+    ({'Soil_pH': 6}, 'non-empty list'),
+    ([FARM_ROW, 3], 'must be an object'),
+    ([dict(FARM_ROW, Colour='red')], 'Unknown columns: Colour'),
+    ([dict(FARM_ROW, Soil_pH=None)], 'Soil_pH is missing in rows [0]'),
+    ([FARM_ROW, dict(FARM_ROW, Rainfall_mm='lots')], 'Rainfall_mm must be a number in rows [1]'),
+    ([dict(FARM_ROW, Temperature_C=float('inf'))], 'Temperature_C must be a number'),
+    ([dict(FARM_ROW, Crop_Type=' ')], 'Crop_Type must be a non-empty string'),
+    ([dict(FARM_ROW, Crop_Type=4)], 'Crop_Type must be a non-empty string'),
+    ([dict(FARM_ROW, Farm_ID=20001.5)], 'Farm_ID must be a whole number'),
+    ([dict(FARM_ROW, Farm_ID=20001), dict(FARM_ROW, Farm_ID=20001)], 'Farm_ID values must be unique'),
+    ([dict(FARM_ROW, Farm_ID=1)], 'Farm_ID already exists: [1]'),
+    ([dict(FARM_ROW, Farm_ID=20001), FARM_ROW], 'Farm_ID is missing in rows [1]'),
+])
+def test_validate_rows_rejects(rows, message):
+    existing = pd.DataFrame({'Farm_ID': [1, 2]})
+    with pytest.raises(database.IngestError) as raised:
+        database.validate_rows(rows, DATASETS['farming'], existing)
+    assert message in str(raised.value)
+
+
+def test_validate_rows_converts_types():
+    existing = pd.DataFrame({'Farm_ID': [1, 2]})
+    frame = database.validate_rows([dict(FARM_ROW, Soil_pH='6.25')], DATASETS['farming'], existing)
+    assert list(frame.columns) == list(DATASETS['farming']['dtypes'])
+    assert frame.loc[0, 'Farm_ID'] == 3
+    assert frame.loc[0, 'Soil_pH'] == 6.25
+    assert frame['Farm_ID'].dtype == 'int64'
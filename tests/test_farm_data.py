@@ -0,0 +1,115 @@
+import os
+import gzip
+import json
+import shutil
+
+import numpy as np
+import pytest
+from werkzeug.http import parse_accept_header
+
+from backend import compression
+from backend.database import DATASETS, DatasetStore
+from backend.farm_data import (FarmDataCache, SERIES_COLUMNS, chart_arg, compact_payload, histogram, legacy_payload,
+                               lttb)
+from tests.conftest import SOURCE_DATA_DIR
+
+
+@pytest.fixture
+def store(tmp_path):
+    shutil.copy(os.path.join(SOURCE_DATA_DIR, DATASETS['farming']['file']), tmp_path)
+    return DatasetStore(str(tmp_path))
+
+
+def test_lttb_keeps_ends_and_peaks():
+    y = np.zeros(1000)
+    y[333] = 50
+    y[777] = -50
+    kept = lttb(y, 20)
+    assert len(kept) == 20
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+    assert {333, 777} <= set(kept.tolist())
+    # Striding to the same size drops both
+    assert not {333, 777} & set(np.linspace(0, 999, 20).astype(int).tolist())
+
+
+def test_lttb_small_inputs():
+    assert lttb(np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(np.arange(2.0), 1).tolist() == [0, 1]
+    assert lttb(np.arange(10.0), 2).tolist() == [0, 9]
+    assert lttb(np.arange(10.0), 1).tolist() == [0]
+    assert lttb(np.arange(10.0), 0).tolist() == []
+
+
+def test_histogram_skips_missing_values():
+    values = np.array([0, 1, 2, 3, np.nan, 10])
+    bars = histogram(values, 2)
+    assert bars == {'0.0-5.0': 4, '5.0-10.0': 1}
+
+
+def test_chart_arg():
+    assert chart_arg({}, 'points', 500, 5000) == 500
+    assert chart_arg({'points': ''}, 'points', 500, 5000) == 500
+    assert chart_arg({'points': '50'}, 'points', 500, 5000) == 50
+    assert chart_arg({'points': '0'}, 'points', 500, 5000) == 1
+    assert chart_arg({'points': '99999'}, 'points', 500, 5000) == 5000
+    with pytest.raises(ValueError):
+        chart_arg({'points': 'many'}, 'points', 500, 5000)
+
+
+def test_compact_payload(store):
+    df = store.get('farming')
+    payload = compact_payload(df, points=100, bins=10)
+    legacy = legacy_payload(df)
+
+    assert (payload['version'], payload['rows'], payload['points'], payload['bins']) == (2, len(df), 100, 10)
+    assert 'raw_data' not in payload
+    assert payload['averages'] == legacy['averages']
+    assert payload['distributions']['croptype'] == legacy['distributions']['croptype']
+    assert all(len(bars) == 10 and sum(bars.values()) == len(df)
+               for name, bars in payload['distributions'].items() if name != 'croptype')
+
+    series = payload['series']
+    ids = series['farm_id']
+    assert 100 <= len(ids) <= 200
+    assert np.all(np.diff(ids) > 0)
+    rows = df.set_index('Farm_ID').loc[ids]
+    for name, column in SERIES_COLUMNS.items():
+        assert np.array_equal(series[name], rows[column].to_numpy())
+
+
+def test_bodies_are_cached_per_version_and_parameters(store):
+    cache = FarmDataCache(store)
+    compact = cache.get(2, 100, 10)
+    assert cache.get(2, 100, 10) is compact
+    assert cache.get(2, 200, 10) is not compact
+    legacy = cache.get()
+    assert len(json.loads(legacy.body)['raw_data']) == json.loads(compact.body)['rows']
+    assert len(compact.body) * 10 < len(legacy.body)
+
+    with open(store.path('farming')) as f:
+        lines = f.readlines()
+    with open(store.path('farming'), 'w') as f:
+        f.writelines(lines[:101])
+    updated = cache.get(2, 100, 10)
+    assert updated is not compact
+    assert updated.etag != compact.etag
+    assert json.loads(updated.body)['rows'] == 100
+
+
+def test_negotiate(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert compression.negotiate(parse_accept_header('gzip, deflate, br')) == 'gzip'
+    assert compression.negotiate(parse_accept_header('br')) is None
+    assert compression.negotiate(parse_accept_header('gzip;q=0')) is None
+    assert compression.negotiate(parse_accept_header('')) is None
+
+
+def test_small_bodies_are_sent_as_they_are():
+    small = compression.CompressedBody(b'{}', 'tag')
+    assert small.encoded('gzip') == (None, b'{}')
+    body = compression.CompressedBody(b'[' + b'1,' * 1000 + b'1]', 'tag')
+    encoding, data = body.encoded('gzip')
+    assert encoding == 'gzip'
+    assert gzip.decompress(data) == body.body
+    assert body.encoded('gzip')[1] is data
@@ -0,0 +1,58 @@
+import copy
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from backend.forest import FlatForest, export_forest
+
+
+def _data(n=300, features=6, classes=4, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(n, features))
+    # Repeated values put samples exactly on split thresholds
+    X[:, 0] = np.round(X[:, 0], 1)
+    y = np.array(['crop%d' % c for c in range(classes)])[(X[:, 0] + X[:, 1] > 0) + 2 * (X[:, 2] > 0.5)]
+    return X, y
+
+
+@pytest.mark.parametrize('estimator', [RandomForestClassifier, ExtraTreesClassifier])
+@pytest.mark.parametrize('params', [{'n_estimators': 25, 'max_depth': None},
+                                    {'n_estimators': 25, 'max_depth': 4, 'class_weight': 'balanced'}])
+def test_predict_proba_matches_estimator(estimator, params):
+    X, y = _data()
+    model = estimator(random_state=42, **params).fit(X, y)
+    forest = FlatForest.from_estimator(model)
+
+    X_test = np.vstack([X, _data(seed=1)[0]])
+    assert np.array_equal(forest.predict_proba(X_test), model.predict_proba(X_test))
+    assert np.array_equal(forest.predict(X_test), model.predict(X_test))
+    assert forest.n_trees == len(model.estimators_)
+
+
+@pytest.mark.parametrize('n', [1, 7, 24])
+def test_trees_matches_truncated_estimator(n):
+    X, y = _data()
+    model = RandomForestClassifier(n_estimators=25, random_state=42).fit(X, y)
+    truncated = copy.copy(model)
+    truncated.estimators_ = model.estimators_[:n]
+
+    forest = FlatForest.from_estimator(model).trees(n)
+    assert forest.n_trees == n
+    assert np.array_equal(forest.predict_proba(X), truncated.predict_proba(X))
+
+
+def test_trees_all():
+    X, y = _data()
+    forest = FlatForest.from_estimator(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y))
+    assert forest.trees(0) is forest
+    assert forest.trees(5) is forest
+    assert forest.trees(50) is forest
+
+
+def test_export_forest_rejects_other_models():
+    from sklearn.tree import DecisionTreeClassifier
+
+    X, y = _data()
+    assert export_forest(DecisionTreeClassifier().fit(X, y)) is None
+    assert isinstance(export_forest(RandomForestClassifier(n_estimators=3).fit(X, y)), FlatForest)
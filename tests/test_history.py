@@ -0,0 +1,70 @@
+import threading
+
+from backend.history import HistoryStore
+
+
+def _record(i):
+    return {'date': f'2024-01-01T00:00:{i:06d}', 'input': {'i': i}, 'prediction': 'rice'}
+
+
+def test_query_merges_pending_and_stored(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), batch_size=10)
+    for i in range(25):
+        store.append(_record(i))
+    store._write_batch()
+
+    records, total = store.query(limit=100)
+    assert total == 25
+    assert [r['input']['i'] for r in records] == list(range(24, -1, -1))
+    records, total = store.query(limit=5, offset=12, newest_first=False)
+    assert [r['input']['i'] for r in records] == list(range(12, 17))
+
+
+def test_queries_see_each_record_once_while_writing(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), batch_size=7, flush_interval=0.001)
+    stop = threading.Event()
+    problems = []
+
+    def read():
+        seen = 0
+        while not stop.is_set():
+            records, total = store.query(limit=100000)
+            ids = [r['input']['i'] for r in records]
+            if len(ids) != len(set(ids)) or len(ids) != total or total < seen:
+                problems.append((len(ids), len(set(ids)), total, seen))
+            seen = total
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for i in range(3000):
+        store.append(_record(i))
+    store.flush()
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert problems == []
+    assert store.query(limit=1)[1] == 3000
+
+
+def test_read_connections_are_pooled(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), read_connections=2)
+    threads = [threading.Thread(target=store.query) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store._readers) <= 2
+
+
+def test_rows_beyond_max_rows_are_deleted(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), batch_size=100, max_rows=10)
+    for i in range(25):
+        store.append(_record(i))
+    store.flush()
+
+    records, total = store.query(limit=100)
+    assert total == 10
+    assert [r['input']['i'] for r in records] == list(range(24, 14, -1))
+    assert store.pruned == 15
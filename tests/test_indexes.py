@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.indexes import FrameIndex, IndexCache, MemberPredicate, RangePredicate, filters_from_args
+from backend.streaming import QueryError
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(4)
+    n = 2000
+    return pd.DataFrame({
+        'Soil_pH': rng.uniform(5, 8, n).round(2),
+        'Rainfall_mm': rng.integers(50, 300, n).astype(float),
+        'Crop_Type': pd.Categorical(rng.choice(['Corn', 'Rice', 'Wheat', 'Soybean'], n)),
+        'Date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+    })
+
+
+def _expected(df, predicates):
+    mask = np.ones(len(df), dtype=bool)
+    for predicate in predicates:
+        values = df[predicate.column]
+        if isinstance(predicate, MemberPredicate):
+            mask &= values.isin(predicate.values).to_numpy()
+            continue
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # Predicates hold nanoseconds, whatever resolution the column has
+            values = pd.Series(values.to_numpy().astype('datetime64[ns]').astype('int64'))
+        if predicate.low is not None:
+            mask &= (values >= predicate.low).to_numpy()
+        if predicate.high is not None:
+            mask &= (values <= predicate.high).to_numpy()
+    return np.flatnonzero(mask)
+
+
+@pytest.mark.parametrize('predicates', [
+    [],
+    [RangePredicate('Soil_pH', 6.0, 6.5)],
+    [RangePredicate('Soil_pH', low=7.9)],
+    [RangePredicate('Rainfall_mm', high=100)],
+    [RangePredicate('Rainfall_mm', 120, 120)],
+    [RangePredicate('Soil_pH', 7.0, 6.0)],
+    [MemberPredicate('Crop_Type', ['Rice'])],
+    [MemberPredicate('Crop_Type', ['Rice', 'Wheat']), RangePredicate('Soil_pH', 5.5, 6.0)],
+    [MemberPredicate('Crop_Type', [])],
+    [RangePredicate('Soil_pH', 5.0, 8.0), RangePredicate('Rainfall_mm', 200, None),
+     MemberPredicate('Crop_Type', ['Corn'])],
+    [RangePredicate('Date', pd.Timestamp('2024-03-01').value, pd.Timestamp('2024-03-31').value)],
+])
+def test_query_matches_a_scan(frame, predicates):
+    assert np.array_equal(FrameIndex(frame).query(predicates), _expected(frame, predicates))
+
+
+def test_select_keeps_row_order(frame):
+    selected = FrameIndex(frame).select([RangePredicate('Soil_pH', 6.0, 6.2)])
+    assert selected.index.is_monotonic_increasing
+    assert selected['Soil_pH'].between(6.0, 6.2).all()
+    assert FrameIndex(frame).select([]) is frame
+
+
+def test_filters_from_args(frame):
+    predicates, ignored = filters_from_args({'Soil_pH_min': '6', 'Soil_pH_max': '6.5', 'Crop_Type': 'rice, WHEAT,barley',
+                                             'Rainfall_mm_max': '', 'startDate': '2024-02-01'}, frame)
+    assert ignored == []
+    by_column = {p.column: p for p in predicates}
+    assert (by_column['Soil_pH'].low, by_column['Soil_pH'].high) == (6.0, 6.5)
+    assert by_column['Crop_Type'].values == ['Rice', 'Wheat']
+    assert 'Rainfall_mm' not in by_column
+    assert by_column['Date'].low == pd.Timestamp('2024-02-01').value and by_column['Date'].high is None
+
+
+def test_filters_from_args_errors_and_ignored(frame):
+    with pytest.raises(QueryError):
+        filters_from_args({'Soil_pH_min': 'acidic'}, frame)
+    with pytest.raises(QueryError):
+        filters_from_args({'endDate': 'someday'}, frame)
+    predicates, ignored = filters_from_args({'startDate': '2024-01-01'}, frame.drop(columns='Date'))
+    assert predicates == [] and ignored == ['startDate']
+
+
+class Store:
+    def __init__(self, df):
+        self.df, self.version = df, (1, 1)
+
+    def get_versioned(self, name):
+        return self.df, self.version
+
+
+def test_index_is_rebuilt_for_a_new_version(frame):
+    store = Store(frame)
+    cache = IndexCache(store)
+    index, version = cache.get_versioned('farming')
+    assert cache.get_versioned('farming')[0] is index
+    store.df, store.version = frame.head(10), (2, 2)
+    rebuilt, version = cache.get_versioned('farming')
+    assert rebuilt is not index and version == (2, 2) and len(rebuilt.df) == 10
+    store.df = None
+    assert cache.get_versioned('farming') == (None, None)
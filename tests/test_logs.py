@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import queue
+import logging
+import subprocess
+
+import pytest
+from flask import Flask, g
+
+from backend import logs
+from tests.conftest import ROOT
+
+
+def _record(msg='hello %s', args=('world',), level=logging.INFO):
+    return logging.LogRecord('farm', level, __file__, 1, msg, args, None)
+
+
+def _bound(filter_, request_id, route='/api/x'):
+    token = logs._request.set((request_id, route))
+    try:
+        record = _record()
+        return filter_.filter(record), record
+    finally:
+        logs._request.reset(token)
+
+
+def test_parse_sample_rates():
+    assert logs.parse_sample_rates('INFO=0.1, debug=0.01,') == {logging.INFO: 0.1, logging.DEBUG: 0.01}
+    assert logs.parse_sample_rates('') == {}
+
+
+def test_filter_stamps_request_context():
+    keep, record = _bound(logs.RequestContextFilter(), 'abc')
+    assert keep
+    assert (record.request_id, record.route) == ('abc', '/api/x')
+
+    record = _record()
+    assert logs.RequestContextFilter().filter(record)
+    assert (record.request_id, record.route) == ('-', None)
+
+
+def test_sampling_keeps_all_or_none_of_a_request():
+    filter_ = logs.RequestContextFilter({logging.INFO: 0.5})
+    decisions = {}
+    for n in range(200):
+        request_id = f'request-{n}'
+        decisions[request_id] = {_bound(filter_, request_id)[0] for _ in range(3)}
+    assert all(len(kept) == 1 for kept in decisions.values())
+    kept = sum(True in d for d in decisions.values())
+    assert 50 < kept < 150
+
+    # Records outside a request and at unsampled levels are always kept
+    assert filter_.filter(_record())
+    token = logs._request.set(('request-0', '/api/x'))
+    try:
+        assert filter_.filter(_record(level=logging.WARNING))
+    finally:
+        logs._request.reset(token)
+
+
+def test_sampling_only_applies_to_listed_routes():
+    filter_ = logs.RequestContextFilter({logging.INFO: 0.0}, ['/api/sampled'])
+    assert not _bound(filter_, 'abc', '/api/sampled')[0]
+    assert _bound(filter_, 'abc', '/api/other')[0]
+
+
+def test_queue_handler_drops_when_full():
+    handler = logs.NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(_record())
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_queue_handler_resolves_message_and_traceback():
+    handler = logs.NonBlockingQueueHandler(queue.Queue())
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = logging.LogRecord('farm', logging.ERROR, __file__, 1, 'failed %d', (3,), sys.exc_info())
+    prepared = handler.prepare(record)
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ('failed 3', None, None)
+    assert 'ValueError: boom' in prepared.exc_text
+
+
+def test_json_formatter():
+    record = _record()
+    record.request_id, record.route = 'abc', '/api/x'
+    record.exc_text = 'Traceback ...'
+    entry = json.loads(logs.JsonFormatter().format(record))
+    assert entry['message'] == 'hello world'
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'farm'
+    assert (entry['request_id'], entry['route']) == ('abc', '/api/x')
+    assert entry['exc'] == 'Traceback ...'
+    assert entry['pid'] == os.getpid()
+    assert entry['ts'].endswith('+00:00')
+
+
+def test_rotates_by_age(tmp_path):
+    path = tmp_path / 'app.log'
+    handler = logs.SizeAndTimeRotatingFileHandler(str(path), interval=3600, backupCount=2)
+    try:
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        handler.handle(_record('first', ()))
+        assert not (tmp_path / 'app.log.1').exists()
+        handler.rollover_at = 0
+        handler.handle(_record('second', ()))
+    finally:
+        handler.close()
+    assert (tmp_path / 'app.log.1').read_text() == 'first\n'
+    assert path.read_text() == 'second\n'
+
+
+def test_forwarded_records_reach_the_collector(monkeypatch):
+    collected = logs.NonBlockingQueueHandler(queue.Queue())
+    monkeypatch.setattr(logs, '_queue_handler', collected)
+    collector = logs.LogCollector()
+    try:
+        handler = logs.ForwardingHandler(collector.sock)
+        record = _record('%s', ('x' * (logs.LOG_FORWARD_MAX_CHARS + 10),))
+        record.request_id, record.route = 'abc', '/api/x'
+        handler.handle(record)
+        received = collected.queue.get(timeout=5)
+    finally:
+        collector.close()
+    assert received.msg == 'x' * logs.LOG_FORWARD_MAX_CHARS
+    assert received.getMessage() == received.msg
+    assert (received.request_id, received.route) == ('abc', '/api/x')
+    assert (received.name, received.levelno, received.process) == ('farm', logging.INFO, os.getpid())
+
+
+@pytest.fixture
+def request_app():
+    app = Flask(__name__)
+
+    @app.route('/api/x')
+    def context():
+        return {'context': list(logs._request.get()), 'g': g.request_id}
+
+    return logs.bind_request_ids(app).test_client()
+
+
+def test_request_ids_are_bound_and_returned(request_app):
+    response = request_app.get('/api/x', headers={'X-Request-ID': 'abc'})
+    assert response.headers['X-Request-ID'] == 'abc'
+    assert response.get_json() == {'context': ['abc', '/api/x'], 'g': 'abc'}
+
+    generated = request_app.get('/api/x')
+    request_id = generated.headers['X-Request-ID']
+    assert len(request_id) == 32
+    assert generated.get_json()['context'] == [request_id, '/api/x']
+
+    assert request_app.get('/api/x', headers={'X-Request-ID': 'a' * 500}).headers['X-Request-ID'] == 'a' * 128
+    assert logs._request.get() == (None, None)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_only_the_configuring_process_writes_the_file(tmp_path):
+    log_file = tmp_path / 'app.log'
+    script = f"""
+import os, logging
+from backend import logs
+logs.configure_logging(log_file={str(log_file)!r}, level='INFO', fmt='text')
+pid = os.fork()
+if pid == 0:
+    logging.getLogger('farm').info('from child')
+    logs.stop_logging()
+    os._exit(0)
+os.waitpid(pid, 0)
+logging.getLogger('farm').info('from parent')
+"""
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert 'from child' in result.stderr
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith('- farm - INFO - [-] from parent')
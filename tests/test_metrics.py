@@ -0,0 +1,72 @@
+import os
+
+from backend.metrics import MetricsDirectory, MetricsRegistry
+
+
+def _worker_registry(requests, cache_size):
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: [('cache_size', 'Entries', {(('cache', 'prediction'),): cache_size})])
+    for _ in range(requests):
+        registry.observe('request_seconds', 0.003, route='/api/x')
+        registry.inc('requests_total', route='/api/x', status=200)
+    return registry
+
+
+def _samples(text):
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if not line.startswith('#'))
+
+
+def test_render_without_shared_directory():
+    samples = _samples(_worker_registry(2, 5).render())
+    assert samples['requests_total{route="/api/x",status="200"}'] == '2'
+    assert samples['request_seconds_count{route="/api/x"}'] == '2'
+    assert samples['cache_size{cache="prediction"}'] == '5'
+
+
+def test_workers_are_merged_and_retired_totals_kept(tmp_path):
+    directory = MetricsDirectory(str(tmp_path))
+    master = MetricsRegistry()
+    master.inc('requests_total', route='/api/x', status=200)
+    directory.publish(master)
+    other = _worker_registry(3, 7)
+    directory._write('999-1', dict(other.snapshot(), pid=999))
+
+    own = _worker_registry(2, 5)
+    own.shared = directory
+    pid = os.getpid()
+    samples = _samples(own.render())
+    assert samples['requests_total{route="/api/x",status="200"}'] == '6'
+    assert samples['request_seconds_count{route="/api/x"}'] == '5'
+    assert samples['request_seconds_bucket{route="/api/x",le="0.005"}'] == '5'
+    assert samples[f'cache_size{{cache="prediction",pid="{pid}"}}'] == '5'
+    assert samples['cache_size{cache="prediction",pid="999"}'] == '7'
+
+    # Worker 999 exits: its counts stay in the totals, its gauges go
+    directory.retire(999)
+    assert not os.path.exists(tmp_path / '999-1.json')
+    samples = _samples(own.render())
+    assert samples['requests_total{route="/api/x",status="200"}'] == '6'
+    assert 'cache_size{cache="prediction",pid="999"}' not in samples
+
+    directory._write('1000-1', dict(_worker_registry(1, 1).snapshot(), pid=1000))
+    directory.retire(1000)
+    assert _samples(own.render())['requests_total{route="/api/x",status="200"}'] == '7'
+
+
+def test_snapshot_listed_as_retired_is_not_counted_twice(tmp_path):
+    directory = MetricsDirectory(str(tmp_path))
+    directory._write('999-1', dict(_worker_registry(3, 7).snapshot(), pid=999))
+    directory.retire(999)
+    # A scrape that read the worker's file just before retire() deleted it
+    stale = directory._read('retired.json')
+    directory._write('999-1', dict(_worker_registry(3, 7).snapshot(), pid=999))
+    assert stale['names'] == ['999-1']
+    own = MetricsRegistry()
+    own.shared = directory
+    assert _samples(own.render())['requests_total{route="/api/x",status="200"}'] == '3'
+
+
+def test_stale_snapshots_are_cleared(tmp_path):
+    (tmp_path / '123-1.json').write_text('{}')
+    MetricsDirectory(str(tmp_path))
+    assert os.listdir(tmp_path) == []
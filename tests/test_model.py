@@ -0,0 +1,77 @@
+import os
+import json
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.model import (ARTIFACT_FORMAT, MODEL_PATH, ModelState, farm_training_frame, load_artifact,
+                           save_artifact, train_artifact, training_data_hash)
+from tests.conftest import DATA_DIR, ROOT
+
+
+@pytest.fixture(scope='module')
+def farm_frame():
+    return farm_training_frame(pd.read_csv(os.path.join(DATA_DIR, 'farmer_advisor_dataset.csv')))
+
+
+@pytest.fixture(scope='module')
+def artifact(farm_frame):
+    return train_artifact(farm_frame.iloc[:1000], model_params={'n_estimators': 10})
+
+
+def test_artifact_round_trip(tmp_path, artifact, farm_frame):
+    path = str(tmp_path / 'model.joblib')
+    save_artifact(artifact, path)
+    loaded = load_artifact(path, data_hash=training_data_hash(farm_frame.iloc[:1000]))
+
+    assert loaded['model_version'] == artifact['model_version']
+    inputs = farm_frame.iloc[:50].drop(columns='recommended_crop').to_dict('records')
+    before, after = ModelState(artifact), ModelState(loaded)
+    X, errors = after.encode(inputs)
+    assert errors == [None] * 50
+    assert np.array_equal(after.predict_proba(X), before.predict_proba(before.encode(inputs)[0]))
+    # Memory-mapped, so forked workers share the pages
+    assert isinstance(loaded['forest'].threshold, np.memmap)
+
+
+def test_stale_or_foreign_artifacts_are_ignored(tmp_path, artifact, farm_frame):
+    path = str(tmp_path / 'model.joblib')
+    assert load_artifact(path) is None
+    save_artifact(artifact, path)
+    assert load_artifact(path, data_hash=training_data_hash(farm_frame)) is None
+
+    joblib.dump(dict(artifact, format=ARTIFACT_FORMAT + 1), path)
+    assert load_artifact(path) is None
+    with open(path, 'wb') as f:
+        f.write(b'not a joblib file')
+    assert load_artifact(path) is None
+
+
+def test_unknown_inputs_are_reported_per_input(artifact):
+    state = ModelState(artifact)
+    X, errors = state.encode([
+        {'soil_type': 'clay', 'water_availability': 'high', 'temperature': 'warm', 'rainfall': 'high'},
+        {'soil_type': 'peat', 'water_availability': 'high', 'temperature': 'warm', 'rainfall': 'high'},
+        {'soil_type': 'clay', 'temperature': 'warm', 'rainfall': 'high'},
+        'not an object'
+    ])
+    assert errors[0] is None
+    assert 'soil_type' in errors[1] and 'peat' in errors[1]
+    assert 'water_availability' in errors[2]
+    assert errors[3] is not None
+
+
+def test_notebook_export_is_loaded_by_the_server(monkeypatch, farm_frame):
+    with open(os.path.join(ROOT, 'train_model.ipynb'), encoding='utf-8') as f:
+        cell = ''.join(json.load(f)['cells'][1]['source'])
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(sys, 'path', list(sys.path))
+    namespace = {}
+    exec(cell, namespace)
+
+    exported = load_artifact(MODEL_PATH, data_hash=training_data_hash(farm_frame))
+    assert exported is not None
+    assert exported['model_version'] == namespace['artifact']['model_version']
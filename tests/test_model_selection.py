@@ -0,0 +1,73 @@
+import os
+import json
+
+import pandas as pd
+import pytest
+
+from backend import model_selection
+from backend.__main__ import main
+from backend.model import (MODEL_PATH, SELECTED_MODEL_PATH, farm_training_frame, load_artifact,
+                           training_data_hash)
+from tests.conftest import DATA_DIR
+
+SPACE = {'random_forest': {'n_estimators': [5, 10]}, 'extra_trees': {'n_estimators': [5]}}
+
+
+@pytest.fixture(scope='module')
+def farm_frame():
+    return farm_training_frame(pd.read_csv(os.path.join(DATA_DIR, 'farmer_advisor_dataset.csv')))
+
+
+def test_selection_is_cached_per_fold(tmp_path, farm_frame):
+    data = farm_frame.iloc[:1000]
+    first = model_selection.select_model(data, space=SPACE, folds=2, workers=1, cache_dir=str(tmp_path))
+    assert (first['fitted_folds'], first['cached_folds'], first['fitted_full']) == (6, 0, 3)
+    assert first['rows'] == 1000 and first['classes'] == 4 and first['stratified']
+    accuracies = [r['accuracy'] for r in first['results']]
+    assert accuracies == sorted(accuracies, reverse=True)
+    assert first['selected']['estimator'] in SPACE
+
+    again = model_selection.select_model(data, space=SPACE, folds=2, workers=1, cache_dir=str(tmp_path))
+    assert (again['fitted_folds'], again['cached_folds'], again['fitted_full']) == (0, 6, 0)
+    assert [r['accuracy'] for r in again['results']] == accuracies
+
+    # A wider grid only fits the new candidate; other data fits everything again
+    wider = dict(SPACE, extra_trees={'n_estimators': [5, 10]})
+    grown = model_selection.select_model(data, space=wider, folds=2, workers=1, cache_dir=str(tmp_path))
+    assert (grown['fitted_folds'], grown['cached_folds'], grown['fitted_full']) == (2, 6, 1)
+    changed = model_selection.select_model(farm_frame.iloc[:900], space=SPACE, folds=2, workers=1,
+                                           cache_dir=str(tmp_path))
+    assert changed['cached_folds'] == 0
+
+
+def test_too_few_rows_are_refused(farm_frame):
+    with pytest.raises(ValueError):
+        model_selection.select_model(farm_frame.iloc[:10], space=SPACE, folds=5, workers=1)
+
+
+def test_command_selects_on_the_farm_dataset_and_applies(monkeypatch, farm_frame, capsys):
+    monkeypatch.setattr(model_selection, 'SEARCH_SPACE', SPACE)
+    try:
+        assert main(['select-model', '--folds', '2', '--workers', '1', '--apply']) == 0
+        with open(os.path.join(model_selection.SELECTION_DIR, 'report.json')) as f:
+            report = json.load(f)
+        assert report['rows'] == len(farm_frame)
+        assert report['data_hash'] == training_data_hash(farm_frame)
+
+        with open(SELECTED_MODEL_PATH) as f:
+            assert json.load(f) == report['selected']
+        # The served artifact is retrained with the selection, on the frame the server hashes
+        artifact = load_artifact(MODEL_PATH, data_hash=training_data_hash(farm_frame))
+        assert artifact['estimator'] == report['selected']['estimator']
+        assert artifact['model_params']['n_estimators'] == report['selected']['params']['n_estimators']
+    finally:
+        if os.path.exists(SELECTED_MODEL_PATH):
+            os.remove(SELECTED_MODEL_PATH)
+    assert 'Report written to' in capsys.readouterr().out
+
+
+def test_command_refuses_a_small_dataset(tmp_path, farm_frame, capsys):
+    path = tmp_path / 'small.csv'
+    farm_frame.iloc[:8].to_csv(path, index=False)
+    assert main(['select-model', '--data', str(path)]) == 1
+    assert 'too few' in capsys.readouterr().err
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.recommender import (ALL, SOIL_MOISTURE_BANDS, RecommendationTables, generate_recommendations,
+                                 soil_types)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'data')
+
+
+@pytest.fixture(scope='module')
+def tables():
+    farming = pd.read_csv(os.path.join(DATA_DIR, 'farmer_advisor_dataset.csv'))
+    market = pd.read_csv(os.path.join(DATA_DIR, 'market_researcher_dataset.csv'))
+    return farming, RecommendationTables(farming, market)
+
+
+def test_bands_are_contiguous():
+    bands = sorted(SOIL_MOISTURE_BANDS.values())
+    assert all(high == next_low for (_, high), (next_low, _) in zip(bands, bands[1:]))
+
+
+def test_every_farm_is_in_exactly_one_band(tables):
+    farming, _ = tables
+    moisture = farming['Soil_Moisture'].to_numpy()
+    memberships = sum(((moisture >= low) & (moisture < high)).astype(int)
+                      for low, high in SOIL_MOISTURE_BANDS.values())
+    assert (memberships == 1).all()
+
+
+def test_soil_types_at_band_edges():
+    assert list(soil_types([0, 19.99, 20, 29.99, 30, 37.99, 38, 99.9])) == \
+        ['sandy', 'sandy', 'loamy', 'loamy', 'silt', 'silt', 'clay', 'clay']
+    assert list(soil_types([-1, 100, np.nan])) == [None, None, None]
+
+
+def test_band_tables_partition_the_farms(tables):
+    farming, result = tables
+    for crop, stats in result.farm[ALL].items():
+        assert sum(result.farm[soil][crop]['farms'] for soil in SOIL_MOISTURE_BANDS) == stats['farms']
+    assert sum(stats['farms'] for stats in result.farm[ALL].values()) == len(farming)
+
+
+def test_recommendations_for_soil_and_season(tables):
+    _, result = tables
+    ranked = generate_recommendations(result, 'loam', 'summer')
+    assert ranked['filters'] == {'soilType': 'loamy', 'seasonalFactor': 'High'}
+    crops = ranked['recommendations']['crops']
+    assert [c['name'] for c in crops] and len(crops) <= len(result.crops)
+    assert [c['confidence'] for c in crops] == sorted((c['confidence'] for c in crops), reverse=True)
+    assert all(c['farms'] == result.farm['loamy'][c['name']]['farms'] for c in crops)
+
+
+@pytest.mark.parametrize('soil, season', [('peat', None), (None, 'monsoon'), (None, 3), (None, ['summer'])])
+def test_unknown_soil_or_season(tables, soil, season):
+    with pytest.raises(ValueError):
+        generate_recommendations(tables[1], soil, season)
@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+import pytest
+
+from backend import retraining
+from backend.model import (TARGET_COLUMN, ModelState, farm_training_frame, load_artifact, save_artifact,
+                           train_artifact, training_data_hash)
+from backend.retraining import ModelRetrainer
+from tests.conftest import DATA_DIR
+
+
+class FarmSystem:
+    """The part of IntegratedFarmingSystem the retrainer uses."""
+
+    def __init__(self, data, artifact=None):
+        self.data = data
+        self.state = ModelState(artifact) if artifact is not None else None
+
+    def load_data(self):
+        return self.data
+
+    def apply_artifact(self, artifact):
+        self.state = ModelState(artifact)
+
+
+@pytest.fixture(scope='module')
+def farm_frame():
+    return farm_training_frame(pd.read_csv(os.path.join(DATA_DIR, 'farmer_advisor_dataset.csv')))
+
+
+@pytest.fixture
+def system(tmp_path, farm_frame):
+    path = str(tmp_path / 'model.joblib')
+    artifact = train_artifact(farm_frame.iloc[:2000], model_params={'n_estimators': 10})
+    save_artifact(artifact, path)
+    return FarmSystem(farm_frame.iloc[:3000], load_artifact(path)), path
+
+
+def test_farm_training_frame(farm_frame):
+    assert list(farm_frame.columns) == ['soil_type', 'water_availability', 'temperature', 'rainfall', TARGET_COLUMN]
+    assert len(farm_frame) == 10000
+    assert set(farm_frame['soil_type']) == {'sandy', 'loamy', 'silt', 'clay'}
+    assert set(farm_frame[TARGET_COLUMN]) == {'corn', 'rice', 'soybean', 'wheat'}
+
+
+def test_accepted_retrain_swaps_the_model(system, monkeypatch):
+    farm_system, path = system
+    # Only the swap is under test here, not how good a model random farm data gives
+    monkeypatch.setattr(retraining, 'RETRAIN_TOLERANCE', 1.0)
+    previous = farm_system.state
+    retrainer = ModelRetrainer(farm_system, path=path)
+
+    result = retrainer.retrain(farm_system.load_data())
+
+    assert result['accepted'] is True
+    assert result['holdout_rows'] == 600
+    assert result['baseline_version'] == previous.version
+    assert farm_system.state is not previous
+    assert farm_system.state.version == result['model_version'] != previous.version
+    assert farm_system.state.artifact['data_hash'] == training_data_hash(farm_system.data)
+    assert load_artifact(path)['model_version'] == result['model_version']
+    assert not os.path.exists(f"{path}.candidate")
+    # A request that took the old state keeps scoring with it
+    X, errors = previous.encode([{'soil_type': 'clay', 'water_availability': 'high', 'temperature': 'warm',
+                                  'rainfall': 'high'}])
+    assert errors == [None] and previous.predict_proba(X).shape == (1, 4)
+
+
+def test_other_process_picks_up_the_published_model(system, monkeypatch):
+    farm_system, path = system
+    monkeypatch.setattr(retraining, 'RETRAIN_TOLERANCE', 1.0)
+    other = FarmSystem(farm_system.data, load_artifact(path))
+    other_retrainer = ModelRetrainer(other, path=path)
+
+    result = ModelRetrainer(farm_system, path=path).retrain(farm_system.load_data())
+    assert other.state.version != result['model_version']
+    assert other_retrainer.reload_if_changed()
+    assert other.state.version == result['model_version']
+
+
+def test_small_holdout_is_not_promoted(system, monkeypatch):
+    farm_system, path = system
+    monkeypatch.setattr(retraining, 'RETRAIN_MIN_HOLDOUT', 1000)
+    version = farm_system.state.version
+
+    result = ModelRetrainer(farm_system, path=path).retrain(farm_system.load_data())
+
+    assert result['accepted'] is False
+    assert 'RETRAIN_MIN_HOLDOUT' in result['reason']
+    assert farm_system.state.version == version
+    assert load_artifact(path)['model_version'] == version
+
+
+def test_server_trains_on_the_farm_dataset(farm_frame):
+    from backend import server
+
+    assert training_data_hash(server.farming_system.load_data()) == training_data_hash(farm_frame)
+    assert server.farming_system.state.artifact['data_hash'] == training_data_hash(farm_frame)
+    assert set(server.farming_system.state.encoder_tables['soil_type']) == {'sandy', 'loamy', 'silt', 'clay'}
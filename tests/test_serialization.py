@@ -0,0 +1,52 @@
+import json
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.serialization import _stdlib_dumps, dumps, frame_records
+
+PAYLOAD = {
+    'float': 1.5,
+    'nan': float('nan'),
+    'inf': float('inf'),
+    'list': [1, float('-inf'), None, 'a'],
+    'nested': {'tuple': (float('nan'), 2.0)},
+    'np_nan': np.float64('nan'),
+    'np_float32': np.float32(0.25),
+    'np_int': np.int64(7),
+    'array': np.array([1.0, np.nan, np.inf]),
+    'int_array': np.arange(3),
+    'series': pd.Series([1.0, np.nan]),
+    'date': datetime.date(2024, 1, 2),
+}
+
+
+def test_stdlib_fallback_writes_non_finite_floats_as_null():
+    decoded = json.loads(_stdlib_dumps(PAYLOAD))
+    assert decoded['nan'] is None
+    assert decoded['inf'] is None
+    assert decoded['list'] == [1, None, None, 'a']
+    assert decoded['nested'] == {'tuple': [None, 2.0]}
+    assert decoded['np_nan'] is None
+    assert decoded['array'] == [1.0, None, None]
+    assert decoded['series'] == [1.0, None]
+    assert decoded['np_float32'] == 0.25
+    assert decoded['date'] == '2024-01-02'
+
+
+def test_stdlib_fallback_matches_dumps():
+    assert json.loads(_stdlib_dumps(PAYLOAD, sort_keys=True)) == json.loads(dumps(PAYLOAD, sort_keys=True))
+
+
+def test_frame_records_with_missing_values():
+    df = pd.DataFrame({'a': [1.0, np.nan], 'b': pd.Categorical(['x', None])})
+    records = frame_records(df)
+    assert json.loads(_stdlib_dumps(records)) == [{'a': 1.0, 'b': 'x'}, {'a': None, 'b': None}]
+    assert json.loads(dumps(records)) == json.loads(_stdlib_dumps(records))
+
+
+def test_unknown_types_still_raise():
+    with pytest.raises(TypeError):
+        _stdlib_dumps({'x': object()})
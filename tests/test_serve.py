@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+import urllib.request
+
+import pytest
+
+from backend.serve import InFlightCounter
+from tests.conftest import ROOT
+
+SERVER_SCRIPT = """
+import os, sys
+from backend.logs import configure_logging
+from backend.serve import PreforkServer
+
+loads = []
+
+def preload():
+    loads.append(len(loads) + 1)
+    print(server.port, flush=True)
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [f'{os.getpid()} {loads[-1]}'.encode()]
+
+if __name__ == '__main__':
+    configure_logging()
+    server = PreforkServer(app, '127.0.0.1', 0, workers=int(sys.argv[1]), graceful_timeout=5, preload=preload)
+    server.run()
+"""
+
+
+def _start_response(status, headers, exc_info=None):
+    pass
+
+
+def test_in_flight_counter_counts_until_close():
+    def app(environ, start_response):
+        start_response('200 OK', [])
+        return [b'a', b'b']
+
+    counter = InFlightCounter(app)
+    first = counter({}, _start_response)
+    second = counter({}, _start_response)
+    assert counter.count == 2
+    assert list(first) == [b'a', b'b']
+    first.close()
+    assert counter.count == 1
+    assert not counter.wait(0.1)
+    second.close()
+    assert counter.wait(0.1)
+
+
+def test_in_flight_counter_releases_failed_requests():
+    def app(environ, start_response):
+        raise RuntimeError('boom')
+
+    counter = InFlightCounter(app)
+    with pytest.raises(RuntimeError):
+        counter({}, _start_response)
+    assert counter.count == 0
+
+
+def _get(port):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=10) as response:
+        pid, generation = response.read().decode().split()
+    return int(pid), int(generation)
+
+
+def _wait_for(predicate, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.1)
+    raise AssertionError('condition not reached in time')
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_prefork_server_restarts_and_replaces_workers(tmp_path):
+    script = tmp_path / 'server.py'
+    script.write_text(SERVER_SCRIPT)
+    env = dict(os.environ, PYTHONPATH=ROOT, LOG_FILE='')
+    process = subprocess.Popen([sys.executable, str(script), '1'], cwd=ROOT, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        port = int(process.stdout.readline())
+        pid, generation = _get(port)
+        assert generation == 1
+        assert pid != process.pid
+
+        # A worker that dies is replaced by one with the same preloaded state;
+        # connections made meanwhile wait in the listening socket the master holds
+        os.kill(pid, signal.SIGKILL)
+        replacement, generation = _get(port)
+        assert replacement != pid
+        assert generation == 1
+
+        # SIGHUP preloads again and moves every request to the new workers
+        process.send_signal(signal.SIGHUP)
+        assert int(process.stdout.readline()) == port
+        _wait_for(lambda: all(_get(port)[1] == 2 for _ in range(10)))
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    stderr = process.stderr.read()
+    assert 'starting a replacement' in stderr
+    assert 'Server stopped' in stderr
@@ -0,0 +1,50 @@
+import pytest
+
+from backend.simulation import SURFACE_COLUMNS, _percentiles, _scenario_inputs, farm_inputs
+
+BASE = {'crop': 'Rice', 'inputs': {'Fertilizer_Usage_kg': 100.0, 'Pesticide_Usage_kg': 10.0}}
+CROPS = ['Corn', 'Rice', 'Wheat']
+
+
+def test_scale_and_set():
+    crop, inputs = _scenario_inputs(BASE, {'crop': 'Corn', 'scale': {'Fertilizer_Usage_kg': 0.5},
+                                           'set': {'Pesticide_Usage_kg': '2'}}, CROPS)
+    assert crop == 'Corn'
+    assert inputs == {'Fertilizer_Usage_kg': 50.0, 'Pesticide_Usage_kg': 2.0}
+    assert BASE['inputs']['Fertilizer_Usage_kg'] == 100.0
+
+
+@pytest.mark.parametrize('scenario', [
+    'Rice',
+    {'scale': [0.5]},
+    {'scale': 'Fertilizer_Usage_kg'},
+    {'set': 3},
+    {'scale': {'Fertilizer_Usage_kg': 'half'}},
+    {'set': {'Fertilizer_Usage_kg': None}},
+    {'set': {'Fertilizer_Usage_kg': float('inf')}},
+    {'scale': {'Unknown': 2}},
+    {'crop': 'Barley'},
+    {'crop': ['Rice']},
+])
+def test_invalid_scenarios_raise_value_error(scenario):
+    with pytest.raises(ValueError):
+        _scenario_inputs(BASE, scenario, CROPS)
+
+
+def test_farm_inputs():
+    given = dict({column: str(i) for i, column in enumerate(SURFACE_COLUMNS)}, crop='Rice', extra=1)
+    farm = farm_inputs(given)
+    assert farm == {'crop': 'Rice', 'inputs': {column: float(i) for i, column in enumerate(SURFACE_COLUMNS)}}
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-Infinity', 'wet', None])
+def test_farm_inputs_must_be_finite_numbers(value):
+    given = dict({column: 1 for column in SURFACE_COLUMNS}, crop='Rice', Soil_pH=value)
+    with pytest.raises(ValueError, match='Soil_pH'):
+        farm_inputs(given)
+
+
+@pytest.mark.parametrize('percentiles', ['50', '', [], [50, '90'], [50, True], [-1], [100.5], [float('nan')], 50])
+def test_invalid_percentiles_raise_value_error(percentiles):
+    with pytest.raises(ValueError):
+        _percentiles(percentiles)
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from backend.streaming import QueryError, paginate
+
+VERSION = (1, 2)
+
+
+def _df(rows=10):
+    return pd.DataFrame({'a': range(rows), 'b': [f'x{i}' for i in range(rows)]})
+
+
+def _pages(df, args):
+    args = MultiDict(args)
+    offsets = []
+    while True:
+        page = paginate(df, args, VERSION)
+        offsets.append((page.offset, len(page.frame)))
+        if page.next_cursor is None:
+            return offsets
+        args = MultiDict(args)
+        args['cursor'] = page.next_cursor
+
+
+def test_cursor_walks_every_row_once():
+    assert _pages(_df(10), {'limit': '4'}) == [(0, 4), (4, 4), (8, 2)]
+
+
+def test_no_cursor_after_exact_last_page():
+    assert _pages(_df(8), {'limit': '4'}) == [(0, 4), (4, 4)]
+    assert paginate(_df(8), MultiDict({'offset': '20', 'limit': '4'}), VERSION).next_cursor is None
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'x'])
+def test_invalid_limit(limit):
+    with pytest.raises(QueryError):
+        paginate(_df(), MultiDict({'limit': limit}), VERSION)
+
+
+def test_cursor_is_tied_to_fields_and_filters():
+    page = paginate(_df(), MultiDict({'limit': '3', 'fields': 'a', 'b': 'x1'}), VERSION)
+    # Same query, another output format: still valid
+    same = paginate(_df(), MultiDict({'cursor': page.next_cursor, 'b': 'x1', 'fields': 'a', 'format': 'ndjson'}),
+                    VERSION)
+    assert same.offset == 3
+    for args in ({'fields': 'b'}, {'fields': 'a'}, {'fields': 'a', 'b': 'x2'}):
+        with pytest.raises(QueryError):
+            paginate(_df(), MultiDict(dict(args, cursor=page.next_cursor)), VERSION)
+
+
+def test_stale_cursor():
+    page = paginate(_df(), MultiDict({'limit': '3'}), VERSION)
+    with pytest.raises(QueryError):
+        paginate(_df(), MultiDict({'cursor': page.next_cursor}), (1, 3))
+    with pytest.raises(QueryError):
+        paginate(_df(), MultiDict({'cursor': 'not-a-cursor'}), VERSION)
@@ -0,0 +1,133 @@
+import time
+import threading
+
+import requests
+
+from backend.weather_api import WeatherClient
+
+
+class FakeBackend:
+    """Weather backend that counts calls, can hold them until released and can fail."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.release = threading.Event()
+        self.release.set()
+        self._lock = threading.Lock()
+
+    def fetch(self, lat, lon):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {'temperature': 20.0 + call, 'humidity': 50, 'weather': 'clear', 'rainfall': 0.0,
+                'wind_speed': 3.0}
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_concurrent_misses_share_one_fetch():
+    backend = FakeBackend()
+    backend.release.clear()
+    client = WeatherClient(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get(10.01, 20.01))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Every caller is waiting on the one request in flight before it answers
+    _wait_for(lambda: client.stats()['coalesced'] == 7)
+    backend.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert backend.calls == 1
+    assert len(results) == 8
+    assert all(r == results[0] and r['stale'] is False for r in results)
+    stats = client.stats()
+    assert stats['upstream_calls'] == 1
+    assert stats['coalesced'] == 7
+
+
+def test_same_cell_is_cached():
+    backend = FakeBackend()
+    client = WeatherClient(backend, grid=0.1)
+    first = client.get(10.01, 20.01)
+    second = client.get(10.09, 20.09)
+    assert backend.calls == 1
+    assert first == second
+    assert (first['lat'], first['lon']) == (10.05, 20.05)
+
+
+def test_stale_reading_is_served_while_refreshing():
+    backend = FakeBackend()
+    client = WeatherClient(backend, ttl=0)
+    assert client.get(10.0, 20.0)['temperature'] == 21.0
+
+    backend.release.clear()
+    started = time.monotonic()
+    stale = client.get(10.0, 20.0)
+    # Answered from the cache without waiting for the refresh
+    assert time.monotonic() - started < 1
+    assert stale['stale'] is True
+    assert stale['temperature'] == 21.0
+
+    backend.release.set()
+    _wait_for(lambda: client.cache.get(client.cell(10.0, 20.0))[0]['temperature'] == 22.0)
+    assert client.get(10.0, 20.0)['temperature'] == 22.0
+    assert backend.calls == 2
+
+
+def test_timeout_falls_back_to_stale_reading():
+    backend = FakeBackend()
+    client = WeatherClient(backend, ttl=0)
+    client.get(10.0, 20.0)
+
+    backend.error = requests.Timeout('read timed out')
+    assert client.get(10.0, 20.0)['stale'] is True
+    _wait_for(lambda: client.stats()['upstream_errors'] == 1)
+    # The failed refresh kept the old reading
+    fallback = client.get(10.0, 20.0)
+    assert fallback['stale'] is True
+    assert fallback['temperature'] == 21.0
+
+
+def test_timeout_without_cached_reading_returns_none():
+    backend = FakeBackend(error=requests.Timeout('connect timed out'))
+    client = WeatherClient(backend)
+    assert client.get(10.0, 20.0) is None
+    assert client.stats()['upstream_errors'] == 1
+    # Nothing is cached, so the next request tries again
+    assert client.get(10.0, 20.0) is None
+    assert backend.calls == 2
+
+
+def test_get_many_fetches_each_cell_once():
+    backend = FakeBackend()
+    client = WeatherClient(backend)
+    coords = [(10.0, 20.0), (10.01, 20.01), (30.0, 40.0), (10.02, 20.02)]
+    results = client.get_many(coords)
+    assert backend.calls == 2
+    assert results[0] == results[1] == results[3]
+    assert results[2]['lat'] == 30.05
+
+
+def test_get_many_caps_upstream_cells():
+    backend = FakeBackend()
+    client = WeatherClient(backend)
+    client.get(50.0, 60.0)
+    coords = [(10.0, 20.0), (30.0, 40.0), (10.01, 20.01), (40.0, 50.0), (50.0, 60.0)]
+    results = client.get_many(coords, max_cells=2)
+    # Only the first two distinct cells went upstream; the rest answer from the cache or not at all
+    assert backend.calls == 3
+    assert results[0] == results[2]
+    assert results[1]['lat'] == 30.05
+    assert results[3] is None
+    assert results[4]['lat'] == 50.05 and results[4]['stale'] is False